@@ -0,0 +1,73 @@
+from typing import List
+
+from fastapi import Depends, FastAPI
+from starlette.requests import Request
+
+from fastapi_contrib.auth.backends import AuthBackend
+from fastapi_contrib.auth.middlewares import AuthenticationMiddleware
+from fastapi_contrib.auth.permissions import IsAuthenticated
+from fastapi_contrib.common.middlewares import StateRequestIDMiddleware
+from fastapi_contrib.common.responses import UJSONResponse
+from fastapi_contrib.db.models import MongoDBTimeStampedModel
+from fastapi_contrib.exception_handlers import setup_exception_handlers
+from fastapi_contrib.exceptions import NotFoundError
+from fastapi_contrib.pagination import Pagination
+from fastapi_contrib.permissions import PermissionsDependency
+from fastapi_contrib.serializers import openapi
+from fastapi_contrib.serializers.common import ModelSerializer
+
+app = FastAPI()
+app.add_middleware(AuthenticationMiddleware, backend=AuthBackend())
+app.add_middleware(StateRequestIDMiddleware)
+setup_exception_handlers(app)
+
+
+class Item(MongoDBTimeStampedModel):
+    name: str
+    price: int
+    tags: List[str] = []
+    secret: str = None
+
+    class Meta:
+        collection = "items"
+
+
+@openapi.patch
+class ItemSerializer(ModelSerializer):
+    class Meta:
+        model = Item
+        exclude = {"secret"}
+        read_only_fields = {"id", "created"}
+
+
+@app.get("/ping/", response_class=UJSONResponse)
+async def ping(request: Request):
+    return {"request_id": request.state.request_id}
+
+
+@app.get("/items/", response_class=UJSONResponse)
+async def item_list(pagination: Pagination = Depends()):
+    return await pagination.paginate(serializer_class=ItemSerializer)
+
+
+@app.get("/items/{item_id}/", response_class=UJSONResponse)
+async def item_detail(item_id: int):
+    item = await Item.get(id=item_id)
+    if item is None:
+        raise NotFoundError()
+    return ItemSerializer.sanitize_list([item.dict()])[0]
+
+
+@app.post("/items/", response_class=UJSONResponse)
+async def item_create(serializer: ItemSerializer):
+    item = await serializer.save()
+    return item.dict()
+
+
+@app.get(
+    "/me/",
+    response_class=UJSONResponse,
+    dependencies=[Depends(PermissionsDependency([IsAuthenticated]))],
+)
+async def me(request: Request):
+    return {"username": request.user.username}
@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+import pytest
+
+from starlette.testclient import TestClient
+
+from fastapi_contrib.auth.utils import get_token_model, get_user_model
+from fastapi_contrib.db.client import MongoDBClient
+from fastapi_contrib.db.utils import get_db_client
+
+from benchmarks.app import app, Item
+
+pytest.importorskip("pytest_benchmark")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+# Settings are read upon first access, so this is picked up
+os.environ["CONTRIB_FASTAPI_APP"] = "benchmarks.app.app"
+
+ITEMS_COUNT = 1000
+TOKEN_KEY = "benchmark-token"
+
+
+class MongoMockDatabase(object):
+    """
+    In-process stand-in for `AsyncIOMotorDatabase`, backed by mongomock.
+    Drops custom `tzinfo` from codec options, which mongomock can't handle.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def get_collection(self, name, codec_options=None, **kwargs):
+        if codec_options is not None:
+            codec_options = codec_options.with_options(tzinfo=None)
+        return self.database.get_collection(
+            name, codec_options=codec_options, **kwargs
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+
+async def populate_db():
+    collection = get_db_client().get_collection(Item.get_db_collection())
+    await collection.insert_many(
+        [
+            {
+                "_id": i,
+                "name": f"item {i}",
+                "price": i * 100,
+                "tags": ["a", "b", "c"],
+                "secret": "hidden",
+            }
+            for i in range(1, ITEMS_COUNT + 1)
+        ]
+    )
+    user = get_user_model()(username="benchmark")
+    await user.save()
+    await get_token_model()(key=TOKEN_KEY, user_id=user.id).save()
+
+
+@pytest.fixture(scope="session")
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mongodb(loop):
+    app.mongodb = MongoMockDatabase(
+        mongomock_motor.AsyncMongoMockClient()["benchmarks"]
+    )
+    MongoDBClient._MongoDBClient__instance = None
+    loop.run_until_complete(populate_db())
+    yield app.mongodb
+    MongoDBClient._MongoDBClient__instance = None
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def auth_headers():
+    return {"Authorization": f"Token {TOKEN_KEY}"}
@@ -0,0 +1,43 @@
+"""
+Throughput of the whole request-response cycle through the ASGI test client,
+with all middlewares of this library enabled (see `benchmarks.app`).
+"""
+
+
+def test_ping(benchmark, client):
+    response = benchmark(client.get, "/ping/")
+    assert response.status_code == 200
+
+
+def test_list(benchmark, client):
+    response = benchmark(client.get, "/items/?limit=100")
+    assert response.status_code == 200
+    assert len(response.json()["result"]) == 100
+
+
+def test_list_large_page(benchmark, client):
+    response = benchmark(client.get, "/items/?limit=1000")
+    assert response.status_code == 200
+    assert len(response.json()["result"]) == 1000
+
+
+def test_detail(benchmark, client):
+    response = benchmark(client.get, "/items/42/")
+    assert response.status_code == 200
+    assert response.json()["id"] == 42
+
+
+def test_not_found(benchmark, client):
+    response = benchmark(client.get, "/items/0/")
+    assert response.status_code == 404
+
+
+def test_validation_error(benchmark, client):
+    response = benchmark(client.post, "/items/", json={"price": "many"})
+    assert response.status_code == 400
+
+
+def test_authenticated(benchmark, client, auth_headers):
+    response = benchmark(client.get, "/me/", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"username": "benchmark"}
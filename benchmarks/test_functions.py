@@ -0,0 +1,103 @@
+"""
+Microbenchmarks of the hot paths of this library, called directly.
+"""
+from pydantic import ValidationError
+from starlette.requests import HTTPConnection, Request
+
+from fastapi_contrib.auth.backends import AuthBackend
+from fastapi_contrib.exception_handlers import parse_error
+from fastapi_contrib.pagination import Pagination
+from fastapi_contrib.serializers.common import ModelSerializer
+from fastapi_contrib.serializers.utils import gen_model, FieldGenerationMode
+
+from benchmarks.app import Item, ItemSerializer
+from benchmarks.conftest import TOKEN_KEY
+
+
+def make_scope(headers=None):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/items/",
+        "query_string": b"",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "headers": headers or [],
+    }
+
+
+def test_paginate(benchmark, loop):
+    def paginate():
+        pagination = Pagination(Request(make_scope()), offset=0, limit=100)
+        return loop.run_until_complete(
+            pagination.paginate(serializer_class=ItemSerializer)
+        )
+
+    result = benchmark(paginate)
+    assert len(result["result"]) == 100
+
+
+def test_model_list(benchmark, loop):
+    result = benchmark(lambda: loop.run_until_complete(Item.list(_limit=100)))
+    assert len(result) == 100
+
+
+def test_model_get(benchmark, loop):
+    result = benchmark(lambda: loop.run_until_complete(Item.get(id=42)))
+    assert result.id == 42
+
+
+def test_serializer_dict(benchmark):
+    serializer = ItemSerializer(name="item", price=1, tags=["a"])
+    result = benchmark(serializer.dict)
+    assert result["name"] == "item"
+
+
+def test_sanitize_list(benchmark):
+    def setup():
+        rows = [
+            {"id": i, "name": "item", "price": i, "secret": "hidden"}
+            for i in range(100)
+        ]
+        return (rows,), {}
+
+    result = benchmark.pedantic(
+        ItemSerializer.sanitize_list, setup=setup, rounds=1000
+    )
+    assert "secret" not in result[0]
+
+
+def test_gen_model(benchmark):
+    class Serializer(ModelSerializer):
+        extra: str = "extra"
+
+        class Meta:
+            model = Item
+            exclude = {"secret"}
+
+    model = benchmark(gen_model, Serializer, mode=FieldGenerationMode.REQUEST)
+    assert "extra" in model.__fields__
+
+
+def test_parse_error(benchmark):
+    try:
+        Item(name=None, price="many")
+    except ValidationError as e:
+        error = e.raw_errors[0]
+
+    result = benchmark(parse_error, error, field_names=[], raw=True)
+    assert result["name"] == "name"
+
+
+def test_authenticate(benchmark, loop):
+    backend = AuthBackend()
+    conn = HTTPConnection(
+        make_scope(headers=[(b"authorization", f"Token {TOKEN_KEY}".encode())])
+    )
+
+    def authenticate():
+        return loop.run_until_complete(backend.authenticate(conn))
+
+    is_authenticated, user = benchmark(authenticate)
+    assert is_authenticated
+    assert user.username == "benchmark"
@@ -1,4 +1,4 @@
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Any, Optional, Tuple
 
 from fastapi.security.utils import get_authorization_scheme_param
 from starlette.authentication import AuthenticationBackend, AuthenticationError
@@ -7,8 +7,20 @@ from starlette.requests import HTTPConnection
 from fastapi_contrib.auth.utils import get_token_model, get_user_model
 from fastapi_contrib.common.utils import get_now
 
-Token = get_token_model()
-User = get_user_model()
+if TYPE_CHECKING:  # pragma: no cover
+    from fastapi_contrib.db.models import MongoDBModel
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolves `Token` & `User` models from settings upon first access,
+    so importing this module doesn't import the models.
+    """
+    if name == "Token":
+        return get_token_model()
+    if name == "User":
+        return get_user_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class AuthBackend(AuthenticationBackend):
@@ -29,7 +41,7 @@ class AuthBackend(AuthenticationBackend):
 
     async def authenticate(
         self, conn: HTTPConnection
-    ) -> Tuple[bool, Optional[User]]:
+    ) -> Tuple[bool, Optional["MongoDBModel"]]:
         """
         Main function that AuthenticationMiddleware uses from this backend.
         Should return whether request is authenticated based on credentials and
@@ -47,7 +59,7 @@ class AuthBackend(AuthenticationBackend):
         if scheme.lower() != "token":
             raise AuthenticationError("Invalid authentication credentials")
 
-        token = await Token.get(
+        token = await get_token_model().get(
             key=credentials,
             is_active=True,
             expires={"$not": {"$lt": get_now()}},
@@ -56,7 +68,7 @@ class AuthBackend(AuthenticationBackend):
             return False, None
         conn.scope["token"] = token
 
-        user = await User.get(id=token.user_id)
+        user = await get_user_model().get(id=token.user_id)
         if user is None:
             return False, None
 
@@ -1,7 +1,7 @@
 import hashlib
 import os
 
-from fastapi_contrib.common.utils import resolve_dotted_path
+from fastapi_contrib.common.utils import resolve_cached
 from fastapi_contrib.conf import settings
 
 
@@ -10,7 +10,7 @@ def get_token_model():
     Gets token model class based on project settings.
     :return: Token (defualt or custom) model class
     """
-    return resolve_dotted_path(settings.token_model)
+    return resolve_cached(settings.token_model)
 
 
 def get_user_model():
@@ -18,7 +18,7 @@ def get_user_model():
     Gets user model class based on project settings.
     :return: User (defualt or custom) model class
     """
-    return resolve_dotted_path(settings.user_model)
+    return resolve_cached(settings.user_model)
 
 
 def default_token_generator() -> str:
@@ -35,5 +35,5 @@ def generate_token() -> str:
     Gets token generator function and invokes it for creation of new token.
     :return: string with generated token
     """
-    token_generator = resolve_dotted_path(settings.token_generator)
+    token_generator = resolve_cached(settings.token_generator)
     return token_generator()
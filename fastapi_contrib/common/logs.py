@@ -0,0 +1,208 @@
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional, TextIO
+
+from fastapi_contrib.common.middlewares import request_id
+from fastapi_contrib.tracing.middlewares import request_span
+
+# Name of stdlib logger of the library, if `logging` module is set up
+LIBRARY_LOGGER_NAME = "fastapi_contrib"
+
+
+def get_trace_id() -> Optional[str]:
+    """
+    Gets trace ID of the span of current request (see:
+    `OpentracingMiddleware`) in hex, as tracers show it.
+
+    :return: trace ID or None, if request isn't traced
+    """
+    span = request_span.get(None)
+    trace_id = getattr(getattr(span, "context", None), "trace_id", None)
+    if isinstance(trace_id, int):
+        return format(trace_id, "x")
+    return trace_id
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds `request_id` & `trace_id` of current request to every record.
+    Context variables are read when record is made, in the task of request.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get(None)
+        record.trace_id = get_trace_id()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one-line JSON objects with time, level, logger name,
+    message, request & trace IDs (and exception, if any).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "trace_id": getattr(record, "trace_id", None),
+        }
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        elif record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler, which never blocks: once the queue is full,
+    records are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, _queue: queue.Queue):
+        super().__init__(_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.addFilter(RequestContextFilter())
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merges args into message (they could change before the listener
+        # gets to the record), but leaves formatting to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+
+class QueueLogging(object):
+    """
+    Non-blocking log sink: records are put into bounded queue in the
+    event loop, and are formatted as JSON & written to the stream by
+    the listener in a separate thread.
+
+    :param maxsize: size of the queue, records over it are dropped
+    :param stream: stream to write records to, defaults to stdout
+    """
+
+    def __init__(self, maxsize: int, stream: TextIO = None):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.stream_handler = logging.StreamHandler(stream or sys.stdout)
+        self.stream_handler.setFormatter(JSONFormatter())
+        self.listener = QueueListener(self.queue, self.stream_handler)
+        # stdlib logger, the sink is attached to
+        self.logger = None
+
+    @property
+    def dropped(self) -> int:
+        """
+        Number of records, dropped since the queue was full.
+        """
+        return self.handler.dropped
+
+    def start(self) -> "QueueLogging":
+        self.listener.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Writes out records left in the queue and stops the listener.
+        """
+        self.listener.stop()
+
+
+queue_logging: Optional[QueueLogging] = None
+
+
+def setup_queue_logging(
+    lib_logger: Any, maxsize: int, level: str = "INFO", stream: TextIO = None
+) -> QueueLogging:
+    """
+    Sets up non-blocking JSON log sink for the library logger: stdlib one
+    (`logging.Logger`) or loguru-compatible one. For `logging` module,
+    sink is attached to "fastapi_contrib" logger instead of the root one
+    (so that handlers & level of the app stay as they are), see
+    `QueueLogging.logger`. stdlib logger doesn't propagate records to the
+    root logger then. Previous sink, set up by this function, is stopped.
+
+    :param lib_logger: logger to set up
+    :param maxsize: size of the queue, records over it are dropped
+    :param level: minimal level of records
+    :param stream: stream to write records to, defaults to stdout
+    :return: started sink (its `dropped` counts dropped records)
+    """
+    global queue_logging
+
+    if queue_logging is not None:
+        queue_logging.stop()
+    queue_logging = QueueLogging(maxsize, stream=stream).start()
+
+    if hasattr(lib_logger, "configure"):
+        lib_logger.configure(
+            handlers=[
+                {
+                    "sink": queue_logging.handler,
+                    "level": level,
+                    "format": "{message}",
+                }
+            ]
+        )
+        return queue_logging
+
+    if isinstance(lib_logger, logging.Logger):
+        target = lib_logger
+    else:
+        target = logging.getLogger(LIBRARY_LOGGER_NAME)
+    for handler in list(target.handlers):
+        if isinstance(handler, DroppingQueueHandler):
+            target.removeHandler(handler)
+    target.addHandler(queue_logging.handler)
+    target.setLevel(level)
+    target.propagate = False
+    queue_logging.logger = target
+    return queue_logging
+
+
+def stop_queue_logging() -> None:
+    """
+    Stops sink, set up by `setup_queue_logging`, writing out records
+    left in its queue. Use it upon shutdown of the app:
+
+    .. code-block:: python
+
+        @app.on_event('shutdown')
+        async def shutdown():
+            stop_queue_logging()
+
+    :return: None
+    """
+    global queue_logging
+
+    if queue_logging is not None:
+        queue_logging.stop()
+        queue_logging = None
@@ -1,15 +1,58 @@
-from typing import Any
+import contextvars
+import gzip
+import itertools
+import os
+import random
+import zlib
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from time import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
 
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from fastapi_contrib.common.utils import resolve_cached
 from fastapi_contrib.conf import settings
 
 
-class StateRequestIDMiddleware(BaseHTTPMiddleware):
+request_id = contextvars.ContextVar("request_id")
+
+# Random part of request IDs, unique per process (regenerated after fork)
+_process_id = os.urandom(6).hex()
+_counter = itertools.count(random.getrandbits(32))
+
+
+def _reset_process_id() -> None:
+    global _process_id
+    _process_id = os.urandom(6).hex()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_process_id)
+
+
+def generate_request_id() -> str:
+    """
+    Generates time-ordered unique ID of request (32 hex digits, same as
+    UUID): milliseconds since epoch, random ID of the process and counter,
+    so that no syscall is made per request.
+
+    :return: request ID
     """
-    Middleware to store Request ID headers value inside request's state object.
+    count = next(_counter) & 0xFFFFFFFF
+    return f"{int(time() * 1000):012x}{_process_id}{count:08x}"
+
+
+class StateRequestIDMiddleware(object):
+    """
+    Middleware to store Request ID headers value inside request's state object
+    (and `request_id` context variable, e.g. for logging). If request has no
+    such header, ID is generated by `settings.request_id_generator`.
+    Request ID is also sent back in the same header of response.
+
+    It's pure ASGI middleware (without `dispatch` method), override
+    `get_request_id` to change how ID is read or generated.
 
     Use this class as a first argument to `add_middleware` func:
 
@@ -23,6 +66,9 @@ class StateRequestIDMiddleware(BaseHTTPMiddleware):
 
     """
 
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
     @property
     def request_id_header_name(self) -> str:
         """
@@ -31,14 +77,341 @@ class StateRequestIDMiddleware(BaseHTTPMiddleware):
         """
         return settings.request_id_header
 
-    async def dispatch(self, request: Request, call_next: Any) -> Response:
+    def get_request_id(self, scope: Scope, header_name: bytes) -> bytes:
+        """
+        Gets raw value of Request ID header or generates new ID.
+
+        :param scope: ASGI scope of request
+        :param header_name: lowercase name of the header
+        :return: request ID or None, if there is no header & generator
+        """
+        for name, value in scope["headers"]:
+            if name == header_name:
+                return value
+        if settings.request_id_generator:
+            generator = resolve_cached(settings.request_id_generator)
+            return generator().encode("latin-1")
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        Get header from request (or generate it) and save it in request's
+        state for future use, then add it to headers of response.
+        :param scope: ASGI scope of request
+        :param receive: ASGI receive channel
+        :param send: ASGI send channel
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header_name = self.request_id_header_name.lower().encode("latin-1")
+        raw_value = self.get_request_id(scope, header_name)
+        value = raw_value.decode("latin-1") if raw_value is not None else None
+        scope.setdefault("state", {})["request_id"] = value
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start" and value is not None:
+                headers = message.get("headers", [])
+                if all(name != header_name for name, _ in headers):
+                    message["headers"] = [*headers, (header_name, raw_value)]
+            await send(message)
+
+        token = request_id.set(value)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
+
+
+class GzipCodec(object):
+    name = "gzip"
+    max_level = 9
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return gzip.compress(data, compresslevel=level)
+
+    def compressor(self, level: int) -> Tuple[Callable, Callable]:
+        # 16 + window bits makes zlib write gzip header & trailer
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        return compressor.compress, compressor.flush
+
+
+class BrotliCodec(object):
+    name = "br"
+    max_level = 11
+
+    def __init__(self):
+        import brotli
+
+        self.brotli = brotli
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return self.brotli.compress(data, quality=level)
+
+    def compressor(self, level: int) -> Tuple[Callable, Callable]:
+        compressor = self.brotli.Compressor(quality=level)
+        return compressor.process, compressor.finish
+
+
+class ZstdCodec(object):
+    name = "zstd"
+    max_level = 22
+
+    def __init__(self):
+        import zstandard
+
+        self.zstandard = zstandard
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return self.zstandard.ZstdCompressor(level=level).compress(data)
+
+    def compressor(self, level: int) -> Tuple[Callable, Callable]:
+        compressor = self.zstandard.ZstdCompressor(level=level).compressobj()
+        return compressor.compress, compressor.flush
+
+
+CODECS = {codec.name: codec for codec in (ZstdCodec, BrotliCodec, GzipCodec)}
+
+# Defaults, which are fast enough to be used for every response
+DEFAULT_COMPRESSION_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+
+def compression_level(level: Union[int, Dict[str, int]]) -> Callable:
+    """
+    Decorator of endpoint to set level of its responses compression for
+    `CompressionMiddleware`, the same one for every encoding or dict of
+    levels by encoding. Level 0 disables compression:
+
+    .. code-block:: python
+
+        @app.get("/export/")
+        @compression_level({"zstd": 19, "br": 11, "gzip": 9})
+        async def export():
+            ...
+
+    :param level: compression level or dict of them by encoding
+    :return: decorator, which sets `compression_level` of endpoint
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.compression_level = level
+        return endpoint
+
+    return decorator
+
+
+class CompressionMiddleware(object):
+    """
+    Middleware to compress responses with zstd, brotli or gzip, whichever
+    is preferred by `Accept-Encoding` of request. zstd & brotli are used only
+    if `zstandard` & `brotli` packages are installed.
+
+    Responses, smaller than `minimum_size`, are sent as is. Bodies,
+    not smaller than `threadpool_min_size`, are compressed in thread pool,
+    so that event loop isn't blocked. Level of compression could be set
+    per route with `compression_level` decorator of endpoint.
+
+    Use this class as a first argument to `add_middleware` func:
+
+    .. code-block:: python
+
+        app = FastAPI()
+
+        app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+    :param app: ASGI app to wrap
+    :param minimum_size: minimal size of body (in bytes) to compress
+    :param levels: dict of default compression levels by encoding
+    :param encodings: names of encodings to use, in order of preference
+    :param threadpool_min_size: minimal size of body (or its chunk)
+                                to compress in thread pool
+    :param content_types: prefixes of content types to compress,
+                          defaults to all
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        levels: Dict[str, int] = None,
+        encodings: Sequence[str] = ("zstd", "br", "gzip"),
+        threadpool_min_size: int = 64 * 1024,
+        content_types: Sequence[str] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_COMPRESSION_LEVELS, **(levels or {})}
+        self.threadpool_min_size = threadpool_min_size
+        self.content_types = tuple(content_types) if content_types else None
+        self.codecs = {}
+        for encoding in encodings:
+            try:
+                self.codecs[encoding] = CODECS[encoding]()
+            except ImportError:
+                continue
+
+    def get_encoding(self, scope: Scope) -> Optional[str]:
+        """
+        Picks encoding, preferred by client, out of available ones
+        (ties are resolved by order of `encodings`).
+
+        :param scope: ASGI scope of request
+        :return: name of encoding or None, if none is acceptable
         """
-        Get header from request and save it in request's state for future use.
-        :param request: current Request instance
-        :param call_next: next callable in list
-        :return: response
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        if not accept_encoding:
+            return None
+
+        weights = {}
+        for item in accept_encoding.split(","):
+            name, _, params = item.partition(";")
+            weight = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    weight = float(params[2:])
+                except ValueError:
+                    weight = 0.0
+            weights[name.strip().lower()] = weight
+
+        encoding, best = None, 0.0
+        for name in self.codecs:
+            weight = weights.get(name, weights.get("*", 0.0))
+            if weight > best:
+                encoding, best = name, weight
+        return encoding
+
+    def get_level(self, scope: Scope, encoding: str) -> int:
+        """
+        Gets compression level of the endpoint of request (if it was set
+        with `compression_level`) or the default one of encoding.
+
+        :param scope: ASGI scope of request (after routing)
+        :param encoding: name of encoding
+        :return: compression level
+        """
+        level = getattr(scope.get("endpoint"), "compression_level", None)
+        if isinstance(level, dict):
+            level = level.get(encoding)
+        if level is None:
+            level = self.levels[encoding]
+        return min(level, self.codecs[encoding].max_level)
+
+    async def run(self, func: Callable, data: bytes, *args: Any) -> bytes:
+        """
+        Runs compression function, in thread pool if data is large.
         """
-        request_id = request.headers.get(self.request_id_header_name)
-        request.state.request_id = request_id
-        response = await call_next(request)
-        return response
+        if len(data) >= self.threadpool_min_size:
+            return await run_in_threadpool(func, data, *args)
+        return func(data, *args)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.get_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder(object):
+    """
+    Compresses response of single request for `CompressionMiddleware`.
+    Start of response is held until its first body message, so that
+    headers could be changed depending on the body.
+    """
+
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        scope: Scope,
+        encoding: str,
+        send: Send,
+    ) -> None:
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.codec = middleware.codecs[encoding]
+        self._send = send
+        self.start_message = None
+        self.level = None
+        self.compress = None
+        self.flush = None
+
+    def is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_types = self.middleware.content_types
+        if content_types is None:
+            return True
+        return headers.get("content-type", "").startswith(content_types)
+
+    def get_start_message(
+        self, message: Message, length: int = None
+    ) -> Message:
+        headers = MutableHeaders(raw=list(message["headers"]))
+        headers["Content-Encoding"] = self.encoding
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+        headers.add_vary_header("Accept-Encoding")
+        return {**message, "headers": headers.raw}
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = message.get("headers", [])
+            self.start_message = {**message, "headers": headers}
+            if self.is_compressible(Headers(raw=headers)):
+                self.level = self.middleware.get_level(
+                    self.scope, self.encoding
+                )
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            too_small = len(body) < self.middleware.minimum_size
+            if not self.level or (not more_body and too_small):
+                await self._send(start_message)
+                await self._send(message)
+                return
+
+            if not more_body:
+                body = await self.middleware.run(
+                    self.codec.compress, body, self.level
+                )
+                await self._send(
+                    self.get_start_message(start_message, len(body))
+                )
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+            # Streaming response is compressed chunk by chunk
+            self.compress, self.flush = self.codec.compressor(self.level)
+            await self._send(self.get_start_message(start_message))
+        elif self.compress is None:
+            await self._send(message)
+            return
+
+        body = await self.middleware.run(self.compress, body)
+        if not more_body:
+            body += self.flush()
+        await self._send(
+            {
+                "type": "http.response.body",
+                "body": body,
+                "more_body": more_body,
+            }
+        )
@@ -1,5 +1,5 @@
+import json
 import typing
-import ujson
 
 from starlette.responses import JSONResponse
 
@@ -22,6 +22,64 @@ class UJSONResponse(JSONResponse):
             return {"a": "b"}
     """
     def render(self, content: typing.Any) -> bytes:
+        import ujson
+
         return ujson.dumps(
             content, ensure_ascii=True, escape_forward_slashes=False
         ).encode("utf-8")
+
+
+class RawBSONResponse(JSONResponse):
+    """
+    Response for raw BSON documents (e.g. from `MongoDBModel.list_raw_bson`),
+    which converts BSON of each document straight to JSON, without decoding
+    it into intermediate dicts. Documents could be nested in lists & dicts
+    (e.g. in dict of paginated results), the rest of content is dumped as is.
+
+    Endpoint should return the response itself, otherwise FastAPI converts
+    returned content with `jsonable_encoder` into dicts first (which loses
+    timezones of dates and fails on ObjectIds).
+
+    Uses `bsonjs` (`python-bsonjs` package) if installed, otherwise falls
+    back to much slower `bson.json_util`. Both produce relaxed Extended JSON,
+    e.g. dates are rendered as `{"$date": ...}`:
+
+    .. code-block:: python
+
+        app = FastAPI()
+
+
+        @app.get("/", response_class=RawBSONResponse)
+        async def root():
+            return RawBSONResponse(await SomeModel.list_raw_bson(_limit=100))
+    """
+    def render(self, content: typing.Any) -> bytes:
+        from bson.raw_bson import RawBSONDocument
+
+        try:
+            from bsonjs import dumps as _dumps
+
+            def dumps(document: RawBSONDocument) -> str:
+                return _dumps(document.raw)
+
+        except ImportError:
+            from bson import json_util
+
+            def dumps(document: RawBSONDocument) -> str:
+                return json_util.dumps(
+                    document, json_options=json_util.RELAXED_JSON_OPTIONS
+                )
+
+        def encode(value: typing.Any) -> str:
+            if isinstance(value, RawBSONDocument):
+                return dumps(value)
+            if isinstance(value, (list, tuple)):
+                return "[" + ",".join(map(encode, value)) + "]"
+            if isinstance(value, dict):
+                return "{" + ",".join(
+                    f"{json.dumps(str(key))}:{encode(item)}"
+                    for key, item in value.items()
+                ) + "}"
+            return json.dumps(value, separators=(",", ":"))
+
+        return encode(content).encode("utf-8")
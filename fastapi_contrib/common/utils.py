@@ -1,13 +1,14 @@
+import asyncio
 import importlib
 import sys
-import pytz
 
 from datetime import datetime
-from functools import wraps
+from functools import lru_cache, wraps
 from time import time
-from typing import Any
+from typing import Any, Awaitable
 
 from fastapi import FastAPI
+from starlette.requests import ClientDisconnect, Request
 
 from fastapi_contrib.conf import settings
 
@@ -33,16 +34,42 @@ def resolve_dotted_path(path: str) -> Any:
     return getattr(module, attr)
 
 
+@lru_cache(maxsize=None)
+def resolve_cached(path: str) -> Any:
+    """
+    Same as `resolve_dotted_path`, but resolves every path only once.
+    Used for settings-driven callables & classes, which are needed on every
+    request (e.g. `now_function`), so that they aren't imported every time.
+
+    :param path: dotted path to the attribute in module
+    :return: desired attribute
+    """
+    return resolve_dotted_path(path)
+
+
 def get_logger() -> Any:
     """
     Gets logger that will be used throughout this whole library.
     First it finds and imports the logger, then if it can be configured
     using loguru-compatible config, it does so.
 
+    If `settings.log_queue_size` is set, either stdlib or loguru logger
+    writes JSON records through non-blocking queue instead (see:
+    `fastapi_contrib.common.logs.setup_queue_logging`), `logging` module
+    is replaced with "fastapi_contrib" logger then.
+
     :return: desired logger (pre-configured if loguru)
     """
     lib_logger = resolve_dotted_path(settings.logger)
 
+    if settings.log_queue_size:
+        from fastapi_contrib.common.logs import setup_queue_logging
+
+        sink = setup_queue_logging(
+            lib_logger, settings.log_queue_size, level=settings.log_level
+        )
+        return sink.logger or lib_logger
+
     # Check whether it is loguru-compatible logger
     if hasattr(lib_logger, "configure"):
         logger_config = {
@@ -63,7 +90,21 @@ def get_logger() -> Any:
     return lib_logger
 
 
-logger = get_logger()
+class LazyLogger(object):
+    """
+    Proxy to the library logger, which is resolved (and configured)
+    upon first use instead of upon import of this module.
+    """
+
+    _logger = None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._logger is None:
+            self._logger = get_logger()
+        return getattr(self._logger, name)
+
+
+logger = LazyLogger()
 
 
 def get_current_app() -> FastAPI:
@@ -71,8 +112,7 @@ def get_current_app() -> FastAPI:
     Retrieves FastAPI app instance from the path, specified in project's conf.
     :return: FastAPI app
     """
-    # TODO: cache this
-    app = resolve_dotted_path(settings.fastapi_app)
+    app = resolve_cached(settings.fastapi_app)
     return app
 
 
@@ -117,9 +157,8 @@ def get_now() -> datetime:
     Retrieves `now` function from the path, specified in project's conf.
     :return: datetime of "now"
     """
-    # TODO: cache this
     if settings.now_function:
-        return resolve_dotted_path(settings.now_function)()
+        return resolve_cached(settings.now_function)()
     return datetime.now(tz=get_timezone())
 
 
@@ -128,4 +167,45 @@ def get_timezone():
     Retrieves timezone name from settings and tries to create tzinfo from it.
     :return: tzinfo object
     """
+    import pytz
+
     return pytz.timezone(settings.TZ)
+
+
+async def cancel_on_disconnect(
+    request: Request, awaitable: Awaitable, interval: float = 0.5
+) -> Any:
+    """
+    Awaits (e.g. DB queries), checking every `interval` seconds whether
+    client is still connected. If client has disconnected, awaitable is
+    cancelled (so that cursors are closed on server) and
+    `ClientDisconnect` is raised:
+
+    .. code-block:: python
+
+        @app.get("/report/")
+        async def report(request: Request):
+            return await cancel_on_disconnect(
+                request, Order.aggregate(pipeline)
+            )
+
+    Use it only after request body is read, as checking for disconnect
+    consumes incoming messages.
+
+    :param request: starlette Request object
+    :param awaitable: coroutine or future to await
+    :param interval: seconds between checks for disconnect
+    :return: result of awaitable
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=interval)
+            if not task.done() and await request.is_disconnected():
+                task.cancel()
+                await asyncio.wait({task})
+                raise ClientDisconnect()
+        return task.result()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -2,7 +2,7 @@ import os
 from pathlib import Path
 
 from pydantic import BaseSettings
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 contrib_secrets_dir: Optional[str] = os.environ.get(
     "CONTRIB_SECRETS_DIR", "/run/secrets"
@@ -21,12 +21,56 @@ class Settings(BaseSettings):
     :param logger: Dotted path to the logger (using this attribute, standard
                    logging methods will be used: logging.debug(), .info(), etc.
     :param log_level: Standard LEVEL for logging (DEBUG/INFO/WARNING/etc.)
+    :param log_queue_size: If set, logs are written as JSON (with request &
+                           trace IDs) through the queue of this size by a
+                           separate thread, logs over it are dropped
     :param debug_timing: Whether to enable time logging for decorated functions
     :param request_id_header: String name for header, that is expected to have
                               unique request id for tracing purposes.
                               Might go away when we add opentracing here.
+    :param request_id_generator: Dotted path to the function, which generates
+                                 ID of request without `request_id_header`
+                                 (None to leave its ID empty)
     :param mongodb_dsn: DSN connection string to MongoDB
     :param mongodb_dbname: String name of a database to connect to in MongoDB
+    :param mongodb_connections: Dict of additional MongoDB connections by
+                                their alias, each one is a dict with `dsn`,
+                                `dbname` & any of pool/timeout settings below
+                                (missing ones are taken from `mongodb_*`)
+    :param mongodb_min_pool_size: Minimum number of connections in the pool
+    :param mongodb_max_pool_size: Maximum number of connections in the pool
+    :param mongodb_wait_queue_timeout_ms: How long to wait for a connection
+                                          from the pool before failing
+    :param mongodb_max_idle_time_ms: How long connection could stay idle in
+                                     the pool before being closed
+    :param mongodb_compressors: Comma-separated wire compressors to negotiate
+                                with server, e.g. "zstd,snappy,zlib"
+    :param mongodb_zlib_compression_level: Level of zlib compression (-1..9)
+    :param mongodb_connect_timeout_ms: Timeout of opening a new connection
+    :param mongodb_server_selection_timeout_ms: How long to wait for a
+                                                suitable server to be found
+    :param mongodb_socket_timeout_ms: Timeout of send/receive on a socket
+    :param mongodb_monitoring: Whether to record pool & command metrics
+                               into `fastapi_contrib.db.monitoring.metrics`
+    :param mongodb_slow_query_ms: Queries of models taking longer than this
+                                  are logged & counted as slow
+    :param mongodb_explain_sample_rate: Fraction (0..1) of model queries to
+                                        explain, to detect collection scans
+    :param mongodb_router: Dotted path to the function, which receives model
+                           and returns alias of connection to use for it
+                           (or None to fall back to `Meta.using` of model)
+    :param mongodb_indexes_concurrency: How many models could create their
+                                        indexes concurrently upon startup
+    :param mongodb_indexes_lock: Whether only one worker should create
+                                 indexes, while others skip it
+    :param mongodb_indexes_recreate: Whether indexes, which differ from
+                                     `Meta.indexes`, should be dropped &
+                                     created again (otherwise only logged)
+    :param mongodb_indexes_lock_timeout: Seconds after which lock for index
+                                         creation is considered stale
+    :param mongodb_locks_collection: Name of the collection to store locks in
+    :param mongodb_resume_tokens_collection: Name of the collection to store
+                                             resume tokens of change streams
     :param mongodb_id_generator: Dotted path to the function, which will
                                  be used when assigning IDs for MongoDB records
     :param now_function: Dotted path to the function, which will be used when
@@ -43,11 +87,18 @@ class Settings(BaseSettings):
                                     them and generate indexes upon startup
                                     (see: `create_indexes`)
     :param apps_folder_name: Name of the folders which contains dirs with apps.
+    :param models_manifest: Path to the JSON file with dotted paths to models,
+                            used instead of scanning `apps` when it exists
+                            (see: `dump_models_manifest`)
     """
     logger: str = "logging"
     log_level: str = "INFO"
+    log_queue_size: int = None
     debug_timing: bool = False
     request_id_header: str = "Request-ID"
+    request_id_generator: str = (
+        "fastapi_contrib.common.middlewares.generate_request_id"
+    )
 
     service_name: str = "fastapi_contrib"
     trace_id_header: str = "X-TRACE-ID"
@@ -60,6 +111,24 @@ class Settings(BaseSettings):
     mongodb_dbname: str = "default"
     mongodb_min_pool_size: int = 0
     mongodb_max_pool_size: int = 100
+    mongodb_wait_queue_timeout_ms: int = None
+    mongodb_max_idle_time_ms: int = None
+    mongodb_compressors: str = None
+    mongodb_zlib_compression_level: int = None
+    mongodb_connect_timeout_ms: int = None
+    mongodb_server_selection_timeout_ms: int = None
+    mongodb_socket_timeout_ms: int = None
+    mongodb_monitoring: bool = False
+    mongodb_slow_query_ms: int = None
+    mongodb_explain_sample_rate: float = 0.0
+    mongodb_connections: Dict[str, Dict[str, Any]] = {}
+    mongodb_router: str = None
+    mongodb_indexes_concurrency: int = 10
+    mongodb_indexes_lock: bool = False
+    mongodb_indexes_lock_timeout: int = 300
+    mongodb_indexes_recreate: bool = False
+    mongodb_locks_collection: str = "contrib_locks"
+    mongodb_resume_tokens_collection: str = "contrib_resume_tokens"
     mongodb_id_generator: str = "fastapi_contrib.db.utils.default_id_generator"
 
     now_function: str = None
@@ -73,11 +142,33 @@ class Settings(BaseSettings):
 
     apps: List[str] = []
     apps_folder_name: str = "apps"
+    models_manifest: str = None
 
     class Config:
         env_prefix = "CONTRIB_"
         secrets_dir = contrib_secrets_dir
 
 
+class LazySettings(object):
+    """
+    Proxy to `Settings`, which are instantiated (reading environment
+    and secrets dir) upon first access to any of its attributes,
+    instead of upon import of this module.
+    """
+
+    _wrapped = None
+
+    def _setup(self) -> Settings:
+        if self._wrapped is None:
+            object.__setattr__(self, "_wrapped", Settings())
+        return self._wrapped
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._setup(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._setup(), name, value)
+
+
 # TODO: ability to override this settings class from the actual app
-settings = Settings()
+settings = LazySettings()
@@ -1,11 +1,25 @@
+from typing import Optional, Union
+
 from bson import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.change_stream import ChangeStream
 from pymongo.client_session import ClientSession
-from pymongo.collection import Collection
-from pymongo.cursor import Cursor
+from pymongo.collection import Collection, ReturnDocument
+from pymongo.command_cursor import CommandCursor
+from pymongo.cursor import Cursor, CursorType
+from pymongo.database import Database
 from pymongo.results import InsertOneResult, DeleteResult, UpdateResult
 
-from fastapi_contrib.db.models import MongoDBModel, notset
-from fastapi_contrib.common.utils import get_current_app, get_timezone
+from fastapi_contrib.conf import settings
+from fastapi_contrib.db.models import MongoDBModel
+from fastapi_contrib.db.query import Q, build_filter
+from fastapi_contrib.db.transactions import get_session
+from fastapi_contrib.db.utils import DEFAULT_CONNECTION
+from fastapi_contrib.common.utils import (
+    get_current_app,
+    get_timezone,
+    resolve_cached,
+)
 
 
 class MongoDBClient(object):
@@ -15,6 +29,11 @@ class MongoDBClient(object):
 
     Implements only part of internal `motor` methods, but can be populated more
 
+    Every model is routed to one of the databases, set up by `setup_mongodb`,
+    by its alias: `_using` argument of the call, then alias returned by
+    `settings.mongodb_router` and then `Meta.using` of the model
+    (see `get_database_alias`).
+
     Please don't use it directly, use `fastapi_contrib.db.utils.get_db_client`.
     """
 
@@ -27,12 +46,206 @@ class MongoDBClient(object):
             tzinfo = get_timezone()
             cls.__instance.codec_options = CodecOptions(
                 tz_aware=True, tzinfo=tzinfo)
+            cls.__instance.raw_codec_options = CodecOptions(
+                document_class=RawBSONDocument, tz_aware=True, tzinfo=tzinfo
+            )
             cls.__instance.mongodb = app.mongodb
+            cls.__instance.databases = getattr(app, "mongodb_databases", {})
+            cls.__instance._collections = {}
         return cls.__instance
 
-    def get_collection(self, collection_name: str) -> Collection:
-        return self.mongodb.get_collection(
-            collection_name, codec_options=self.codec_options)
+    def get_database(self, alias: str = None) -> Database:
+        """
+        Gets database handle by its connection alias.
+
+        :param alias: name of connection from `settings.mongodb_connections`
+        :return: database handle
+        """
+        if alias is None or alias == DEFAULT_CONNECTION:
+            return self.mongodb
+        try:
+            return self.databases[alias]
+        except KeyError:
+            raise ValueError(f"MongoDB connection {alias!r} is not set up")
+
+    def get_database_alias(
+        self, model: MongoDBModel, using: str = None
+    ) -> str:
+        """
+        Picks connection alias for the model.
+
+        :param model: model class or instance
+        :param using: alias, explicitly passed to the call
+        :return: connection alias
+        """
+        if using:
+            return using
+        if settings.mongodb_router:
+            alias = resolve_cached(settings.mongodb_router)(model)
+            if alias:
+                return alias
+        return getattr(model.Meta, "using", None) or DEFAULT_CONNECTION
+
+    def get_collection(
+        self,
+        collection_name: str,
+        codec_options: CodecOptions = None,
+        read_preference=None,
+        write_concern=None,
+        read_concern=None,
+        using: str = None,
+    ) -> Collection:
+        """
+        Gets collection handle, cached per connection alias, collection name
+        and options. Cached handle is dropped whenever database handle
+        of the alias changes.
+
+        :param collection_name: name of the collection
+        :param codec_options: defaults to tz-aware options of this client
+        :param read_preference: defaults to the one of database
+        :param write_concern: defaults to the one of database
+        :param read_concern: defaults to the one of database
+        :param using: connection alias, defaults to "default"
+        :return: collection handle
+        """
+        database = self.get_database(using)
+        codec_options = codec_options or self.codec_options
+        options = (codec_options, read_preference, write_concern, read_concern)
+        # pymongo options are unhashable, though have exhaustive repr
+        key = (using, collection_name) + tuple(map(repr, options))
+        cached = self._collections.get(key)
+        if cached is not None and cached[0] is database:
+            return cached[1]
+
+        collection = database.get_collection(
+            collection_name,
+            codec_options=codec_options,
+            read_preference=read_preference,
+            write_concern=write_concern,
+            read_concern=read_concern,
+        )
+        self._collections[key] = (database, collection)
+        return collection
+
+    def get_model_collection(
+        self,
+        model: MongoDBModel,
+        read_preference=None,
+        read_concern=None,
+        max_staleness=None,
+        using: str = None,
+        codec_options: CodecOptions = None,
+    ) -> Collection:
+        """
+        Gets collection handle of the model with options from its `Meta`.
+        Handle is resolved once and then stored on the model class until
+        this client or database of the model changes.
+
+        Options, overridden per call, are cached only on this client.
+
+        :param model: model class or instance
+        :param read_preference: overrides `Meta.read_preference`
+        :param read_concern: overrides `Meta.read_concern`
+        :param max_staleness: overrides `Meta.max_staleness`
+        :param using: overrides connection alias of the model
+        :param codec_options: overrides tz-aware options of this client
+        :return: collection handle
+        """
+        model_class = model if isinstance(model, type) else model.__class__
+        alias = self.get_database_alias(model_class, using=using)
+        if read_preference or read_concern or max_staleness or codec_options:
+            return self.get_collection(
+                model.get_db_collection(),
+                codec_options=codec_options,
+                using=alias,
+                **model_class.get_db_options(
+                    read_preference=read_preference,
+                    read_concern=read_concern,
+                    max_staleness=max_staleness,
+                )
+            )
+
+        database = self.get_database(alias)
+        cached = model_class.__dict__.get("_collection_handle")
+        if cached is not None and cached[0] is self:
+            if cached[1] is database:
+                return cached[2]
+
+        collection = self.get_collection(
+            model.get_db_collection(),
+            using=alias,
+            **model_class.get_db_options()
+        )
+        setattr(
+            model_class, "_collection_handle", (self, database, collection)
+        )
+        return collection
+
+    @staticmethod
+    def get_max_time_ms(model: MongoDBModel, max_time_ms: int = None) -> int:
+        """
+        Gets time limit of the query of the model on server.
+
+        :param model: model class or instance
+        :param max_time_ms: limit, explicitly passed to the call
+        :return: limit in ms or None, if there is no limit
+        """
+        return max_time_ms or getattr(model.Meta, "max_time_ms", None)
+
+    @staticmethod
+    def get_batch_size(
+        model: MongoDBModel, batch_size: int = None, limit: int = 0
+    ) -> int:
+        """
+        Gets number of documents, returned by server per round trip
+        (default batching is 101 documents first, then 16MB batches).
+
+        :param model: model class or instance
+        :param batch_size: size, explicitly passed to the call
+        :param limit: limit of the query, so that page arrives at once
+        :return: batch size or None, if server default should be used
+        """
+        return (
+            batch_size or getattr(model.Meta, "batch_size", None) or limit
+        ) or None
+
+    @staticmethod
+    def get_projection(projection: dict = None) -> dict:
+        """
+        Renames `id` field of projection to `_id`, as it is stored in DB,
+        unless `_id` is projected explicitly (e.g. `{"id": "$_id"}`).
+
+        :param projection: dict of field names to include (1) or exclude (0)
+        :return: projection to use in query
+        """
+        if not projection or "id" not in projection or "_id" in projection:
+            return projection
+        projection = dict(projection)
+        projection["_id"] = projection.pop("id")
+        return projection
+
+    def get_collection_session(
+        self, collection: Collection, session: ClientSession = None
+    ) -> Optional[ClientSession]:
+        """
+        Gets session of the call: explicitly passed one or the session of
+        transaction, run in the current context (see `transaction`).
+
+        :param collection: collection handle of the call
+        :param session: explicitly passed session
+        :return: session or None, if there is no transaction
+        """
+        if session is not None:
+            return session
+        session = get_session()
+        if session is not None and (
+            session.client is not collection.database.client
+        ):
+            raise ValueError(
+                f"Collection {collection.name!r} is on other MongoDB "
+                f"connection than the transaction"
+            )
+        return session
 
     async def insert(
         self,
@@ -40,83 +253,199 @@ class MongoDBClient(object):
         session: ClientSession = None,
         include=None,
         exclude=None,
+        _using: str = None,
     ) -> InsertOneResult:
         data = model.dict(include=include, exclude=exclude)
         data["_id"] = data.pop("id")
-        collection_name = model.get_db_collection()
-        collection = self.get_collection(collection_name)
+        collection = self.get_model_collection(model, using=_using)
+        session = self.get_collection_session(collection, session)
         return await collection.insert_one(data, session=session)
 
     async def count(
-        self, model: MongoDBModel, session: ClientSession = None, **kwargs
+        self,
+        model: MongoDBModel,
+        session: ClientSession = None,
+        _read_preference=None,
+        _read_concern=None,
+        _max_staleness: int = None,
+        _max_time_ms: int = None,
+        _using: str = None,
+        _filter: Q = None,
+        **kwargs
     ) -> int:
-        _id = kwargs.pop("id", notset)
-        if _id != notset:
-            kwargs["_id"] = _id
+        query = build_filter(kwargs, _filter)
 
-        collection_name = model.get_db_collection()
-        collection = self.get_collection(collection_name)
-        res = await collection.count_documents(kwargs, session=session)
+        collection = self.get_model_collection(
+            model,
+            read_preference=_read_preference,
+            read_concern=_read_concern,
+            max_staleness=_max_staleness,
+            using=_using,
+        )
+        session = self.get_collection_session(collection, session)
+        max_time_ms = self.get_max_time_ms(model, _max_time_ms)
+        options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+        res = await collection.count_documents(
+            query, session=session, **options
+        )
         return res
 
     async def delete(
-        self, model: MongoDBModel, session: ClientSession = None, **kwargs
+        self,
+        model: MongoDBModel,
+        session: ClientSession = None,
+        _using: str = None,
+        _filter: Q = None,
+        **kwargs
     ) -> DeleteResult:
-        _id = kwargs.pop("id", notset)
-        if _id != notset:
-            kwargs["_id"] = _id
+        query = build_filter(kwargs, _filter)
 
-        collection_name = model.get_db_collection()
-        collection = self.get_collection(collection_name)
-        res = await collection.delete_many(kwargs, session=session)
+        collection = self.get_model_collection(model, using=_using)
+        session = self.get_collection_session(collection, session)
+        res = await collection.delete_many(query, session=session)
         return res
 
     async def update_one(
         self,
         model: MongoDBModel,
-        filter_kwargs: dict,
+        filter_kwargs: Union[dict, Q],
         session: ClientSession = None,
+        upsert: bool = False,
+        _using: str = None,
         **kwargs
     ) -> UpdateResult:
-        _id = filter_kwargs.pop("id", notset)
-        if _id != notset:
-            filter_kwargs["_id"] = _id
+        query = build_filter(filter_kwargs)
 
-        collection_name = model.get_db_collection()
-        collection = self.get_collection(collection_name)
+        options = {"upsert": True} if upsert else {}
+        collection = self.get_model_collection(model, using=_using)
+        session = self.get_collection_session(collection, session)
         res = await collection.update_one(
-            filter_kwargs, kwargs, session=session
+            query, kwargs, session=session, **options
         )
         return res
 
     async def update_many(
         self,
         model: MongoDBModel,
-        filter_kwargs: dict,
+        filter_kwargs: Union[dict, Q],
         session: ClientSession = None,
+        upsert: bool = False,
+        _using: str = None,
         **kwargs
     ) -> UpdateResult:
-        _id = filter_kwargs.pop("id", notset)
-        if _id != notset:
-            filter_kwargs["_id"] = _id
+        query = build_filter(filter_kwargs)
 
-        collection_name = model.get_db_collection()
-        collection = self.get_collection(collection_name)
+        options = {"upsert": True} if upsert else {}
+        collection = self.get_model_collection(model, using=_using)
+        session = self.get_collection_session(collection, session)
         res = await collection.update_many(
-            filter_kwargs, kwargs, session=session
+            query, kwargs, session=session, **options
+        )
+        return res
+
+    async def find_one_and_update(
+        self,
+        model: MongoDBModel,
+        filter_kwargs: Union[dict, Q],
+        session: ClientSession = None,
+        projection: dict = None,
+        sort: list = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        _using: str = None,
+        **kwargs
+    ) -> dict:
+        query = build_filter(filter_kwargs)
+
+        collection = self.get_model_collection(model, using=_using)
+        session = self.get_collection_session(collection, session)
+        res = await collection.find_one_and_update(
+            query,
+            kwargs,
+            projection=self.get_projection(projection),
+            sort=sort,
+            upsert=upsert,
+            return_document=return_document,
+            session=session,
+        )
+        return res
+
+    async def find_one_and_replace(
+        self,
+        model: MongoDBModel,
+        filter_kwargs: Union[dict, Q],
+        replacement: MongoDBModel,
+        session: ClientSession = None,
+        projection: dict = None,
+        sort: list = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        _using: str = None,
+    ) -> dict:
+        query = build_filter(filter_kwargs)
+
+        data = replacement.dict()
+        data["_id"] = data.pop("id")
+        collection = self.get_model_collection(model, using=_using)
+        session = self.get_collection_session(collection, session)
+        res = await collection.find_one_and_replace(
+            query,
+            data,
+            projection=self.get_projection(projection),
+            sort=sort,
+            upsert=upsert,
+            return_document=return_document,
+            session=session,
+        )
+        return res
+
+    async def find_one_and_delete(
+        self,
+        model: MongoDBModel,
+        session: ClientSession = None,
+        projection: dict = None,
+        sort: list = None,
+        _using: str = None,
+        _filter: Q = None,
+        **kwargs
+    ) -> dict:
+        query = build_filter(kwargs, _filter)
+
+        collection = self.get_model_collection(model, using=_using)
+        session = self.get_collection_session(collection, session)
+        res = await collection.find_one_and_delete(
+            query,
+            projection=self.get_projection(projection),
+            sort=sort,
+            session=session,
         )
         return res
 
     async def get(
-        self, model: MongoDBModel, session: ClientSession = None, **kwargs
+        self,
+        model: MongoDBModel,
+        session: ClientSession = None,
+        _read_preference=None,
+        _read_concern=None,
+        _max_staleness: int = None,
+        _max_time_ms: int = None,
+        _using: str = None,
+        _filter: Q = None,
+        **kwargs
     ) -> dict:
-        _id = kwargs.pop("id", notset)
-        if _id != notset:
-            kwargs["_id"] = _id
+        query = build_filter(kwargs, _filter)
 
-        collection_name = model.get_db_collection()
-        collection = self.get_collection(collection_name)
-        res = await collection.find_one(kwargs, session=session)
+        collection = self.get_model_collection(
+            model,
+            read_preference=_read_preference,
+            read_concern=_read_concern,
+            max_staleness=_max_staleness,
+            using=_using,
+        )
+        session = self.get_collection_session(collection, session)
+        max_time_ms = self.get_max_time_ms(model, _max_time_ms)
+        options = {"max_time_ms": max_time_ms} if max_time_ms else {}
+        res = await collection.find_one(query, session=session, **options)
         return res
 
     def list(
@@ -126,14 +455,97 @@ class MongoDBClient(object):
         _offset: int = 0,
         _limit: int = 0,
         _sort: list = None,
+        _read_preference=None,
+        _read_concern=None,
+        _max_staleness: int = None,
+        _max_time_ms: int = None,
+        _using: str = None,
+        _filter: Q = None,
+        _projection: dict = None,
+        _raw_bson: bool = False,
+        _batch_size: int = None,
+        _exhaust: bool = False,
         **kwargs
     ) -> Cursor:
-        _id = kwargs.pop("id", notset)
-        if _id != notset:
-            kwargs["_id"] = _id
+        query = build_filter(kwargs, _filter)
 
-        collection_name = model.get_db_collection()
-        collection = self.get_collection(collection_name)
+        collection = self.get_model_collection(
+            model,
+            read_preference=_read_preference,
+            read_concern=_read_concern,
+            max_staleness=_max_staleness,
+            using=_using,
+            codec_options=self.raw_codec_options if _raw_bson else None,
+        )
+        session = self.get_collection_session(collection, session)
+        max_time_ms = self.get_max_time_ms(model, _max_time_ms)
+        options = {"max_time_ms": max_time_ms} if max_time_ms else {}
+        if _projection:
+            options["projection"] = self.get_projection(_projection)
+        batch_size = self.get_batch_size(model, _batch_size, _limit)
+        if batch_size:
+            options["batch_size"] = batch_size
+        if _exhaust:
+            # Server streams all batches without getMore, can't be limited
+            if _limit:
+                raise ValueError("Exhaust cursor can't be used with _limit")
+            options["cursor_type"] = CursorType.EXHAUST
         return collection.find(
-            kwargs, session=session, skip=_offset, limit=_limit, sort=_sort
+            query,
+            session=session,
+            skip=_offset,
+            limit=_limit,
+            sort=_sort,
+            **options
+        )
+
+    def aggregate(
+        self,
+        model: MongoDBModel,
+        pipeline: list,
+        session: ClientSession = None,
+        allow_disk_use: bool = None,
+        batch_size: int = None,
+        _read_preference=None,
+        _read_concern=None,
+        _max_staleness: int = None,
+        _max_time_ms: int = None,
+        _using: str = None,
+    ) -> CommandCursor:
+        options = {}
+        if allow_disk_use is not None:
+            options["allowDiskUse"] = allow_disk_use
+        batch_size = self.get_batch_size(model, batch_size)
+        if batch_size:
+            options["batchSize"] = batch_size
+        max_time_ms = self.get_max_time_ms(model, _max_time_ms)
+        if max_time_ms:
+            options["maxTimeMS"] = max_time_ms
+
+        collection = self.get_model_collection(
+            model,
+            read_preference=_read_preference,
+            read_concern=_read_concern,
+            max_staleness=_max_staleness,
+            using=_using,
+        )
+        session = self.get_collection_session(collection, session)
+        return collection.aggregate(pipeline, session=session, **options)
+
+    def watch(
+        self,
+        model: MongoDBModel,
+        pipeline: list = None,
+        session: ClientSession = None,
+        full_document: str = None,
+        resume_after: dict = None,
+        _using: str = None,
+    ) -> ChangeStream:
+        # Change streams can't be opened in transaction, so no `get_session`
+        collection = self.get_model_collection(model, using=_using)
+        return collection.watch(
+            pipeline,
+            full_document=full_document,
+            resume_after=resume_after,
+            session=session,
         )
@@ -1,11 +1,38 @@
-from datetime import datetime
-from typing import List, Optional
-
-from pydantic import validator, BaseModel
-from pymongo.results import UpdateResult, DeleteResult
+import asyncio
 
-from fastapi_contrib.common.utils import async_timing, get_now
-from fastapi_contrib.db.utils import get_db_client, get_next_id
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    FrozenSet,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+
+from pydantic import validator, BaseModel, PrivateAttr
+from pydantic.fields import ModelField
+
+from fastapi_contrib.common.utils import async_timing, get_now, logger
+from fastapi_contrib.conf import settings
+from fastapi_contrib.db.profiling import profile_query
+from fastapi_contrib.db.utils import (
+    get_db_client,
+    get_next_id,
+    get_read_concern,
+    get_read_preference,
+    get_write_concern,
+    index_differs,
+    register_model,
+)
+from fastapi_contrib.exceptions import ConflictError
+
+if TYPE_CHECKING:  # pragma: no cover
+    from bson.raw_bson import RawBSONDocument
+    from pymongo.results import UpdateResult, DeleteResult
 
 
 class NotSet(object):
@@ -15,6 +42,69 @@ class NotSet(object):
 notset = NotSet()
 
 
+async def iterate_cursor(
+    cursor: Any, rename_id: bool = True
+) -> AsyncIterator[dict]:
+    """
+    Iterates over documents of cursor, renaming `_id` to `id`.
+    If iteration is cancelled (e.g. request timed out) or stopped early,
+    cursor is closed, so that query doesn't keep running on server.
+
+    :param cursor: motor cursor (or command cursor)
+    :param rename_id: whether to rename `_id` (not for raw BSON documents)
+    :return: async iterator of documents
+    """
+    try:
+        async for document in cursor:
+            if rename_id and "_id" in document:
+                document["id"] = document.pop("_id")
+            yield document
+    except (asyncio.CancelledError, GeneratorExit):
+        await cursor.close()
+        raise
+
+
+class Record(object):
+    """
+    Lightweight record of model's document, which keeps only values
+    of model fields in slots, without validation & per-instance dict.
+    Classes of records are generated per model (see:
+    `MongoDBModel.get_record_class`).
+
+    Records are converted to dicts with `dict(record)`, so they are
+    serialized to JSON by FastAPI as is (also as `response_model`).
+    """
+
+    __slots__ = ()
+
+    _fields: Tuple[str, ...] = ()
+    _model_fields: Tuple[ModelField, ...] = ()
+
+    def __init__(self, document: dict):
+        for name, field in zip(self._fields, self._model_fields):
+            if name in document:
+                setattr(self, name, document[name])
+            else:
+                # Copy of default (or generated one) for every record
+                setattr(self, name, field.get_default())
+
+    def __iter__(self):
+        for name in self._fields:
+            yield name, getattr(self, name)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={value!r}" for name, value in self)
+        return f"{self.__class__.__name__}({values})"
+
+    def _asdict(self) -> dict:
+        return dict(self)
+
+
 class MongoDBModel(BaseModel):
     """
     Base Model to use for any information saving in MongoDB.
@@ -38,10 +128,62 @@ class MongoDBModel(BaseModel):
         assert mymodel.optional_field2 == 42
         assert isinstance(mymodel.id, int)
 
+    Reads & writes could be routed per model with following `Meta` options:
+        * read_preference - name of read preference mode
+                            (e.g. "secondaryPreferred") or pymongo's object
+        * max_staleness - max replication lag (seconds) of secondaries to read
+        * read_concern - read concern level (e.g. "majority") or object
+        * write_concern - dict of write concern options or pymongo's object
+
+    `get`, `list` & `count` also accept `_read_preference`, `_read_concern`
+    and `_max_staleness` to override them per call.
+
+    Time limit of queries on server (`get`, `list`, `count` & `aggregate`)
+    is set with `Meta.max_time_ms` or `_max_time_ms` per call.
+
+    Number of documents per round trip of `list` & `aggregate` is set with
+    `Meta.batch_size` or per call (`list` defaults to `_limit`).
+
+    `Meta.using` is alias of MongoDB connection (from
+    `settings.mongodb_connections`) to store the model in, every method
+    (except `save`) accepts `_using` to override it per call.
+
+    Fields, assigned after the instance was created (or saved), are tracked
+    and `update` sends only them to MongoDB:
+
+    .. code-block:: python
+
+        mymodel = await MyModel.get(id=1)
+        mymodel.optional_field2 = 43
+        await mymodel.update()  # {"$set": {"optional_field2": 43}}
+
+    Set `Meta.version_field` to the name of int field to update instance
+    only if the version hasn't changed since it was loaded.
     """
 
     id: int = None
 
+    _changed_fields: FrozenSet[str] = PrivateAttr(default=frozenset())
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        register_model(cls)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.__fields__:
+            # Reassigned instead of mutated, so that copies don't share it
+            self._changed_fields = self._changed_fields | {name}
+
+    def get_changed_fields(self) -> Set[str]:
+        """
+        Gets names of fields, assigned since the instance was created,
+        saved or updated.
+
+        :return: set of field names
+        """
+        return set(self._changed_fields)
+
     @validator("id", pre=True, always=True)
     def set_id(cls, v, values, **kwargs) -> int:
         """
@@ -56,26 +198,101 @@ class MongoDBModel(BaseModel):
     def get_db_collection(cls) -> str:
         return cls.Meta.collection
 
+    @classmethod
+    def get_db_options(
+        cls, read_preference=None, read_concern=None, max_staleness=None
+    ) -> dict:
+        """
+        Gets options for collection handle of this model from its `Meta`,
+        optionally overridden by arguments. `Meta.max_staleness` is applied
+        only to `Meta.read_preference`.
+
+        :return: dict of read preference, read concern & write concern
+        """
+        if read_preference is None:
+            read_preference = getattr(cls.Meta, "read_preference", None)
+            max_staleness = max_staleness or getattr(
+                cls.Meta, "max_staleness", None
+            )
+
+        return {
+            "read_preference": get_read_preference(
+                read_preference, max_staleness
+            ),
+            "read_concern": get_read_concern(
+                read_concern or getattr(cls.Meta, "read_concern", None)
+            ),
+            "write_concern": get_write_concern(
+                getattr(cls.Meta, "write_concern", None)
+            ),
+        }
+
+    @classmethod
+    def get_record_class(cls) -> Type[Record]:
+        """
+        Gets `Record` class with slots for fields of this model, which is
+        generated once and then stored on the model class. Missing fields
+        are set to their defaults (copied or generated by `default_factory`
+        for every record, as in model instances).
+
+        :return: subclass of `Record`
+        """
+        record_class = cls.__dict__.get("_record_class")
+        if record_class is None:
+            fields = tuple(cls.__fields__)
+            record_class = type(
+                f"{cls.__name__}Record",
+                (Record,),
+                {
+                    "__slots__": fields,
+                    "__module__": cls.__module__,
+                    "_fields": fields,
+                    "_model_fields": tuple(cls.__fields__.values()),
+                },
+            )
+            setattr(cls, "_record_class", record_class)
+        return record_class
+
+    @classmethod
+    def from_db(
+        cls, document: Optional[dict], validate: bool = True
+    ) -> Optional["MongoDBModel"]:
+        """
+        Makes instance out of document from DB, renaming `_id` to `id`.
+
+        :param document: dict from DB or None
+        :param validate: whether to validate document, otherwise (e.g. for
+                         partial documents of projection) instance is
+                         constructed as is, missing fields get defaults
+                         and `id` is None if it's missing
+        :return: instance or None, if there is no document
+        """
+        if not document:
+            return None
+
+        document["id"] = document.pop("_id", None)
+        if not validate:
+            return cls.construct(**document)
+        return cls(**document)
+
     @classmethod
     @async_timing
+    @profile_query("find")
     async def get(cls, **kwargs) -> Optional["MongoDBModel"]:
         db = get_db_client()
         result = await db.get(cls, **kwargs)
-        if not result:
-            return None
-
-        result["id"] = result.pop("_id")
-        return cls(**result)
+        return cls.from_db(result)
 
     @classmethod
     @async_timing
-    async def delete(cls, **kwargs) -> DeleteResult:
+    async def delete(cls, **kwargs) -> "DeleteResult":
         db = get_db_client()
         result = await db.delete(cls, **kwargs)
         return result
 
     @classmethod
     @async_timing
+    @profile_query("count")
     async def count(cls, **kwargs) -> int:
         db = get_db_client()
         result = await db.count(cls, **kwargs)
@@ -83,22 +300,211 @@ class MongoDBModel(BaseModel):
 
     @classmethod
     @async_timing
-    async def list(cls, raw=True, _limit=0, _offset=0, _sort=None, **kwargs):
+    @profile_query("find")
+    async def list(
+        cls,
+        raw=True,
+        _limit=0,
+        _offset=0,
+        _sort=None,
+        stream=False,
+        as_records=False,
+        **kwargs
+    ):
+        """
+        Retrieves documents of this model, filtered by kwargs.
+
+        Documents are fetched in batches of `_batch_size`, `Meta.batch_size`
+        or `_limit` (so that the page arrives in one round trip). Large scans
+        could be streamed, optionally with exhaust cursor, which makes
+        server send all batches without waiting for `getMore` requests
+        (can't be limited and isn't supported by mongos):
+
+        .. code-block:: python
+
+            async for document in await Event.list(stream=True, _exhaust=True):
+                ...
+
+        To save memory on large pages, documents could be returned as
+        records of the model (`as_records`), which keep fields in slots
+        and aren't validated (see: `get_record_class`).
+
+        :param raw: whether to return dicts instead of model instances
+        :param as_records: whether to return records instead of dicts
+                           or model instances
+        :param stream: whether to return async iterator over documents
+                       instead of all of them
+        :param kwargs: filters & read options (`_batch_size`, `_exhaust`,
+                       `_read_preference`, `_using`, etc.)
+        :return: list of dicts (or records, if `as_records`, or iterator
+                 of instances, if not `raw`), or async iterator of them,
+                 if `stream`
+        """
         db = get_db_client()
         cursor = db.list(
             cls, _limit=_limit, _offset=_offset, _sort=_sort, **kwargs
         )
 
-        result = []
-        async for document in cursor:
-            document["id"] = document.pop("_id")
-            result.append(document)
+        if as_records:
+            record_class = cls.get_record_class()
+            records = (
+                record_class(document)
+                async for document in iterate_cursor(cursor)
+            )
+            if stream:
+                return records
+            return [record async for record in records]
+
+        if stream:
+            if raw:
+                return iterate_cursor(cursor)
+            return (cls(**record) async for record in iterate_cursor(cursor))
+
+        result = [document async for document in iterate_cursor(cursor)]
 
         if not raw:
             return (cls(**record) for record in result)
 
         return result
 
+    @classmethod
+    @async_timing
+    @profile_query("find")
+    async def list_raw_bson(
+        cls, _limit=0, _offset=0, _sort=None, _fields=None, **kwargs
+    ) -> List["RawBSONDocument"]:
+        """
+        Same as `list`, but documents are neither decoded into dicts
+        nor validated: they're read as `RawBSONDocument`s, which keep
+        undecoded bytes of BSON, to be converted straight to JSON by
+        `fastapi_contrib.common.responses.RawBSONResponse`:
+
+        .. code-block:: python
+
+            @app.get("/", response_class=RawBSONResponse)
+            async def list_users():
+                return RawBSONResponse(await User.list_raw_bson())
+
+        Projection of fields is applied on server, `_id` is renamed to `id`
+        there too (requires MongoDB 4.4+).
+
+        :param _fields: names of fields to return, defaults to all
+                        fields of the model
+        :param kwargs: filters & read options, same as in `list`
+        :return: list of raw BSON documents
+        """
+        if _fields is None:
+            _fields = cls.__fields__
+        projection = {"_id": 0, "id": "$_id"}
+        projection.update({field: 1 for field in _fields if field != "id"})
+
+        db = get_db_client()
+        cursor = db.list(
+            cls,
+            _limit=_limit,
+            _offset=_offset,
+            _sort=_sort,
+            _projection=projection,
+            _raw_bson=True,
+            **kwargs
+        )
+        return [
+            document
+            async for document in iterate_cursor(cursor, rename_id=False)
+        ]
+
+    @classmethod
+    @async_timing
+    async def aggregate(
+        cls,
+        pipeline: list,
+        allow_disk_use: bool = None,
+        batch_size: int = None,
+        stream: bool = False,
+        **kwargs
+    ):
+        """
+        Runs aggregation pipeline on the collection of this model.
+        `_id` of resulting documents is renamed to `id`, same as in `list`.
+
+        .. code-block:: python
+
+            totals = await Order.aggregate(
+                [{"$group": {"_id": "$user_id", "total": {"$sum": "$sum"}}}]
+            )
+
+            async for document in await Order.aggregate(pipeline, stream=True):
+                ...
+
+        :param pipeline: list of aggregation stages
+        :param allow_disk_use: whether stages could write temporary files
+        :param batch_size: number of documents to fetch per round trip,
+                           defaults to `Meta.batch_size`
+        :param stream: whether to return async iterator over documents
+                       instead of list of all of them
+        :param kwargs: read options (`_read_preference`, `_using`, etc.)
+        :return: list of dicts or async iterator of them, if `stream`
+        """
+        db = get_db_client()
+        cursor = db.aggregate(
+            cls,
+            pipeline,
+            allow_disk_use=allow_disk_use,
+            batch_size=batch_size,
+            **kwargs
+        )
+        if stream:
+            return iterate_cursor(cursor)
+        return [document async for document in iterate_cursor(cursor)]
+
+    @classmethod
+    async def watch(
+        cls,
+        pipeline: list = None,
+        full_document: str = None,
+        resume_after: dict = None,
+        **kwargs
+    ) -> AsyncIterator[dict]:
+        """
+        Iterates over changes in the collection of this model (requires
+        replica set), until the iteration is stopped:
+
+        .. code-block:: python
+
+            async for change in MyModel.watch(full_document="updateLookup"):
+                print(change["operationType"], change["documentKey"])
+
+        To watch changes in background, resuming after errors & restarts,
+        see `fastapi_contrib.db.watchers.ChangeWatcher`.
+
+        :param pipeline: list of aggregation stages to filter changes
+        :param full_document: "updateLookup" to get whole updated documents
+        :param resume_after: token (`_id` of change) to resume after
+        :param kwargs: `_using` to override connection alias of the model
+        :return: async iterator of change events
+        """
+        db = get_db_client()
+        async with db.watch(
+            cls,
+            pipeline=pipeline,
+            full_document=full_document,
+            resume_after=resume_after,
+            **kwargs
+        ) as stream:
+            async for change in stream:
+                yield change
+
+    @classmethod
+    async def on_change(cls, change: dict) -> None:
+        """
+        Hook, invoked by `ChangeWatcher` for every change in the collection
+        of this model (e.g. to invalidate cached instances).
+
+        :param change: change event
+        :return: None
+        """
+        ...
+
     @async_timing
     async def save(
         self,
@@ -116,11 +522,69 @@ class MongoDBModel(BaseModel):
 
         insert_result = await db.insert(self, include=include, exclude=exclude)
         self.id = insert_result.inserted_id
+        self._changed_fields = frozenset()
         return self.id
 
+    @async_timing
+    async def update(self, _using: str = None) -> Optional["UpdateResult"]:
+        """
+        Updates only changed fields of this instance in MongoDB with `$set`,
+        fields set to None are removed with `$unset`, if their default is
+        None too (so that they are read back as None). `id` is never
+        updated, document is matched by it.
+
+        If `Meta.version_field` is set, document is updated only if its
+        version is the same as of this instance, and the version is
+        incremented.
+
+        :param _using: overrides connection alias of the model
+        :raises ConflictError: if document was changed by someone else
+        :return: result of update operation or None, if nothing changed
+        """
+        changed = self.get_changed_fields()
+        version_field = getattr(self.Meta, "version_field", None)
+        changed.discard(version_field)
+        changed.discard("id")
+        if not changed:
+            return None
+
+        data = self.dict(include=changed)
+        update = {}
+        to_unset = {
+            name: ""
+            for name, value in data.items()
+            if value is None
+            and self.__fields__[name].default is None
+            and self.__fields__[name].default_factory is None
+        }
+        if to_unset:
+            update["$unset"] = to_unset
+        to_set = {k: v for k, v in data.items() if k not in to_unset}
+        if to_set:
+            update["$set"] = to_set
+
+        filter_kwargs = {"id": self.id}
+        if version_field is not None:
+            version = getattr(self, version_field)
+            filter_kwargs[version_field] = version
+            update["$inc"] = {version_field: 1}
+
+        db = get_db_client()
+        result = await db.update_one(
+            self, filter_kwargs=filter_kwargs, _using=_using, **update
+        )
+        if version_field is not None:
+            if not result.matched_count:
+                raise ConflictError(
+                    detail=f"{self.__class__.__name__} has been changed."
+                )
+            setattr(self, version_field, (version or 0) + 1)
+        self._changed_fields = frozenset()
+        return result
+
     @classmethod
     @async_timing
-    async def update_one(cls, filter_kwargs: dict, **kwargs) -> UpdateResult:
+    async def update_one(cls, filter_kwargs: dict, **kwargs) -> "UpdateResult":
         db = get_db_client()
         result = await db.update_one(
             cls, filter_kwargs=filter_kwargs, **kwargs
@@ -129,20 +593,158 @@ class MongoDBModel(BaseModel):
 
     @classmethod
     @async_timing
-    async def update_many(cls, filter_kwargs: dict, **kwargs) -> UpdateResult:
+    async def update_many(
+        cls, filter_kwargs: dict, **kwargs
+    ) -> "UpdateResult":
         db = get_db_client()
         result = await db.update_many(
             cls, filter_kwargs=filter_kwargs, **kwargs
         )
         return result
 
+    @classmethod
+    @async_timing
+    async def find_one_and_update(
+        cls,
+        filter_kwargs: dict,
+        projection: dict = None,
+        sort: list = None,
+        upsert: bool = False,
+        return_document: bool = False,
+        **kwargs
+    ) -> Optional["MongoDBModel"]:
+        """
+        Atomically updates single document and returns it as instance:
+
+        .. code-block:: python
+
+            job = await Job.find_one_and_update(
+                {"status": "new"},
+                sort=[("created", 1)],
+                return_document=True,
+                **{"$set": {"status": "running"}},
+            )
+
+        :param filter_kwargs: filters of document to update
+        :param projection: fields to include (1) or exclude (0) in instance,
+                           which is then constructed without validation
+        :param sort: list of (key, direction) pairs to pick first document
+        :param upsert: whether to insert document if none matched
+        :param return_document: whether to return document after update
+                                (`ReturnDocument.AFTER`) instead of before
+        :param kwargs: update operators (and `_using`)
+        :return: instance or None, if nothing matched
+        """
+        db = get_db_client()
+        result = await db.find_one_and_update(
+            cls,
+            filter_kwargs=filter_kwargs,
+            projection=projection,
+            sort=sort,
+            upsert=upsert,
+            return_document=return_document,
+            **kwargs
+        )
+        return cls.from_db(result, validate=projection is None)
+
+    @classmethod
+    @async_timing
+    async def find_one_and_replace(
+        cls,
+        filter_kwargs: dict,
+        replacement: "MongoDBModel",
+        projection: dict = None,
+        sort: list = None,
+        upsert: bool = False,
+        return_document: bool = False,
+        _using: str = None,
+    ) -> Optional["MongoDBModel"]:
+        """
+        Atomically replaces single document with the instance
+        and returns the replaced (or new one) as instance.
+
+        :param filter_kwargs: filters of document to replace
+        :param replacement: instance to store instead of document
+        :param projection: fields to include (1) or exclude (0) in instance,
+                           which is then constructed without validation
+        :param sort: list of (key, direction) pairs to pick first document
+        :param upsert: whether to insert document if none matched
+        :param return_document: whether to return document after replace
+                                (`ReturnDocument.AFTER`) instead of before
+        :param _using: overrides connection alias of the model
+        :return: instance or None, if nothing matched
+        """
+        db = get_db_client()
+        result = await db.find_one_and_replace(
+            cls,
+            filter_kwargs=filter_kwargs,
+            replacement=replacement,
+            projection=projection,
+            sort=sort,
+            upsert=upsert,
+            return_document=return_document,
+            _using=_using,
+        )
+        return cls.from_db(result, validate=projection is None)
+
+    @classmethod
+    @async_timing
+    async def find_one_and_delete(
+        cls, projection: dict = None, sort: list = None, **kwargs
+    ) -> Optional["MongoDBModel"]:
+        """
+        Atomically deletes single document and returns it as instance.
+
+        :param projection: fields to include (1) or exclude (0) in instance,
+                           which is then constructed without validation
+        :param sort: list of (key, direction) pairs to pick first document
+        :param kwargs: filters of document to delete (and `_using`)
+        :return: instance or None, if nothing matched
+        """
+        db = get_db_client()
+        result = await db.find_one_and_delete(
+            cls, projection=projection, sort=sort, **kwargs
+        )
+        return cls.from_db(result, validate=projection is None)
+
     @classmethod
     @async_timing
     async def create_indexes(cls) -> Optional[List[str]]:
+        """
+        Creates only those indexes from `Meta.indexes`, which are missing
+        in the collection. Indexes with the same name but different keys
+        or options are logged, or dropped and created again if
+        `settings.mongodb_indexes_recreate` is enabled.
+
+        :return: list of names of created indexes
+        """
         if hasattr(cls.Meta, "indexes"):
             db = get_db_client()
-            collection = db.get_collection(cls.Meta.collection)
-            return await collection.create_indexes(cls.Meta.indexes)
+            collection = db.get_model_collection(cls)
+
+            existing = {}
+            async for index in collection.list_indexes():
+                existing[index["name"]] = index
+
+            missing = []
+            for index in cls.Meta.indexes:
+                document = index.document
+                current = existing.get(document["name"])
+                if current is not None and index_differs(document, current):
+                    if not settings.mongodb_indexes_recreate:
+                        logger.warning(
+                            f"Index {document['name']} of {cls.__name__} "
+                            f"differs from Meta.indexes, not recreated"
+                        )
+                        continue
+                    await collection.drop_index(document["name"])
+                    current = None
+                if current is None:
+                    missing.append(index)
+
+            if not missing:
+                return []
+            return await collection.create_indexes(missing)
 
     class Config:
         anystr_strip_whitespace = True
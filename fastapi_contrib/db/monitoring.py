@@ -0,0 +1,257 @@
+import threading
+
+from time import monotonic
+from typing import Dict, List, Tuple
+
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
+
+
+class MetricsRegistry(object):
+    """
+    Thread-safe in-process registry of counters, gauges & timings.
+
+    Every metric is identified by its name and labels, e.g.:
+
+    .. code-block:: python
+
+        metrics.observe("mongodb.command.duration_ms", 1.5, collection="users")
+        metrics.snapshot()["timings"]
+        # {'mongodb.command.duration_ms{collection=users}': {'count': 1, ...}}
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Removes all collected metrics.
+        """
+        with self._lock:
+            self.counters: Dict[Tuple, float] = {}
+            self.gauges: Dict[Tuple, float] = {}
+            self.timings: Dict[Tuple, list] = {}
+
+    @staticmethod
+    def get_key(name: str, labels: dict) -> Tuple:
+        return (name,) + tuple(sorted(labels.items()))
+
+    @staticmethod
+    def format_key(key: Tuple) -> str:
+        name, labels = key[0], key[1:]
+        if not labels:
+            return name
+        labels = ",".join(f"{label}={value}" for label, value in labels)
+        return f"{name}{{{labels}}}"
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increments counter (or gauge, if it already exists) by value.
+
+        :param name: name of the metric
+        :param value: value to add (could be negative for gauges)
+        :param labels: labels of the metric
+        """
+        key = self.get_key(name, labels)
+        with self._lock:
+            metrics = self.gauges if key in self.gauges else self.counters
+            metrics[key] = metrics.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """
+        Sets current value of the gauge.
+
+        :param name: name of the metric
+        :param value: current value
+        :param labels: labels of the metric
+        """
+        key = self.get_key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Records single observation (e.g. duration in ms) of the timing.
+
+        :param name: name of the metric
+        :param value: observed value
+        :param labels: labels of the metric
+        """
+        key = self.get_key(name, labels)
+        with self._lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                self.timings[key] = [1, value, value]
+            else:
+                timing[0] += 1
+                timing[1] += value
+                timing[2] = max(timing[2], value)
+
+    def get_counters(self, name: str) -> List[Tuple[dict, float]]:
+        """
+        Gets all counters with the name, regardless of their labels.
+
+        :param name: name of the metric
+        :return: list of 2-tuples: labels dict & value of the counter
+        """
+        with self._lock:
+            return [
+                (dict(key[1:]), value)
+                for key, value in self.counters.items()
+                if key[0] == name
+            ]
+
+    def snapshot(self) -> dict:
+        """
+        Gets current values of all metrics, with formatted metric names.
+
+        :return: dict with counters, gauges & timings
+        """
+        with self._lock:
+            return {
+                "counters": {
+                    self.format_key(k): v for k, v in self.counters.items()
+                },
+                "gauges": {
+                    self.format_key(k): v for k, v in self.gauges.items()
+                },
+                "timings": {
+                    self.format_key(k): {
+                        "count": count,
+                        "total": total,
+                        "max": _max,
+                        "mean": total / count,
+                    }
+                    for k, (count, total, _max) in self.timings.items()
+                },
+            }
+
+
+metrics = MetricsRegistry()
+
+
+class PoolMetricsListener(ConnectionPoolListener):
+    """
+    Records connection pool metrics for every server address:
+        * mongodb.pool.size - gauge of open connections
+        * mongodb.pool.checked_out - gauge of connections in use
+        * mongodb.pool.checkout_wait_ms - time spent waiting for connection
+        * mongodb.pool.checkout_failed - counter of failed checkouts
+        * mongodb.pool.cleared - counter of pool clears (e.g. on errors)
+
+    Enabled by `settings.mongodb_monitoring` (see `setup_mongodb`).
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or metrics
+        # Checkouts are blocking, so each one happens within single thread
+        self._checkouts = threading.local()
+
+    @staticmethod
+    def get_address(event) -> str:
+        return "{}:{}".format(*event.address)
+
+    def get_wait_ms(self, event) -> float:
+        started = getattr(self._checkouts, "started", {}).pop(
+            event.address, None
+        )
+        if started is None:
+            return None
+        return (monotonic() - started) * 1000.0
+
+    def pool_created(self, event) -> None:
+        address = self.get_address(event)
+        self.registry.set_gauge("mongodb.pool.size", 0, address=address)
+        self.registry.set_gauge("mongodb.pool.checked_out", 0, address=address)
+
+    def pool_ready(self, event) -> None:
+        ...
+
+    def pool_cleared(self, event) -> None:
+        address = self.get_address(event)
+        self.registry.increment("mongodb.pool.cleared", address=address)
+
+    def pool_closed(self, event) -> None:
+        ...
+
+    def connection_created(self, event) -> None:
+        address = self.get_address(event)
+        self.registry.increment("mongodb.pool.size", address=address)
+
+    def connection_ready(self, event) -> None:
+        ...
+
+    def connection_closed(self, event) -> None:
+        address = self.get_address(event)
+        self.registry.increment("mongodb.pool.size", -1, address=address)
+
+    def connection_check_out_started(self, event) -> None:
+        if not hasattr(self._checkouts, "started"):
+            self._checkouts.started = {}
+        self._checkouts.started[event.address] = monotonic()
+
+    def connection_check_out_failed(self, event) -> None:
+        self.get_wait_ms(event)
+        self.registry.increment(
+            "mongodb.pool.checkout_failed",
+            address=self.get_address(event),
+            reason=event.reason,
+        )
+
+    def connection_checked_out(self, event) -> None:
+        address = self.get_address(event)
+        wait_ms = self.get_wait_ms(event)
+        if wait_ms is not None:
+            self.registry.observe(
+                "mongodb.pool.checkout_wait_ms", wait_ms, address=address
+            )
+        self.registry.increment("mongodb.pool.checked_out", address=address)
+
+    def connection_checked_in(self, event) -> None:
+        address = self.get_address(event)
+        self.registry.increment(
+            "mongodb.pool.checked_out", -1, address=address
+        )
+
+
+class CommandMetricsListener(CommandListener):
+    """
+    Records latency of every command per collection:
+        * mongodb.command.duration_ms - time of command round trip
+        * mongodb.command.failed - counter of failed commands
+
+    Enabled by `settings.mongodb_monitoring` (see `setup_mongodb`).
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or metrics
+        self._collections = {}
+
+    def started(self, event) -> None:
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        self._collections[event.request_id] = collection
+
+    def succeeded(self, event) -> None:
+        self.registry.observe(
+            "mongodb.command.duration_ms",
+            event.duration_micros / 1000.0,
+            command=event.command_name,
+            collection=self._collections.pop(event.request_id, None),
+        )
+
+    def failed(self, event) -> None:
+        collection = self._collections.pop(event.request_id, None)
+        self.registry.observe(
+            "mongodb.command.duration_ms",
+            event.duration_micros / 1000.0,
+            command=event.command_name,
+            collection=collection,
+        )
+        self.registry.increment(
+            "mongodb.command.failed",
+            command=event.command_name,
+            collection=collection,
+        )
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import random
+
+from functools import wraps
+from time import monotonic
+from typing import Any, List, Type
+
+from fastapi_contrib.common.middlewares import request_id
+from fastapi_contrib.common.utils import logger
+from fastapi_contrib.conf import settings
+from fastapi_contrib.db.query import build_filter
+from fastapi_contrib.db.utils import get_db_client
+
+# Arguments of model methods, which are not filters
+NOT_FILTERS = {"raw", "session", "stream", "as_records"}
+
+# Inspections of queries, running in background
+_inspections = set()
+
+
+def get_query_shape(filters: Any) -> Any:
+    """
+    Replaces values in the filter with "?", keeping field names & operators,
+    so that queries, differing only in values, have the same shape:
+
+    .. code-block:: python
+
+        get_query_shape({"age": {"$gt": 18}, "name": "x"})
+        # {"age": {"$gt": "?"}, "name": "?"}
+
+    :param filters: filter (or part of it) of the query
+    :return: shape of the filter
+    """
+    if isinstance(filters, dict):
+        return {key: get_query_shape(value) for key, value in filters.items()}
+    if isinstance(filters, (list, tuple)):
+        if filters and isinstance(filters[0], dict):
+            return [get_query_shape(value) for value in filters]
+    return "?"
+
+
+def is_collection_scan(plan: Any) -> bool:
+    """
+    Checks whether any stage of the query plan (e.g. output of `explain`)
+    scans the whole collection.
+
+    :param plan: query plan or any of its parts
+    :return: True if there is COLLSCAN stage
+    """
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(map(is_collection_scan, plan.values()))
+    if isinstance(plan, list):
+        return any(map(is_collection_scan, plan))
+    return False
+
+
+async def explain(
+    model: Type, operation: str, filters: dict, using: str = None
+) -> dict:
+    """
+    Gets query plan of the model query with "queryPlanner" verbosity,
+    which doesn't execute the query itself.
+
+    :param model: model class
+    :param operation: name of the command: "find" or "count"
+    :param filters: filter of the query (or filter kwargs of model method)
+    :param using: connection alias
+    :return: output of `explain` command
+    """
+    filters = build_filter(filters)
+    collection = get_db_client().get_model_collection(model, using=using)
+    filter_name = "query" if operation == "count" else "filter"
+    return await collection.database.command(
+        {
+            "explain": {operation: collection.name, filter_name: filters},
+            "verbosity": "queryPlanner",
+        }
+    )
+
+
+async def inspect_query(
+    model: Type,
+    operation: str,
+    filters: dict,
+    duration: float,
+    using: str = None,
+) -> None:
+    """
+    Logs & counts query of the model if it took more than
+    `settings.mongodb_slow_query_ms`, and explains some of the queries
+    (`settings.mongodb_explain_sample_rate`) to find out collection scans.
+
+    Counts are kept in `fastapi_contrib.db.monitoring.metrics`
+    as `mongodb.query.slow` & `mongodb.query.collscan` counters.
+
+    :param model: model class
+    :param operation: name of the command: "find" or "count"
+    :param filters: filter of the query, as model methods accept it
+    :param duration: duration of the query in ms
+    :param using: connection alias
+    :return: None
+    """
+    from fastapi_contrib.db.monitoring import metrics
+
+    labels = {
+        "model": f"{model.__module__}.{model.__qualname__}",
+        "operation": operation,
+        "shape": json.dumps(get_query_shape(filters), sort_keys=True),
+    }
+    # Request ID is logged (to correlate with the request), not counted
+    current_request_id = request_id.get(None)
+    context = f" [request {current_request_id}]" if current_request_id else ""
+
+    threshold = settings.mongodb_slow_query_ms
+    if threshold is not None and duration >= threshold:
+        metrics.increment("mongodb.query.slow", **labels)
+        logger.warning(
+            "Slow query ({:.3f} ms) of {model}: {operation} {shape}".format(
+                duration, **labels
+            )
+            + context
+        )
+
+    if random.random() >= settings.mongodb_explain_sample_rate:
+        return
+    try:
+        plan = await explain(model, operation, filters, using=using)
+    except Exception as e:
+        logger.warning(f"Failed to explain query of {labels['model']}: {e}")
+        return
+    if is_collection_scan(plan):
+        metrics.increment("mongodb.query.collscan", **labels)
+        logger.warning(
+            "Collection scan in query of {model}: {operation} {shape}".format(
+                **labels
+            )
+            + context
+        )
+
+
+def profile_query(operation: str):
+    """
+    Decorator for model methods, which inspects their queries (see
+    `inspect_query`) whenever `settings.mongodb_slow_query_ms` or
+    `settings.mongodb_explain_sample_rate` is set. Inspection runs
+    in background, so that explain doesn't delay the result.
+
+    Duration of streamed queries (`stream=True`) covers only creation
+    of the cursor, as documents are fetched while they are iterated.
+
+    :param operation: name of the command: "find" or "count"
+    :return: decorator
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrap(cls, *args, **kwargs):
+            if (
+                settings.mongodb_slow_query_ms is None
+                and not settings.mongodb_explain_sample_rate
+            ):
+                return await func(cls, *args, **kwargs)
+
+            started = monotonic()
+            result = await func(cls, *args, **kwargs)
+            duration = (monotonic() - started) * 1000.0
+            filters = build_filter(
+                {
+                    key: value
+                    for key, value in kwargs.items()
+                    if not key.startswith("_") and key not in NOT_FILTERS
+                },
+                kwargs.get("_filter"),
+            )
+            task = asyncio.ensure_future(
+                inspect_query(
+                    cls,
+                    operation,
+                    filters,
+                    duration,
+                    using=kwargs.get("_using"),
+                )
+            )
+            _inspections.add(task)
+            task.add_done_callback(_inspections.discard)
+            return result
+
+        return wrap
+
+    return decorator
+
+
+def get_slow_queries(limit: int = None) -> List[dict]:
+    """
+    Report of slow & collection-scanning query shapes, most frequent first:
+
+    .. code-block:: python
+
+        get_slow_queries(limit=1)
+        # [{"model": "apps.users.models.User", "operation": "find",
+        #   "shape": '{"email": "?"}', "slow": 12, "collscan": 3}]
+
+    :param limit: max number of query shapes to return
+    :return: list of dicts with model, operation, shape & counts
+    """
+    from fastapi_contrib.db.monitoring import metrics
+
+    queries = {}
+    for counter in ("slow", "collscan"):
+        for labels, value in metrics.get_counters(f"mongodb.query.{counter}"):
+            key = (labels["model"], labels["operation"], labels["shape"])
+            query = queries.setdefault(
+                key, {**labels, "slow": 0, "collscan": 0}
+            )
+            query[counter] = value
+
+    report = sorted(
+        queries.values(),
+        key=lambda query: (query["slow"], query["collscan"]),
+        reverse=True,
+    )
+    return report[:limit]
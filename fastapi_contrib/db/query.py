@@ -0,0 +1,167 @@
+from typing import Any
+
+# Lookups of `Q`, which are mapped to MongoDB query operators as is
+OPERATORS = {
+    "eq", "ne", "gt", "gte", "lt", "lte", "in", "nin", "exists", "regex",
+    "all", "size",
+}
+SEPARATOR = "__"
+
+
+def freeze(value: Any) -> Any:
+    """
+    Converts value (e.g. compiled filter) to hashable one: dicts to tuples
+    of items, lists to tuples. Order of dict items is kept, as embedded
+    documents with other order of fields don't match in MongoDB.
+
+    :param value: any value of filter
+    :return: hashable equivalent of value
+    """
+    if isinstance(value, dict):
+        return tuple((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(map(freeze, value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(freeze, value))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class Q(object):
+    """
+    Query object, which compiles (once) into MongoDB filter.
+    Field lookups are separated by double underscore, `id` is stored as
+    `_id` in MongoDB, queries could be combined with `&`, `|` & `~`:
+
+    .. code-block:: python
+
+        query = Q(age__gte=18, status__in=["new", "active"]) | Q(id=1)
+        query.compile()
+        # {"$or": [{"age": {"$gte": 18}, "status": {"$in": ["new", "active"]}},
+        #          {"_id": 1}]}
+
+        await User.list(_filter=query)
+
+    Supported lookups: eq, ne, gt, gte, lt, lte, in, nin, exists, regex,
+    all & size. Queries are immutable & hashable, so that they could be
+    used as keys of caches.
+    """
+
+    def __init__(self, **lookups):
+        self.lookups = lookups
+        self._compiled = None
+
+    @classmethod
+    def _from_filter(cls, _filter: dict) -> "Q":
+        """
+        Makes query out of compiled filter (e.g. of combined queries).
+
+        :param _filter: filter dict
+        :return: query object
+        """
+        query = cls()
+        query._compiled = _filter
+        return query
+
+    @staticmethod
+    def get_field(field: str) -> str:
+        return "_id" if field == "id" else field
+
+    def compile_lookups(self) -> dict:
+        """
+        Compiles field lookups into filter, e.g. `age__gte=18` into
+        `{"age": {"$gte": 18}}`. Equality is combined with other lookups
+        of the same field as `$eq`, e.g. `{"age": {"$eq": 18, "$ne": 0}}`.
+
+        :return: filter dict
+        """
+        lookups = {}
+        for lookup, value in self.lookups.items():
+            field, _, operator = lookup.rpartition(SEPARATOR)
+            if not field or operator not in OPERATORS:
+                field, operator = lookup, "eq"
+            operators = lookups.setdefault(self.get_field(field), {})
+            if operator in operators:
+                raise ValueError(
+                    f"Lookup {lookup} repeats {operator} of the field"
+                )
+            operators[operator] = value
+
+        compiled = {}
+        for field, operators in lookups.items():
+            if len(operators) == 1 and "eq" in operators:
+                compiled[field] = operators["eq"]
+            else:
+                compiled[field] = {
+                    f"${operator}": value
+                    for operator, value in operators.items()
+                }
+        return compiled
+
+    def compile(self) -> dict:
+        """
+        Compiles query into MongoDB filter, only upon the first call.
+
+        :return: filter dict (shouldn't be modified)
+        """
+        if self._compiled is None:
+            self._compiled = self.compile_lookups()
+        return self._compiled
+
+    def combine(self, other: "Q", operator: str) -> "Q":
+        if not isinstance(other, Q):
+            return NotImplemented
+        return Q._from_filter(
+            {operator: [self.compile(), other.compile()]}
+        )
+
+    def __and__(self, other: "Q") -> "Q":
+        return self.combine(other, "$and")
+
+    def __or__(self, other: "Q") -> "Q":
+        return self.combine(other, "$or")
+
+    def __invert__(self) -> "Q":
+        return Q._from_filter({"$nor": [self.compile()]})
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Q):
+            return NotImplemented
+        return freeze(self.compile()) == freeze(other.compile())
+
+    def __hash__(self) -> int:
+        return hash(freeze(self.compile()))
+
+    def __repr__(self) -> str:
+        return f"Q({self.compile()!r})"
+
+
+def build_filter(filter_kwargs: Any = None, _filter: Q = None) -> dict:
+    """
+    Builds MongoDB filter out of filter kwargs of model methods (with `id`
+    mapped to `_id`) and/or query object, without modifying them.
+
+    :param filter_kwargs: dict of filters by fields or `Q`
+    :param _filter: additional `Q` to match
+    :return: filter dict
+    """
+    if isinstance(filter_kwargs, Q):
+        filter_kwargs, _filter = None, (
+            filter_kwargs if _filter is None else filter_kwargs & _filter
+        )
+
+    query = filter_kwargs or {}
+    if "id" in query:
+        query = {Q.get_field(key): value for key, value in query.items()}
+    if _filter is None:
+        return query
+
+    compiled = _filter.compile()
+    if not query:
+        return compiled
+    if query.keys() & compiled.keys():
+        return {"$and": [compiled, query]}
+    return {**compiled, **query}
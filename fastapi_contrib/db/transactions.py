@@ -0,0 +1,140 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Optional
+
+from fastapi_contrib.db.utils import (
+    get_db_client,
+    get_read_concern,
+    get_read_preference,
+    get_write_concern,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from motor.motor_asyncio import AsyncIOMotorClientSession
+
+# Session of the transaction, that is being run in the current context
+current_session: ContextVar[Optional["AsyncIOMotorClientSession"]] = (
+    ContextVar("current_session", default=None)
+)
+
+
+def get_session() -> Optional["AsyncIOMotorClientSession"]:
+    """
+    Gets session of the transaction, that is being run in the current
+    context (see `transaction`), so that `MongoDBClient` calls use it.
+
+    :return: session or None, if there is no transaction
+    """
+    return current_session.get()
+
+
+def get_transaction_options(
+    read_concern: Any = None,
+    write_concern: Any = None,
+    read_preference: Any = None,
+) -> dict:
+    """
+    Makes options of transaction out of their names or objects.
+
+    :return: dict of read concern, write concern & read preference
+    """
+    return {
+        "read_concern": get_read_concern(read_concern),
+        "write_concern": get_write_concern(write_concern),
+        "read_preference": get_read_preference(read_preference),
+    }
+
+
+@asynccontextmanager
+async def transaction(
+    using: str = None,
+    read_concern: Any = None,
+    write_concern: Any = None,
+    read_preference: Any = None,
+) -> AsyncIterator["AsyncIOMotorClientSession"]:
+    """
+    Runs all `MongoDBClient` calls (and so methods of models) inside the
+    block in one transaction, which is committed at the end of the block
+    or aborted, if block raises:
+
+    .. code-block:: python
+
+        async with transaction():
+            await order.save()
+            await Product.update_one(
+                {"id": order.product_id}, **{"$inc": {"stock": -1}}
+            )
+
+    Block is not repeated on transient errors (e.g. write conflicts),
+    use `run_in_transaction` to retry it. Transaction spans collections
+    of one connection only, calls for models of other connections
+    raise `ValueError` inside the block.
+
+    :param using: connection alias, defaults to "default"
+    :param read_concern: read concern level or object of the transaction
+    :param write_concern: dict of write concern options or object
+    :param read_preference: name of read preference mode or object
+    :return: session of the transaction
+    """
+    client = get_db_client().get_database(using).client
+    async with await client.start_session() as session:
+        async with session.start_transaction(
+            **get_transaction_options(
+                read_concern, write_concern, read_preference
+            )
+        ):
+            token = current_session.set(session)
+            try:
+                yield session
+            finally:
+                current_session.reset(token)
+
+
+async def run_in_transaction(
+    func: Callable,
+    *args,
+    using: str = None,
+    read_concern: Any = None,
+    write_concern: Any = None,
+    read_preference: Any = None,
+    **kwargs
+) -> Any:
+    """
+    Runs coroutine function in transaction (see `transaction`), retrying
+    it on `TransientTransactionError` and retrying commit on
+    `UnknownTransactionCommitResult`, as `motor` does in `with_transaction`:
+
+    .. code-block:: python
+
+        async def place_order(order):
+            await order.save()
+            await Product.update_one(
+                {"id": order.product_id}, **{"$inc": {"stock": -1}}
+            )
+
+        await run_in_transaction(place_order, order)
+
+    :param func: coroutine function, which could be called more than once
+    :param args: positional arguments of the function
+    :param using: connection alias, defaults to "default"
+    :param read_concern: read concern level or object of the transaction
+    :param write_concern: dict of write concern options or object
+    :param read_preference: name of read preference mode or object
+    :param kwargs: keyword arguments of the function
+    :return: result of the function
+    """
+    async def callback(session):
+        token = current_session.set(session)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_session.reset(token)
+
+    client = get_db_client().get_database(using).client
+    async with await client.start_session() as session:
+        return await session.with_transaction(
+            callback,
+            **get_transaction_options(
+                read_concern, write_concern, read_preference
+            )
+        )
@@ -1,16 +1,40 @@
+import asyncio
 import importlib
-import motor.motor_asyncio
-import pkgutil
-import pyclbr
+import json
+import os
 import random
-import inspect
 
-from typing import List
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Type
 
 from fastapi import FastAPI
 
-from fastapi_contrib.common.utils import logger, resolve_dotted_path
+from fastapi_contrib.common.utils import (
+    logger,
+    resolve_cached,
+    resolve_dotted_path,
+)
 from fastapi_contrib.conf import settings
+from fastapi_contrib.db.query import freeze
+
+
+DEFAULT_CONNECTION = "default"
+
+# Names of connection settings mapped to options of `AsyncIOMotorClient`
+CLIENT_OPTIONS = {
+    "min_pool_size": "minPoolSize",
+    "max_pool_size": "maxPoolSize",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "max_idle_time_ms": "maxIdleTimeMS",
+    "compressors": "compressors",
+    "zlib_compression_level": "zlibCompressionLevel",
+    "connect_timeout_ms": "connectTimeoutMS",
+    "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+    "socket_timeout_ms": "socketTimeoutMS",
+}
+
+models_registry: Dict[str, Type] = {}
 
 
 def default_id_generator(bit_size: int = 32) -> int:
@@ -27,11 +51,86 @@ def get_next_id() -> int:
     Retrieves ID generator function from the path, specified in project's conf.
     :return: newly generated ID
     """
-    # TODO: cache this
-    id_generator = resolve_dotted_path(settings.mongodb_id_generator)
+    id_generator = resolve_cached(settings.mongodb_id_generator)
     return id_generator()
 
 
+def get_read_preference(mode: Any, max_staleness: int = None) -> Any:
+    """
+    Makes pymongo's read preference out of its mode name (e.g.
+    "secondaryPreferred") or changes max staleness of existing one.
+
+    :param mode: name of read preference mode or read preference itself
+    :param max_staleness: max replication lag (seconds) of secondaries to read
+    :return: read preference object or None, if mode is None
+    """
+    if mode is None:
+        return None
+
+    from pymongo.read_preferences import (
+        make_read_preference,
+        read_pref_mode_from_name,
+    )
+
+    if isinstance(mode, str):
+        return make_read_preference(
+            read_pref_mode_from_name(mode), None, max_staleness or -1
+        )
+    if max_staleness is not None:
+        return make_read_preference(mode.mode, mode.tag_sets, max_staleness)
+    return mode
+
+
+def get_read_concern(level: Any) -> Any:
+    """
+    Makes pymongo's read concern out of its level (e.g. "majority").
+
+    :param level: read concern level or read concern itself
+    :return: read concern object or None, if level is None
+    """
+    if isinstance(level, str):
+        from pymongo.read_concern import ReadConcern
+
+        return ReadConcern(level)
+    return level
+
+
+def get_write_concern(options: Any) -> Any:
+    """
+    Makes pymongo's write concern out of dict with its options
+    (e.g. {"w": "majority", "wtimeout": 1000}).
+
+    :param options: dict of write concern options or write concern itself
+    :return: write concern object or None, if options are None
+    """
+    if isinstance(options, dict):
+        from pymongo.write_concern import WriteConcern
+
+        return WriteConcern(**options)
+    return options
+
+
+def get_connection_settings(alias: str = DEFAULT_CONNECTION) -> dict:
+    """
+    Gets settings of MongoDB connection by its alias. Settings of the
+    "default" one come from `mongodb_*` settings, settings of any other alias
+    from `settings.mongodb_connections` fall back to the default ones.
+
+    :param alias: name of connection
+    :return: dict with dsn, dbname, pool & timeout settings of the connection
+    """
+    connection = {
+        "dsn": settings.mongodb_dsn,
+        "dbname": settings.mongodb_dbname,
+        **{
+            name: getattr(settings, f"mongodb_{name}")
+            for name in CLIENT_OPTIONS
+        },
+    }
+    connection.update(settings.mongodb_connections.get(alias, {}))
+    return connection
+
+
 def setup_mongodb(app: FastAPI) -> None:
     """
     Helper function to setup MongoDB connection & `motor` client during setup.
@@ -45,15 +144,47 @@ def setup_mongodb(app: FastAPI) -> None:
         async def startup():
             setup_mongodb(app)
 
+    Sets up database for every connection alias in
+    `settings.mongodb_connections` (and the "default" one) in
+    `app.mongodb_databases`, connections with the same DSN & pool settings
+    share the same `motor` client. Default database is also `app.mongodb`.
+
+    Pool, timeout & compression settings which are not None are passed to
+    the client, and if `settings.mongodb_monitoring` is enabled, pool &
+    command metrics are recorded (see `fastapi_contrib.db.monitoring`).
+
     :param app: app object, instance of FastAPI
     :return: None
     """
-    client = motor.motor_asyncio.AsyncIOMotorClient(
-        settings.mongodb_dsn,
-        minPoolSize=settings.mongodb_min_pool_size,
-        maxPoolSize=settings.mongodb_max_pool_size,
-    )
-    app.mongodb = client[settings.mongodb_dbname]
+    import motor.motor_asyncio
+
+    event_listeners = []
+    if settings.mongodb_monitoring:
+        from fastapi_contrib.db.monitoring import (
+            CommandMetricsListener,
+            PoolMetricsListener,
+        )
+
+        event_listeners = [PoolMetricsListener(), CommandMetricsListener()]
+
+    clients = {}
+    app.mongodb_databases = {}
+    for alias in [DEFAULT_CONNECTION, *settings.mongodb_connections]:
+        connection = get_connection_settings(alias)
+        dbname = connection.pop("dbname")
+        # Options could be unhashable, e.g. list of compressors
+        key = tuple(sorted(freeze(connection)))
+        if key not in clients:
+            options = {
+                option: connection[name]
+                for name, option in CLIENT_OPTIONS.items()
+                if connection.get(name) is not None
+            }
+            clients[key] = motor.motor_asyncio.AsyncIOMotorClient(
+                connection["dsn"], event_listeners=event_listeners, **options
+            )
+        app.mongodb_databases[alias] = clients[key][dbname]
+    app.mongodb = app.mongodb_databases[DEFAULT_CONNECTION]
 
 
 def get_db_client():
@@ -67,57 +198,276 @@ def get_db_client():
     return client
 
 
-def get_models() -> list:
+def register_model(model: Type) -> None:
     """
-    Scans `settings.apps_folder_name`.
-    Find `models` modules in each of them and get all attributes there.
-    Last step is to filter attributes to return only those,
-    subclassed from MongoDBModel (or timestamped version).
+    Adds model class to the registry of all known models, keyed by its
+    dotted path. Invoked automatically for every subclass of MongoDBModel.
 
-    Used internally only by `create_indexes` function.
+    :param model: class of the model (subclassed from MongoDBModel)
+    :return: None
+    """
+    models_registry[f"{model.__module__}.{model.__qualname__}"] = model
 
-    :return: list of user-defined models (subclassed from MongoDBModel) in apps
+
+def _scan_apps_models() -> list:
     """
-    from fastapi_contrib.db.models import MongoDBModel
+    Imports `models` module (or package) of each app in `settings.apps`,
+    which registers all models defined inside it, then reads them
+    from the models registry.
 
+    :return: list of models, defined in `models` of apps
+    """
     apps_folder_name = settings.apps_folder_name
     models = []
     for app in settings.apps:
-        app_path = f"{apps_folder_name}/{app}"
-        modules = [
-            f for f in pkgutil.walk_packages(path=[app_path])
-            if f.name == 'models'
-        ]
-        if not modules:
+        path_to_models = f"{apps_folder_name}.{app}.models"
+        try:
+            importlib.import_module(path_to_models)
+        except ModuleNotFoundError as e:
+            # Only skip apps without models, not broken imports inside them
+            if not f"{path_to_models}.".startswith(f"{e.name}."):
+                raise
             continue
-        for module in modules:
-            path_to_models = f"{apps_folder_name}.{app}.models"
-            mudule = importlib.import_module(path_to_models)
-            if module.ispkg:
-                module_models = [
-                    x[0] for x in inspect.getmembers(mudule, inspect.isclass)
-                ]
-            else:
-                try:
-                    module_models = pyclbr.readmodule(path_to_models).keys()
-                except (AttributeError, ImportError):
-                    logger.warning(
-                        f"Unable to read module attributes in {path_to_models}"
-                    )
-                    continue
-            models.extend([getattr(mudule, model) for model in module_models])
-
-    return list(filter(lambda x: issubclass(x, MongoDBModel), models))
+
+        models.extend(
+            model
+            for path, model in models_registry.items()
+            if path.startswith(f"{path_to_models}.")
+            and "<locals>" not in model.__qualname__
+        )
+
+    return models
+
+
+def get_models() -> list:
+    """
+    Collects models for every app in `settings.apps` from the models registry,
+    which is populated upon definition of every MongoDBModel subclass.
+
+    If `settings.models_manifest` points to an existing file, models are
+    resolved from dotted paths listed there instead (see:
+    `dump_models_manifest`).
+
+    Used internally only by `create_indexes` function.
+
+    :return: list of user-defined models (subclassed from MongoDBModel) in apps
+    """
+    manifest = settings.models_manifest
+    if manifest and Path(manifest).exists():
+        with open(manifest) as f:
+            return [resolve_dotted_path(path) for path in json.load(f)]
+
+    return _scan_apps_models()
+
+
+def dump_models_manifest(path: str = None) -> List[str]:
+    """
+    Writes dotted paths of all models in `settings.apps` to the JSON file,
+    which could be used as `settings.models_manifest` to skip scanning
+    of apps upon startup.
+
+    :param path: path to the manifest file, defaults to
+                 `settings.models_manifest`
+    :return: list of dotted paths to the models, written to the manifest
+    """
+    manifest = [
+        f"{model.__module__}.{model.__qualname__}"
+        for model in _scan_apps_models()
+    ]
+    with open(path or settings.models_manifest, "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def get_text_index_key(key: list) -> list:
+    """
+    Makes key of text index the way server returns it in `list_indexes`:
+    text fields are replaced with `_fts` & `_ftsx` keys.
+
+    :param key: list of (field, direction) pairs of index specification
+    :return: list of (field, direction) pairs
+    """
+    text_fields = [i for i, (_, direction) in enumerate(key)
+                   if direction == "text"]
+    if not text_fields:
+        return key
+    first, last = text_fields[0], text_fields[-1]
+    return key[:first] + [("_fts", "text"), ("_ftsx", 1)] + key[last + 1:]
+
+
+def index_differs(index: dict, existing: dict) -> bool:
+    """
+    Compares index specification with the one already present in collection.
+    Fields, which server expands, are normalized: keys & weights of text
+    indexes and collation (only specified collation options are compared).
+
+    :param index: index document to create (e.g. `IndexModel.document`)
+    :param existing: index document, returned by `list_indexes`
+    :return: whether keys or any of specified options are different
+    """
+    key = list(index["key"].items())
+    is_text = "_fts" in existing["key"]
+    if is_text:
+        key = get_text_index_key(key)
+    if key != list(existing["key"].items()):
+        return True
+
+    if is_text:
+        weights = {
+            field: 1
+            for field, direction in index["key"].items()
+            if direction == "text"
+        }
+        weights.update(index.get("weights", {}))
+        if weights != dict(existing.get("weights", {})):
+            return True
+
+    for option, value in index.items():
+        if option in ("key", "name", "weights"):
+            continue
+        current = existing.get(option)
+        if option == "collation":
+            if not isinstance(current, dict) or any(
+                current.get(name) != setting
+                for name, setting in value.items()
+            ):
+                return True
+        elif current != value:
+            return True
+    return False
+
+
+async def acquire_lock(name: str, timeout: int) -> str:
+    """
+    Tries to acquire lock, stored as a document in
+    `settings.mongodb_locks_collection`, so only one worker (or process)
+    holds it at a time. Lock that wasn't released expires after `timeout`.
+
+    :param name: unique name of the lock
+    :param timeout: seconds after which lock is considered stale
+    :return: token of the lock owner if acquired, otherwise None
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    db = get_db_client()
+    collection = db.get_collection(settings.mongodb_locks_collection)
+    now = datetime.now(tz=timezone.utc)
+    expires = now + timedelta(seconds=timeout)
+    token = os.urandom(16).hex()
+    try:
+        # Upsert of non-expired lock fails on unique `_id`
+        await collection.update_one(
+            {"_id": name, "expires": {"$lt": now}},
+            {"$set": {"owner": token, "expires": expires}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return None
+    return token
+
+
+async def release_lock(name: str, token: str) -> None:
+    """
+    Releases lock, acquired by `acquire_lock`, if it is still owned by token.
+
+    :param name: unique name of the lock
+    :param token: token of the lock owner
+    :return: None
+    """
+    db = get_db_client()
+    collection = db.get_collection(settings.mongodb_locks_collection)
+    await collection.delete_one({"_id": name, "owner": token})
 
 
 async def create_indexes() -> List[str]:
     """
-    Gets all models in project and then creates indexes for each one of them.
+    Gets all models in project and then creates indexes for each one of them,
+    up to `settings.mongodb_indexes_concurrency` models at a time.
+
+    When `settings.mongodb_indexes_lock` is enabled, only the worker that
+    acquired the lock creates indexes, all the others skip it.
+
+    Indexes, which differ from their `Meta.indexes` specification, are only
+    logged, unless `settings.mongodb_indexes_recreate` is enabled (better
+    together with the lock, as drop & create aren't atomic).
+
     :return: list of indexes that has been invoked to create
-             (could've been created earlier, it doesn't raise in this case)
+             (only missing or changed ones are created)
     """
-    models = get_models()
-    indexes = []
-    for model in models:
-        indexes.append(await model.create_indexes())
+    token = None
+    if settings.mongodb_indexes_lock:
+        token = await acquire_lock(
+            "create_indexes", timeout=settings.mongodb_indexes_lock_timeout
+        )
+        if token is None:
+            logger.info("Indexes are being created by another worker")
+            return []
+
+    semaphore = asyncio.Semaphore(settings.mongodb_indexes_concurrency)
+
+    async def _create_indexes(model):
+        async with semaphore:
+            return await model.create_indexes()
+
+    try:
+        indexes = await asyncio.gather(*map(_create_indexes, get_models()))
+    finally:
+        if token is not None:
+            await release_lock("create_indexes", token)
     return list(filter(None, indexes))
+
+
+async def warmup(app: FastAPI, schemas: bool = False) -> None:
+    """
+    Helper function to prepare worker for serving requests after
+    `setup_mongodb`, so that first requests don't pay for it:
+        * opens `min_pool_size` connections (at least one) of every MongoDB
+          client in parallel by pinging the server
+        * instantiates `MongoDBClient`
+        * resolves settings-driven functions & models (id generator,
+          now function, user & token models, token generator)
+        * optionally generates schemas of `openapi.patch` serializers
+
+    Use during app startup as follows:
+
+    .. code-block:: python
+
+        @app.on_event('startup')
+        async def startup():
+            setup_mongodb(app)
+            await warmup(app, schemas=True)
+
+    :param app: app object, instance of FastAPI
+    :param schemas: whether to generate schemas of patched serializers
+    :return: None
+    """
+    # Connections sharing the client also share its pool settings
+    clients = {}
+    for alias, database in app.mongodb_databases.items():
+        pool_size = get_connection_settings(alias)["min_pool_size"] or 1
+        clients[id(database.client)] = database, pool_size
+    await asyncio.gather(
+        *(
+            database.command("ping")
+            for database, pool_size in clients.values()
+            for _ in range(pool_size)
+        )
+    )
+
+    get_db_client()
+
+    for path in (
+        settings.mongodb_id_generator,
+        settings.now_function,
+        settings.user_model,
+        settings.token_model,
+        settings.token_generator,
+    ):
+        if path:
+            resolve_cached(path)
+
+    if schemas:
+        from fastapi_contrib.serializers.openapi import patched_serializers
+
+        for serializer in patched_serializers:
+            serializer.schema()
@@ -0,0 +1,252 @@
+import asyncio
+
+from time import monotonic
+from typing import List, Optional, Type
+
+from fastapi_contrib.common.utils import logger
+from fastapi_contrib.conf import settings
+from fastapi_contrib.db.utils import get_db_client, get_models
+
+# Codes of errors, after which change stream can't be resumed by the token
+# (ChangeStreamFatalError & ChangeStreamHistoryLost)
+NOT_RESUMABLE_CODES = {280, 286}
+
+
+async def load_resume_token(name: str) -> Optional[dict]:
+    """
+    Loads resume token of change stream, saved by `save_resume_token`.
+
+    :param name: unique name of the change stream
+    :return: resume token or None, if there is no saved one
+    """
+    db = get_db_client()
+    collection = db.get_collection(settings.mongodb_resume_tokens_collection)
+    document = await collection.find_one({"_id": name})
+    return document["token"] if document else None
+
+
+async def save_resume_token(name: str, token: Optional[dict]) -> None:
+    """
+    Saves resume token of change stream, so that it could be resumed
+    after restart of the process.
+
+    :param name: unique name of the change stream
+    :param token: resume token (`_id` of change) or None to reset it
+    :return: None
+    """
+    db = get_db_client()
+    collection = db.get_collection(settings.mongodb_resume_tokens_collection)
+    await collection.update_one(
+        {"_id": name}, {"$set": {"token": token}}, upsert=True
+    )
+
+
+class ChangeWatcher(object):
+    """
+    Supervised background task, which watches changes in the collection of
+    the model and invokes its `on_change` hook for every one of them.
+
+    Resume token of the last handled change is kept in memory, so that
+    stream is resumed after errors. If `on_change` fails, the watcher
+    restarts after `retry_delay` seconds (doubled up to `max_retry_delay`
+    on consecutive errors, without handled changes between them) and
+    retries the failed change, as the token never advances past it.
+
+    To resume after restart of the process as well, pass `worker` (stable
+    index of the process, e.g. "0") or unique `name`: token is then saved
+    at most once per `save_interval` seconds (and when the stream ends).
+    Every process watches and handles all the changes on its own, so
+    processes shouldn't share the name.
+
+    .. code-block:: python
+
+        class Article(MongoDBModel):
+            class Meta:
+                collection = "articles"
+
+            @classmethod
+            async def on_change(cls, change):
+                cache.pop(change["documentKey"]["_id"], None)
+
+        @app.on_event('startup')
+        async def startup():
+            app.watchers = start_watchers([Article], worker="0")
+
+        @app.on_event('shutdown')
+        async def shutdown():
+            await stop_watchers(app.watchers)
+
+    :param model: model class to watch changes of
+    :param name: unique name to save resume token by
+    :param worker: stable ID of the process, to save resume token by
+                   dotted path of the model with it
+    :param pipeline: list of aggregation stages to filter changes
+    :param full_document: "updateLookup" to get whole updated documents
+    :param retry_delay: seconds to wait before restart after error
+    :param max_retry_delay: max seconds to wait before restart
+    :param save_interval: min seconds between saves of resume token
+    """
+
+    def __init__(
+        self,
+        model: Type,
+        name: str = None,
+        worker: str = None,
+        pipeline: list = None,
+        full_document: str = None,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+        save_interval: float = 1.0,
+    ):
+        self.model = model
+        # Token is saved only by name, which is stable between restarts
+        self.persistent = name is not None or worker is not None
+        self.name = name or f"{model.__module__}.{model.__qualname__}"
+        if name is None and worker is not None:
+            self.name = f"{self.name}:{worker}"
+        self.pipeline = pipeline
+        self.full_document = full_document
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.save_interval = save_interval
+        self.resume = True
+        self.token = None
+        self.loaded = False
+        self.handled = 0
+        self.task = None
+
+    async def watch(self) -> None:
+        """
+        Watches changes, starting after the last handled (or saved) one,
+        until the change stream is closed or fails.
+
+        :return: None
+        """
+        if not self.resume:
+            self.token = None
+            if self.persistent:
+                await save_resume_token(self.name, None)
+            self.resume = True
+        elif self.persistent and not self.loaded:
+            self.token = await load_resume_token(self.name)
+        self.loaded = True
+
+        saved_token, saved_at = self.token, monotonic()
+        try:
+            async for change in self.model.watch(
+                pipeline=self.pipeline,
+                full_document=self.full_document,
+                resume_after=self.token,
+            ):
+                try:
+                    await self.model.on_change(change)
+                except Exception:
+                    logger.exception(
+                        f"Failed to handle change of {self.name}: "
+                        f"{change['_id']}"
+                    )
+                    raise
+                self.token = change["_id"]
+                self.handled += 1
+                if not self.persistent:
+                    continue
+                if monotonic() - saved_at >= self.save_interval:
+                    await save_resume_token(self.name, self.token)
+                    saved_token, saved_at = self.token, monotonic()
+        finally:
+            if self.persistent and self.token != saved_token:
+                try:
+                    await save_resume_token(self.name, self.token)
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to save resume token of {self.name}: {e}"
+                    )
+
+    async def run(self) -> None:
+        """
+        Keeps watching changes, restarting after errors, until cancelled.
+
+        :return: None
+        """
+        from pymongo.errors import OperationFailure
+
+        delay = self.retry_delay
+        while True:
+            handled = self.handled
+            try:
+                await self.watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.handled != handled:
+                    # Changes were handled since the previous error
+                    delay = self.retry_delay
+                logger.warning(f"Change stream of {self.name} failed: {e}")
+                if isinstance(e, OperationFailure):
+                    # Changes after the token are lost, start from now
+                    self.resume = e.code not in NOT_RESUMABLE_CODES
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            else:
+                # Stream was closed, e.g. collection has been dropped
+                delay = self.retry_delay
+                await asyncio.sleep(delay)
+
+    def start(self) -> asyncio.Task:
+        """
+        Starts watching changes in background task.
+
+        :return: task of the watcher
+        """
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def stop(self) -> None:
+        """
+        Stops background task of the watcher.
+
+        :return: None
+        """
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+
+def start_watchers(models: List[Type] = None, **kwargs) -> List[ChangeWatcher]:
+    """
+    Starts `ChangeWatcher` for every model, by default for every model
+    in project, which overrides `on_change` hook.
+
+    :param models: list of model classes to watch
+    :param kwargs: options of watchers (e.g. `full_document`)
+    :return: list of started watchers
+    """
+    from fastapi_contrib.db.models import MongoDBModel
+
+    if models is None:
+        models = [
+            model
+            for model in get_models()
+            if model.on_change.__func__ is not MongoDBModel.on_change.__func__
+        ]
+
+    watchers = [ChangeWatcher(model, **kwargs) for model in models]
+    for watcher in watchers:
+        watcher.start()
+    return watchers
+
+
+async def stop_watchers(watchers: List[ChangeWatcher]) -> None:
+    """
+    Stops watchers, started by `start_watchers`.
+
+    :param watchers: list of started watchers
+    :return: None
+    """
+    await asyncio.gather(*(watcher.stop() for watcher in watchers))
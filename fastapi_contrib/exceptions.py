@@ -105,6 +105,27 @@ class NotFoundError(HTTPException):
         )
 
 
+class ConflictError(HTTPException):
+    def __init__(
+        self,
+        error_code: int = 409,
+        detail: Any = "Conflict.",
+        fields: List[Dict] = None,
+    ):
+        """
+        Generic 409 Conflict HTTP Exception with support for custom error code
+
+        :param error_code: Custom error code, unique throughout the app
+        :param detail: detailed message of the error
+        """
+        super().__init__(
+            error_code=error_code,
+            status_code=409,
+            detail=detail,
+            fields=fields,
+        )
+
+
 class InternalServerError(HTTPException):
     def __init__(
         self,
@@ -1,8 +1,12 @@
 import asyncio
 
+from typing import Any, Awaitable
+
 from fastapi import Query
 from starlette.requests import Request
 
+from fastapi_contrib.common.utils import cancel_on_disconnect
+from fastapi_contrib.db.query import build_filter
 from fastapi_contrib.serializers.common import Serializer
 
 
@@ -59,6 +63,34 @@ class Pagination(metaclass=PaginationMeta):
             max_offset = 100`
             max_limit = 2000
 
+    Set `read_preference` (and optionally `max_staleness` & `read_concern`)
+    to send list & count queries of this pagination to secondaries:
+
+    .. code-block:: python
+
+        class SecondaryPagination(Pagination):
+            read_preference = "secondaryPreferred"
+            max_staleness = 120
+
+    Set `use_facet` to get both count & the page of records in one
+    aggregation query (`$match` + `$facet`) instead of two concurrent
+    `count_documents` & `find` ones:
+
+    .. code-block:: python
+
+        class FacetPagination(Pagination):
+            use_facet = True
+
+    Set `max_time_ms` to limit time of queries on server, and
+    `disconnect_check_interval` to cancel queries (and close cursors)
+    once client disconnects:
+
+    .. code-block:: python
+
+        class LimitedPagination(Pagination):
+            max_time_ms = 5000
+            disconnect_check_interval = 0.5
+
     :param request: starlette Request object
     :param offset: query param of how many records to skip
     :param limit: query param of how many records to show
@@ -68,6 +100,12 @@ class Pagination(metaclass=PaginationMeta):
     default_limit = 100
     max_offset = None
     max_limit = 1000
+    read_preference = None
+    read_concern = None
+    max_staleness = None
+    use_facet = False
+    max_time_ms = None
+    disconnect_check_interval = None
 
     def __init__(
         self,
@@ -82,6 +120,21 @@ class Pagination(metaclass=PaginationMeta):
         self.count = None
         self.list = []
 
+    def get_read_options(self) -> dict:
+        """
+        Collects read options of this pagination, that are set,
+        to be proxied in db queries.
+
+        :return: dict of read options as model methods accept them
+        """
+        options = {
+            "_read_preference": self.read_preference,
+            "_read_concern": self.read_concern,
+            "_max_staleness": self.max_staleness,
+            "_max_time_ms": self.max_time_ms,
+        }
+        return {k: v for k, v in options.items() if v is not None}
+
     async def get_count(self, **kwargs) -> int:
         """
         Retrieves counts for query list, filtered by kwargs.
@@ -89,9 +142,25 @@ class Pagination(metaclass=PaginationMeta):
         :param kwargs: filters that are proxied in db query
         :return: number of found records
         """
-        self.count = await self.model.count(**kwargs)
+        self.count = await self.model.count(
+            **self.get_read_options(), **kwargs
+        )
         return self.count
 
+    async def watch_disconnect(self, awaitable: Awaitable) -> Any:
+        """
+        Awaits db queries, cancelling them once client disconnects,
+        if `disconnect_check_interval` is set.
+
+        :param awaitable: coroutine or future of db queries
+        :return: result of awaitable
+        """
+        if not self.disconnect_check_interval:
+            return await awaitable
+        return await cancel_on_disconnect(
+            self.request, awaitable, interval=self.disconnect_check_interval
+        )
+
     def get_next_url(self) -> str:
         """
         Constructs `next` parameter in resulting JSON,
@@ -140,10 +209,97 @@ class Pagination(metaclass=PaginationMeta):
             _offset=self.offset,
             _sort=_sort,
             raw=True,
+            **self.get_read_options(),
             **kwargs
         )
         return self.list
 
+    def get_facet_pipeline(self, pipeline: list, _sort=None) -> list:
+        """
+        Appends `$facet` stage to the pipeline, which gets both count of
+        all documents and the page of them (sorted by `_sort`) at once.
+
+        :param pipeline: list of aggregation stages, producing records
+        :param _sort: list of (key, direction) pairs to sort page by
+        :return: new pipeline, which produces single document
+                 with `count` & `result` fields
+        """
+        page = [{"$skip": self.offset}, {"$limit": self.limit}]
+        if _sort:
+            page.insert(0, {"$sort": dict(_sort)})
+        return pipeline + [
+            {"$facet": {"count": [{"$count": "count"}], "result": page}}
+        ]
+
+    async def get_aggregated(
+        self, pipeline: list, _sort=None, **options
+    ) -> tuple:
+        """
+        Retrieves count & list of records, produced by aggregation pipeline,
+        in one round trip using `$facet`.
+
+        :param pipeline: list of aggregation stages, producing records
+        :param _sort: list of (key, direction) pairs to sort page by
+        :param options: options of db query (`_using`, `_max_time_ms`,
+                        etc.), which override read options of pagination
+        :return: 2-tuple: number of records & list of dicts of the page
+        """
+        if "_batch_size" in options:
+            options["batch_size"] = options.pop("_batch_size")
+        documents = await self.model.aggregate(
+            self.get_facet_pipeline(pipeline, _sort=_sort),
+            **{**self.get_read_options(), **options}
+        )
+        facet = documents[0] if documents else {}
+        counts = facet.get("count")
+        self.count = counts[0]["count"] if counts else 0
+        self.list = facet.get("result", [])
+        for document in self.list:
+            # `_id` could be excluded by `$project` of the pipeline
+            if "_id" in document:
+                document["id"] = document.pop("_id")
+        return self.count, self.list
+
+    async def paginate_aggregate(
+        self,
+        serializer_class: Serializer,
+        pipeline: list,
+        _sort=None,
+        **options
+    ) -> dict:
+        """
+        Same as `paginate`, but records are produced by aggregation pipeline
+        (e.g. `$match` & `$lookup`), which is run once for both
+        count & the page of records:
+
+        .. code-block:: python
+
+            @app.get("/")
+            async def list(pagination: Pagination = Depends()):
+                return await pagination.paginate_aggregate(
+                    serializer_class=SomeSerializer,
+                    pipeline=[{"$match": {"is_active": True}}],
+                    _sort=[("created", -1)],
+                )
+
+        :param serializer_class: needed to get Model & sanitize list from DB
+        :param pipeline: list of aggregation stages, producing records
+        :param _sort: list of (key, direction) pairs to sort page by
+        :param options: options of db query (`_using`, `_max_time_ms`, etc.)
+        :return: dict that should be returned as a response
+        """
+        self.model = serializer_class.Meta.model
+        count, _list = await self.watch_disconnect(
+            self.get_aggregated(pipeline, _sort=_sort, **options)
+        )
+        _list = serializer_class.sanitize_list(_list)
+        return {
+            "count": count,
+            "next": self.get_next_url(),
+            "previous": self.get_previous_url(),
+            "result": _list,
+        }
+
     async def paginate(
         self, serializer_class: Serializer, _sort=None, **kwargs
     ) -> dict:
@@ -155,13 +311,32 @@ class Pagination(metaclass=PaginationMeta):
             * previous - URL for previous "page" of paginated results
             * result - actual list of records (dicts)
 
+        If `use_facet` is set, count & list are retrieved in one query.
+
         :param serializer_class: needed to get Model & sanitize list from DB
-        :param kwargs: filters that are proxied in db query
+        :param kwargs: filters that are proxied in db query (`_filter` query
+                       object is compiled once for both count & list)
         :return: dict that should be returned as a response
         """
+        if self.use_facet:
+            _filter = kwargs.pop("_filter", None)
+            # Options of db query (e.g. `_using`) aren't filters
+            options = {
+                key: kwargs.pop(key)
+                for key in list(kwargs)
+                if key.startswith("_")
+            }
+            query = build_filter(kwargs, _filter)
+            pipeline = [{"$match": query}] if query else []
+            return await self.paginate_aggregate(
+                serializer_class, pipeline, _sort=_sort, **options
+            )
+
         self.model = serializer_class.Meta.model
-        count, _list = await asyncio.gather(
-            self.get_count(**kwargs), self.get_list(_sort=_sort, **kwargs)
+        count, _list = await self.watch_disconnect(
+            asyncio.gather(
+                self.get_count(**kwargs), self.get_list(_sort=_sort, **kwargs)
+            )
         )
         # TODO: think about naming and separation of concerns
         _list = serializer_class.sanitize_list(_list)
@@ -1,4 +1,8 @@
+import asyncio
+import inspect
+
 from abc import ABC, abstractmethod
+from typing import Awaitable, Union
 
 from starlette import status
 from starlette.requests import Request
@@ -12,8 +16,10 @@ class BasePermission(ABC):
 
     Defines basic error message, status & error codes.
 
-    Upon initialization, calls abstract method  `has_required_permissions`
-    which will be specific to concrete implementation of Permission class.
+    When initialized with request, calls abstract method
+    `has_required_permissions` which will be specific to concrete
+    implementation of Permission class. `PermissionsDependency` instead
+    initializes permissions once and checks them on every request.
 
     You would write your permissions like this:
 
@@ -24,22 +30,49 @@ class BasePermission(ABC):
             def has_required_permissions(self, request: Request) -> bool:
                 return request.headers.get('User-Agent') == "Teapot v1.0"
 
+    Permissions that need I/O (e.g. DB lookup) could be async, but then
+    they are only checked using `PermissionsDependency` (initializing them
+    with request raises TypeError):
+
+    .. code-block:: python
+
+        class IsTeapotOwner(BasePermission):
+
+            async def has_required_permissions(self, request: Request) -> bool:
+                return await Teapot.count(owner_id=request.user.id) > 0
+
     """
     error_msg = "Forbidden."
     status_code = status.HTTP_403_FORBIDDEN
     error_code = status.HTTP_403_FORBIDDEN
 
     @abstractmethod
-    def has_required_permissions(self, request: Request) -> bool:
+    def has_required_permissions(
+        self, request: Request
+    ) -> Union[bool, Awaitable[bool]]:
         ...
 
-    def __init__(self, request: Request):
-        if not self.has_required_permissions(request):
-            raise HTTPException(
-                status_code=self.status_code,
-                detail=self.error_msg,
-                error_code=self.error_code
+    def __init__(self, request: Request = None):
+        if request is None:
+            return
+        if inspect.iscoroutinefunction(self.has_required_permissions):
+            raise TypeError(
+                f"{self.__class__.__name__} is async, it could only be "
+                f"checked using PermissionsDependency"
             )
+        if not self.has_required_permissions(request):
+            self.permission_denied()
+
+    def permission_denied(self) -> None:
+        """
+        Raises HTTPException with error message, status & error codes
+        of this permission.
+        """
+        raise HTTPException(
+            status_code=self.status_code,
+            detail=self.error_msg,
+            error_code=self.error_code
+        )
 
 
 class PermissionsDependency(object):
@@ -47,6 +80,15 @@ class PermissionsDependency(object):
     Permission dependency that is used to define and check all the permission
     classes from one place inside route definition.
 
+    Permission classes are instantiated once, upon route definition.
+    Sync permissions are checked first, in the order they are defined,
+    then async ones are checked concurrently and the first one that fails
+    cancels all the others. Results are memoized per request, so the same
+    permission class used in several dependencies is checked only once.
+
+    Permission classes, which override `__init__` (e.g. to check request
+    there), are still initialized with request on every request instead.
+
     Use it as an argument to FastAPI's `Depends` as follows:
 
     .. code-block:: python
@@ -64,7 +106,53 @@ class PermissionsDependency(object):
 
     def __init__(self, permissions_classes: list):
         self.permissions_classes = permissions_classes
-
-    def __call__(self, request: Request):
-        for permission_class in self.permissions_classes:
-            permission_class(request=request)
+        self.permissions = [
+            permission_class
+            if permission_class.__init__ is not BasePermission.__init__
+            else permission_class()
+            for permission_class in permissions_classes
+        ]
+
+    async def __call__(self, request: Request):
+        cache = request.scope.setdefault("permissions_cache", {})
+
+        pending = {}
+        for permission in self.permissions:
+            if isinstance(permission, type):
+                # Checks request in its own `__init__`
+                permission(request=request)
+                continue
+            granted = cache.get(permission.__class__)
+            if granted is None:
+                granted = permission.has_required_permissions(request)
+                if inspect.isawaitable(granted):
+                    pending[asyncio.ensure_future(granted)] = permission
+                    continue
+                cache[permission.__class__] = granted
+            if not granted:
+                self.cancel(pending)
+                permission.permission_denied()
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    permission = pending.pop(task)
+                    granted = task.result()
+                    cache[permission.__class__] = granted
+                    if not granted:
+                        permission.permission_denied()
+        finally:
+            self.cancel(pending)
+
+    @staticmethod
+    def cancel(tasks: dict) -> None:
+        """
+        Cancels checks of permissions that are still running.
+
+        :param tasks: dict of pending tasks to permission instances
+        """
+        for task in tasks:
+            task.cancel()
@@ -1,11 +1,13 @@
 from abc import ABC
-from typing import Iterable, List
+from typing import TYPE_CHECKING, Iterable, List
 
 from pydantic import BaseModel
-from pymongo.results import UpdateResult
 
 from fastapi_contrib.db.models import MongoDBModel
 
+if TYPE_CHECKING:  # pragma: no cover
+    from pymongo.results import UpdateResult
+
 
 class AbstractMeta(ABC):
     exclude: set = set()
@@ -130,7 +132,7 @@ class Serializer(BaseModel):
         filter_kwargs: dict,
         skip_defaults: bool = True,
         array_fields: list = None,
-    ) -> UpdateResult:
+    ) -> "UpdateResult":
         """
         If we have `model` attribute in Meta, it proxies filters & update data
         and after that returns actual result of update operation.
@@ -163,7 +165,7 @@ class Serializer(BaseModel):
         filter_kwargs: dict,
         skip_defaults: bool = True,
         array_fields: list = None,
-    ) -> UpdateResult:
+    ) -> "UpdateResult":
         """
         If we have `model` attribute in Meta, it proxies filters & update data
         and after that returns actual result of update operation.
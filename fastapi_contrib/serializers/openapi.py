@@ -1,7 +1,11 @@
-from typing import Type
+from typing import List, Type
 
 from fastapi_contrib.serializers.utils import gen_model, FieldGenerationMode
 
+# Serializers generated by `patch`, so that their schemas could be generated
+# beforehand (see `fastapi_contrib.db.utils.warmup`)
+patched_serializers: List[Type] = []
+
 
 def patch(cls: Type) -> Type:
     """
@@ -12,4 +16,6 @@ def patch(cls: Type) -> Type:
     :param cls: serializer class (model or regular)
     :return: wrapped class, which is newly generated pydantic's `BaseModel`
     """
-    return gen_model(cls, mode=FieldGenerationMode.REQUEST)
+    model = gen_model(cls, mode=FieldGenerationMode.REQUEST)
+    patched_serializers.append(model)
+    return model
@@ -3,9 +3,6 @@ import warnings
 
 from typing import Any
 
-from opentracing import tags
-from opentracing.propagation import Format
-
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
@@ -21,6 +18,9 @@ class OpentracingMiddleware(BaseHTTPMiddleware):
         """
         Gather various info about the request and start new span with the data.
         """
+        from opentracing import tags
+        from opentracing.propagation import Format
+
         span_context = tracer.extract(
             format=Format.HTTP_HEADERS, carrier=request.headers
         )
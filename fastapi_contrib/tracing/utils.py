@@ -1,8 +1,5 @@
 import warnings
 
-from jaeger_client import Config
-from opentracing.scope_managers.asyncio import AsyncioScopeManager
-
 from fastapi_contrib.conf import settings
 
 
@@ -22,6 +19,9 @@ def setup_opentracing(app):
     :param app: app object, instance of FastAPI
     :return: None
     """
+    from jaeger_client import Config
+    from opentracing.scope_managers.asyncio import AsyncioScopeManager
+
     config = Config(
         config={
             "local_agent": {
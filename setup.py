@@ -32,12 +32,14 @@ setup(
     description="Opinionated set of utilities on top of FastAPI",
     install_requires=requirements,
     extras_require={
-        "mongo": ["motor>=2.0.0"],
+        "mongo": ["motor>=2.1.0"],
         "ujson": ["ujson<2.0.0"],
         "pytz": ["pytz"],
+        "bsonjs": ["python-bsonjs"],
+        "compression": ["zstandard", "brotli"],
         "jaegertracing": ["jaeger-client>=4.1.0", "opentracing>=2.2.0"],
         "all": [
-            "motor>=2.0.0",
+            "motor>=2.1.0",
             "ujson<2.0.0",
             "pytz",
             "jaeger-client>=4.1.0",
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+
+from io import StringIO
+from unittest.mock import MagicMock
+
+from fastapi_contrib.common import logs
+from fastapi_contrib.common.logs import (
+    DroppingQueueHandler,
+    QueueLogging,
+    setup_queue_logging,
+    stop_queue_logging,
+)
+from fastapi_contrib.common.middlewares import request_id
+from fastapi_contrib.common.utils import get_logger
+from fastapi_contrib.conf import settings
+from fastapi_contrib.tracing.middlewares import request_span
+
+
+def test_queue_logging_writes_json_with_request_context():
+    stream = StringIO()
+    lib_logger = logging.getLogger("tests.queue_logging")
+    lib_logger.propagate = False
+    sink = setup_queue_logging(lib_logger, 100, stream=stream)
+
+    span = MagicMock()
+    span.context.trace_id = 255
+    request_id_token = request_id.set("abc")
+    request_span_token = request_span.set(span)
+    try:
+        lib_logger.info("Hello %s", "world")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            lib_logger.exception("Failed")
+    finally:
+        request_id.reset(request_id_token)
+        request_span.reset(request_span_token)
+    lib_logger.debug("Skipped")
+    lib_logger.warning("Outside")
+    stop_queue_logging()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(records) == 3
+    assert records[0]["message"] == "Hello world"
+    assert records[0]["level"] == "INFO"
+    assert records[0]["logger"] == "tests.queue_logging"
+    assert records[0]["request_id"] == "abc"
+    assert records[0]["trace_id"] == "ff"
+    assert "ValueError: boom" in records[1]["exception"]
+    assert records[2]["request_id"] is None
+    assert records[2]["trace_id"] is None
+    assert logs.queue_logging is None
+    assert not sink.dropped
+
+    lib_logger.handlers.clear()
+
+
+def test_queue_logging_drops_records_once_full():
+    sink = QueueLogging(maxsize=2, stream=StringIO())
+    record = logging.LogRecord("name", logging.INFO, "", 1, "msg", (), None)
+    for _ in range(5):
+        sink.handler.handle(record)
+    assert sink.queue.qsize() == 2
+    assert sink.dropped == 3
+
+
+def test_queue_logging_for_loguru_compatible_logger():
+    lib_logger = MagicMock()
+    sink = setup_queue_logging(lib_logger, 10, level="DEBUG")
+    try:
+        (handler,) = lib_logger.configure.call_args[1]["handlers"]
+        assert handler["sink"] is sink.handler
+        assert isinstance(handler["sink"], DroppingQueueHandler)
+        assert handler["level"] == "DEBUG"
+    finally:
+        stop_queue_logging()
+
+
+def test_get_logger_sets_up_queue_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    settings.log_queue_size = 10
+    try:
+        lib_logger = get_logger()
+        assert lib_logger is logging.getLogger("fastapi_contrib")
+        assert lib_logger is logs.queue_logging.logger
+        assert lib_logger.handlers == [logs.queue_logging.handler]
+        assert lib_logger.level == logging.INFO
+        assert not lib_logger.propagate
+        # Logging of the app isn't changed
+        assert root.handlers == handlers
+        assert root.level == level
+    finally:
+        settings.log_queue_size = None
+        lib_logger.handlers.clear()
+        lib_logger.propagate = True
+        stop_queue_logging()
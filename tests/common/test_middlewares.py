@@ -1,13 +1,27 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import gzip
+import json
+import sys
 import uuid
 
+from types import ModuleType
+from unittest.mock import patch
+
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
+from starlette.responses import StreamingResponse
 from starlette.testclient import TestClient
 
-from fastapi_contrib.common.middlewares import StateRequestIDMiddleware
+from fastapi_contrib.common.middlewares import (
+    CompressionMiddleware,
+    StateRequestIDMiddleware,
+    compression_level,
+    generate_request_id,
+    request_id,
+)
 from fastapi_contrib.conf import settings
 
 app = FastAPI()
@@ -24,8 +38,35 @@ def test_request_id_not_in_state():
     with TestClient(app) as client:
         response = client.get("/")
         assert response.status_code == 200
-        response = response.json()
-        assert response["request_id"] is None
+        generated_id = response.json()["request_id"]
+        assert len(generated_id) == 32
+        assert response.headers[settings.request_id_header] == generated_id
+
+        next_id = client.get("/").json()["request_id"]
+        assert next_id != generated_id
+        # Same process, later (or same) millisecond
+        assert next_id[12:24] == generated_id[12:24]
+        assert next_id[:12] >= generated_id[:12]
+
+
+def test_request_id_not_generated():
+    generator = settings.request_id_generator
+    settings.request_id_generator = None
+    try:
+        with TestClient(app) as client:
+            response = client.get("/")
+            assert response.status_code == 200
+            assert response.json()["request_id"] is None
+            assert settings.request_id_header not in response.headers
+    finally:
+        settings.request_id_generator = generator
+
+
+def test_generate_request_id_is_time_ordered():
+    ids = [generate_request_id() for _ in range(1000)]
+    assert len(set(ids)) == 1000
+    assert all(len(_id) == 32 and int(_id, 16) for _id in ids)
+    assert ids[0][:12] <= ids[-1][:12]
 
 
 def test_request_id_in_state():
@@ -35,5 +76,138 @@ def test_request_id_in_state():
             "/", headers={settings.request_id_header: request_id}
         )
         assert response.status_code == 200
+        assert response.headers[settings.request_id_header] == request_id
         response = response.json()
         assert response["request_id"] == request_id
+
+
+def test_request_id_in_context():
+    context_app = FastAPI()
+    context_app.add_middleware(StateRequestIDMiddleware)
+
+    @context_app.get("/")
+    async def context_index():
+        return {"request_id": request_id.get(None)}
+
+    with TestClient(context_app) as client:
+        response = client.get("/", headers={settings.request_id_header: "a"})
+        assert response.json()["request_id"] == "a"
+
+
+compression_app = FastAPI()
+compression_app.add_middleware(CompressionMiddleware, minimum_size=100)
+records = [{"id": i, "name": f"record {i}"} for i in range(100)]
+
+
+@compression_app.get("/list/")
+async def compressed_list():
+    return records
+
+
+@compression_app.get("/small/")
+async def small():
+    return {"a": 1}
+
+
+@compression_app.get("/plain/")
+@compression_level(0)
+async def plain():
+    return records
+
+
+@compression_app.get("/best/")
+@compression_level({"gzip": 9})
+async def best():
+    return records
+
+
+@compression_app.get("/stream/")
+async def stream():
+    async def chunks():
+        for record in records:
+            yield json.dumps(record).encode() + b"\n"
+
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+def test_compression_middleware_gzip():
+    with TestClient(compression_app) as client:
+        response = client.get("/list/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(
+            json.dumps(records)
+        )
+        assert response.json() == records
+
+        response = client.get("/list/", headers={"Accept-Encoding": "br"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == records
+
+        response = client.get("/small/", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == {"a": 1}
+
+
+def test_compression_middleware_per_route_level():
+    with TestClient(compression_app) as client:
+        response = client.get("/plain/", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == records
+
+        with patch(
+            "fastapi_contrib.common.middlewares.gzip.compress",
+            wraps=gzip.compress,
+        ) as compress:
+            client.get("/best/", headers={"Accept-Encoding": "gzip"})
+            assert compress.call_args[1] == {"compresslevel": 9}
+            client.get("/list/", headers={"Accept-Encoding": "gzip"})
+            assert compress.call_args[1] == {"compresslevel": 6}
+
+
+def test_compression_middleware_streaming_and_threadpool():
+    with TestClient(compression_app) as client:
+        response = client.get("/stream/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        lines = response.content.decode().splitlines()
+        assert [json.loads(line) for line in lines] == records
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, threadpool_min_size=1000)
+    app.add_api_route("/list/", compressed_list)
+    with patch(
+        "fastapi_contrib.common.middlewares.run_in_threadpool",
+        wraps=run_in_threadpool,
+    ) as run:
+        with TestClient(app) as client:
+            response = client.get("/list/")
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.json() == records
+        assert run.call_count == 1
+
+
+def test_compression_middleware_negotiation():
+    brotli = ModuleType("brotli")
+    zstandard = ModuleType("zstandard")
+    with patch.dict(sys.modules, {"brotli": brotli, "zstandard": zstandard}):
+        middleware = CompressionMiddleware(compression_app)
+    assert list(middleware.codecs) == ["zstd", "br", "gzip"]
+    assert list(CompressionMiddleware(compression_app).codecs) == ["gzip"]
+
+    def get_encoding(accept_encoding):
+        headers = [(b"accept-encoding", accept_encoding.encode())]
+        return middleware.get_encoding({"headers": headers})
+
+    assert get_encoding("gzip, deflate, br") == "br"
+    assert get_encoding("gzip, br;q=0.5, zstd") == "zstd"
+    assert get_encoding("gzip, br;q=0.5") == "gzip"
+    assert get_encoding("*") == "zstd"
+    assert get_encoding("*, zstd;q=0") == "br"
+    assert get_encoding("gzip;q=0, identity") is None
+    assert get_encoding("identity") is None
+    assert middleware.get_encoding({"headers": []}) is None
+
+    assert middleware.get_level({}, "br") == 4
+    endpoint = compression_level(30)(lambda: None)
+    assert middleware.get_level({"endpoint": endpoint}, "zstd") == 22
@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
+
+from unittest.mock import patch
+
 from fastapi_contrib.common.responses import UJSONResponse
 
 
@@ -8,3 +12,76 @@ def test_ujson_response_helps_with_slashes():
     url = "http://hello.world/endpoint/?key=value"
     json = UJSONResponse().render(content={"url": url})
     assert json == f'{{"url":"{url}"}}'.encode('utf-8')
+
+
+def test_raw_bson_response_renders_documents_as_is():
+    from datetime import datetime, timezone
+
+    from bson import BSON
+    from bson.raw_bson import RawBSONDocument
+
+    from fastapi_contrib.common.responses import RawBSONResponse
+
+    created = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    documents = [
+        RawBSONDocument(BSON.encode({"id": 1, "url": "http://a/b"})),
+        RawBSONDocument(BSON.encode({"id": 2, "created": created})),
+    ]
+    content = {"count": 2, "next": None, "result": documents}
+    rendered = RawBSONResponse().render(content)
+    assert json.loads(rendered) == {
+        "count": 2,
+        "next": None,
+        "result": [
+            {"id": 1, "url": "http://a/b"},
+            {"id": 2, "created": {"$date": "2020-01-02T03:04:05Z"}},
+        ],
+    }
+    assert RawBSONResponse().render([]) == b"[]"
+
+
+def test_raw_bson_response_uses_bsonjs():
+    import sys
+    from types import ModuleType
+
+    from bson import BSON
+    from bson.raw_bson import RawBSONDocument
+
+    from fastapi_contrib.common.responses import RawBSONResponse
+
+    bsonjs = ModuleType("bsonjs")
+    bsonjs.dumps = lambda raw: '{"raw":%d}' % len(raw)
+    document = RawBSONDocument(BSON.encode({"id": 1}))
+    with patch.dict(sys.modules, {"bsonjs": bsonjs}):
+        rendered = RawBSONResponse().render([document])
+    assert rendered == b'[{"raw":%d}]' % len(document.raw)
+
+
+def test_raw_bson_response_through_route():
+    from datetime import datetime, timezone
+
+    from bson import BSON, ObjectId
+    from bson.raw_bson import RawBSONDocument
+    from fastapi import FastAPI
+    from starlette.testclient import TestClient
+
+    from fastapi_contrib.common.responses import RawBSONResponse
+
+    app = FastAPI()
+    _id = ObjectId()
+    created = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    document = RawBSONDocument(BSON.encode({"id": _id, "created": created}))
+
+    @app.get("/", response_class=RawBSONResponse)
+    async def raw_list():
+        return RawBSONResponse([document])
+
+    with TestClient(app) as client:
+        response = client.get("/")
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "id": {"$oid": str(_id)},
+                "created": {"$date": "2020-01-01T00:00:00Z"},
+            }
+        ]
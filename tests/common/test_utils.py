@@ -1,15 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
+
 import pytest
 
 from asyncio import Future
 from unittest.mock import MagicMock
 
 from fastapi import FastAPI
+from starlette.requests import ClientDisconnect, Request
 
 from fastapi_contrib.common.utils import async_timing, resolve_dotted_path, \
-    get_current_app, get_logger
+    get_current_app, get_logger, resolve_cached, cancel_on_disconnect
 from tests.utils import override_settings
 
 
@@ -36,6 +39,13 @@ def test_resolve_dotted_path():
     assert _Future == Future
 
 
+def test_resolve_cached():
+    resolve_cached.cache_clear()
+    assert resolve_cached("asyncio.Future") is Future
+    assert resolve_cached("asyncio.Future") is Future
+    assert resolve_cached.cache_info().hits == 1
+
+
 @override_settings(fastapi_app="tests.common.test_utils.app")
 def test_get_current_app():
     _app = get_current_app()
@@ -76,3 +86,39 @@ async def test_async_timing_exception():
     with pytest.raises(ValueError):
         assert await return_value is None
     assert func.call
+
+
+def make_request(messages):
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(10)
+
+    return Request({"type": "http", "headers": []}, receive=receive)
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect():
+    async def query():
+        await asyncio.sleep(0.02)
+        return 42
+
+    request = make_request([])
+    assert await cancel_on_disconnect(request, query(), interval=0.01) == 42
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_cancels_awaitable():
+    cancelled = []
+
+    async def query():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    request = make_request([{"type": "http.disconnect"}])
+    with pytest.raises(ClientDisconnect):
+        await cancel_on_disconnect(request, query(), interval=0.01)
+    assert cancelled == [True]
@@ -3,9 +3,13 @@
 import pytest
 
 from fastapi import FastAPI
+from pymongo import ReadPreference, ReturnDocument
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
 
 from fastapi_contrib.db.client import MongoDBClient
 from fastapi_contrib.db.models import MongoDBModel, MongoDBTimeStampedModel
+from fastapi_contrib.db.query import Q
 from tests.mock import MongoDBMock
 from tests.utils import override_settings, AsyncMock, AsyncIterator
 from unittest.mock import patch
@@ -229,3 +233,358 @@ async def test_list_with_sort():
         await model.list(model)
 
         mock_list.assert_called_with(Model, _limit=0, _offset=0, _sort=None)
+
+
+@override_settings(fastapi_app="tests.db.test_client.app")
+def test_get_collection_is_cached():
+    MongoDBClient._MongoDBClient__instance = None
+
+    client = MongoDBClient()
+    client.mongodb = MongoDBMock()
+    collection = client.get_collection("collection")
+    assert client.get_collection("collection") is collection
+    assert client.mongodb.get_collection.call_count == 1
+
+    client.get_collection("collection", read_preference="secondary")
+    assert client.mongodb.get_collection.call_count == 2
+
+    # Cache is invalidated when database handle changes
+    client.mongodb = MongoDBMock()
+    client.get_collection("collection")
+    assert client.mongodb.get_collection.call_count == 1
+    MongoDBClient._MongoDBClient__instance = None
+
+
+@override_settings(fastapi_app="tests.db.test_client.app")
+def test_get_model_collection_is_stored_on_model():
+    MongoDBClient._MongoDBClient__instance = None
+
+    class CachedModel(MongoDBModel):
+        class Meta:
+            collection = "cached"
+
+    client = MongoDBClient()
+    client.mongodb = MongoDBMock(collection_name="cached")
+    collection = client.get_model_collection(CachedModel)
+    assert collection.name == "cached"
+    assert CachedModel._collection_handle[2] is collection
+
+    assert client.get_model_collection(CachedModel(id=1)) is collection
+    assert client.mongodb.get_collection.call_count == 1
+
+    client.mongodb = MongoDBMock(collection_name="cached")
+    assert client.get_model_collection(CachedModel) is not collection
+    MongoDBClient._MongoDBClient__instance = None
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_client.app")
+async def test_read_options_from_meta_and_per_call():
+    MongoDBClient._MongoDBClient__instance = None
+
+    class RoutedModel(MongoDBModel):
+        class Meta:
+            collection = "routed"
+            read_preference = "secondaryPreferred"
+            max_staleness = 120
+            read_concern = "majority"
+            write_concern = {"w": "majority"}
+
+    client = MongoDBClient()
+    client.mongodb = MongoDBMock(collection_name="routed")
+    get_collection = client.mongodb.get_collection
+
+    await client.count(RoutedModel, id=1)
+    _, options = get_collection.call_args
+    assert options["read_preference"].mode == (
+        ReadPreference.SECONDARY_PREFERRED.mode
+    )
+    assert options["read_preference"].max_staleness == 120
+    assert options["read_concern"] == ReadConcern("majority")
+    assert options["write_concern"] == WriteConcern(w="majority")
+
+    await client.get(RoutedModel, _read_preference="primary", id=1)
+    _, options = get_collection.call_args
+    assert options["read_preference"] == ReadPreference.PRIMARY
+
+    client.list(RoutedModel, _read_concern="local", _max_staleness=90)
+    _, options = get_collection.call_args
+    assert options["read_preference"].max_staleness == 90
+    assert options["read_concern"] == ReadConcern("local")
+
+    assert get_collection.call_count == 3
+    await client.count(RoutedModel, _read_preference="primary")
+    assert get_collection.call_count == 3
+    MongoDBClient._MongoDBClient__instance = None
+
+
+def archive_router(model):
+    if model.get_db_collection() == "routed_by_router":
+        return "archive"
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_client.app")
+async def test_database_routing():
+    from fastapi_contrib.conf import settings
+    MongoDBClient._MongoDBClient__instance = None
+
+    class ArchiveModel(MongoDBModel):
+        class Meta:
+            collection = "archived"
+            using = "archive"
+
+    class RouterModel(MongoDBModel):
+        class Meta:
+            collection = "routed_by_router"
+
+    client = MongoDBClient()
+    client.mongodb = MongoDBMock()
+    client.databases = {"archive": MongoDBMock(collection_name="archived")}
+    archive = client.databases["archive"]
+
+    assert client.get_database() is client.mongodb
+    assert client.get_database("default") is client.mongodb
+    assert client.get_database("archive") is archive
+    with pytest.raises(ValueError):
+        client.get_database("unknown")
+
+    await client.count(ArchiveModel, id=1)
+    assert archive.get_collection.call_count == 1
+    assert client.mongodb.get_collection.call_count == 0
+
+    await client.count(ArchiveModel, _using="default", id=1)
+    assert client.mongodb.get_collection.call_count == 1
+
+    await client.count(Model, _using="archive", id=1)
+    assert archive.get_collection.call_count == 2
+
+    assert client.get_database_alias(RouterModel) == "default"
+    settings.mongodb_router = "tests.db.test_client.archive_router"
+    try:
+        assert client.get_database_alias(RouterModel) == "archive"
+        assert client.get_database_alias(ArchiveModel) == "archive"
+        assert client.get_database_alias(Model) == "default"
+        assert client.get_database_alias(Model, using="x") == "x"
+    finally:
+        settings.mongodb_router = None
+    MongoDBClient._MongoDBClient__instance = None
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_client.app")
+async def test_aggregate():
+    MongoDBClient._MongoDBClient__instance = None
+
+    client = MongoDBClient()
+    collection = app.mongodb.get_collection.return_value
+    pipeline = [{"$match": {"a": 1}}]
+
+    cursor = client.aggregate(Model, pipeline)
+    assert [document async for document in cursor] == [{"_id": 1}]
+    collection.aggregate.assert_called_with(pipeline, session=None)
+
+    client.aggregate(Model, pipeline, allow_disk_use=True, batch_size=10)
+    collection.aggregate.assert_called_with(
+        pipeline, session=None, allowDiskUse=True, batchSize=10
+    )
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_client.app")
+async def test_update_with_upsert():
+    MongoDBClient._MongoDBClient__instance = None
+
+    client = MongoDBClient()
+    collection = app.mongodb.get_collection.return_value
+
+    await client.update_one(
+        Model, filter_kwargs={"id": 1}, upsert=True, **{"$inc": {"n": 1}}
+    )
+    collection.update_one.mock.assert_called_with(
+        {"_id": 1}, {"$inc": {"n": 1}}, session=None, upsert=True
+    )
+
+    await client.update_many(
+        Model, filter_kwargs={"a": 1}, upsert=True, **{"$set": {"b": 1}}
+    )
+    collection.update_many.mock.assert_called_with(
+        {"a": 1}, {"$set": {"b": 1}}, session=None, upsert=True
+    )
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_client.app")
+async def test_find_one_and_modify():
+    MongoDBClient._MongoDBClient__instance = None
+
+    client = MongoDBClient()
+    collection = app.mongodb.get_collection.return_value
+
+    result = await client.find_one_and_update(
+        Model,
+        filter_kwargs={"id": 1},
+        projection={"id": 1, "a": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        **{"$set": {"a": 2}}
+    )
+    assert result == {"_id": 1}
+    collection.find_one_and_update.mock.assert_called_with(
+        {"_id": 1},
+        {"$set": {"a": 2}},
+        projection={"_id": 1, "a": 1},
+        sort=None,
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        session=None,
+    )
+
+    await client.find_one_and_replace(
+        Model, filter_kwargs={"id": 1}, replacement=Model(id=1)
+    )
+    collection.find_one_and_replace.mock.assert_called_with(
+        {"_id": 1},
+        {"_id": 1},
+        projection=None,
+        sort=None,
+        upsert=False,
+        return_document=ReturnDocument.BEFORE,
+        session=None,
+    )
+
+    await client.find_one_and_delete(Model, sort=[("a", 1)], id=1)
+    collection.find_one_and_delete.mock.assert_called_with(
+        {"_id": 1}, projection=None, sort=[("a", 1)], session=None
+    )
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_client.app")
+async def test_max_time_ms():
+    MongoDBClient._MongoDBClient__instance = None
+
+    class LimitedModel(MongoDBModel):
+        class Meta:
+            collection = "limited"
+            max_time_ms = 100
+
+    client = MongoDBClient()
+    collection = app.mongodb.get_collection.return_value
+
+    await client.count(LimitedModel, a=1)
+    collection.count_documents.mock.assert_called_with(
+        {"a": 1}, session=None, maxTimeMS=100
+    )
+    await client.get(LimitedModel, _max_time_ms=50, a=1)
+    collection.find_one.mock.assert_called_with(
+        {"a": 1}, session=None, max_time_ms=50
+    )
+    with patch.object(collection, "find") as find:
+        client.list(LimitedModel, a=1)
+        find.assert_called_with(
+            {"a": 1},
+            session=None,
+            skip=0,
+            limit=0,
+            sort=None,
+            max_time_ms=100,
+        )
+    client.aggregate(LimitedModel, [])
+    collection.aggregate.assert_called_with([], session=None, maxTimeMS=100)
+
+    await client.count(Model, a=1)
+    collection.count_documents.mock.assert_called_with({"a": 1}, session=None)
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_client.app")
+async def test_filters_are_not_mutated():
+    MongoDBClient._MongoDBClient__instance = None
+
+    client = MongoDBClient()
+    collection = app.mongodb.get_collection.return_value
+
+    filter_kwargs = {"id": 1}
+    await client.update_one(Model, filter_kwargs, **{"$set": {"a": 1}})
+    await client.update_many(Model, filter_kwargs, **{"$set": {"a": 1}})
+    assert filter_kwargs == {"id": 1}
+    collection.update_many.mock.assert_called_with(
+        {"_id": 1}, {"$set": {"a": 1}}, session=None
+    )
+
+    await client.count(Model, _filter=Q(id__in=[1, 2]), a=1)
+    collection.count_documents.mock.assert_called_with(
+        {"_id": {"$in": [1, 2]}, "a": 1}, session=None
+    )
+    await client.delete(Model, _filter=Q(a__gt=1) | Q(b=2))
+    collection.delete_many.mock.assert_called_with(
+        {"$or": [{"a": {"$gt": 1}}, {"b": 2}]}, session=None
+    )
+
+
+@override_settings(fastapi_app="tests.db.test_client.app")
+def test_list_raw_bson():
+    MongoDBClient._MongoDBClient__instance = None
+
+    client = MongoDBClient()
+    client.mongodb = MongoDBMock()
+    collection = client.mongodb.get_collection.return_value
+    projection = {"_id": 0, "id": "$_id", "a": 1}
+    with patch.object(collection, "find") as find:
+        client.list(Model, _projection=projection, _raw_bson=True, a=1)
+        find.assert_called_with(
+            {"a": 1},
+            session=None,
+            skip=0,
+            limit=0,
+            sort=None,
+            projection=projection,
+        )
+    _, options = client.mongodb.get_collection.call_args
+    assert options["codec_options"] is client.raw_codec_options
+    assert options["codec_options"].tz_aware
+    assert "raw_bson" in repr(options["codec_options"].document_class)
+
+    assert client.get_projection({"id": 1, "a": 1}) == {"_id": 1, "a": 1}
+    assert client.get_projection(projection) == projection
+    MongoDBClient._MongoDBClient__instance = None
+
+
+@override_settings(fastapi_app="tests.db.test_client.app")
+def test_list_batch_size_and_exhaust():
+    from pymongo import CursorType
+
+    MongoDBClient._MongoDBClient__instance = None
+
+    class BatchedModel(MongoDBModel):
+        class Meta:
+            collection = "batched"
+            batch_size = 500
+
+    client = MongoDBClient()
+    collection = app.mongodb.get_collection.return_value
+    with patch.object(collection, "find") as find:
+        client.list(Model, _limit=1000)
+        _, options = find.call_args
+        assert options["batch_size"] == 1000
+
+        client.list(Model, _limit=1000, _batch_size=200)
+        _, options = find.call_args
+        assert options["batch_size"] == 200
+
+        client.list(BatchedModel, _limit=1000)
+        _, options = find.call_args
+        assert options["batch_size"] == 500
+
+        client.list(Model, _exhaust=True)
+        _, options = find.call_args
+        assert "batch_size" not in options
+        assert options["cursor_type"] == CursorType.EXHAUST
+
+        with pytest.raises(ValueError):
+            client.list(Model, _limit=10, _exhaust=True)
+
+    client.aggregate(BatchedModel, [])
+    collection.aggregate.assert_called_with([], session=None, batchSize=500)
+    MongoDBClient._MongoDBClient__instance = None
@@ -1,14 +1,27 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
+
 import pytest
 
 from datetime import datetime
-from fastapi import FastAPI
+from unittest.mock import patch
 
-from fastapi_contrib.db.models import MongoDBTimeStampedModel
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from pydantic import Field
+from pymongo.results import UpdateResult
+
+from fastapi_contrib.db.models import (
+    MongoDBModel,
+    MongoDBTimeStampedModel,
+    Record,
+    iterate_cursor,
+)
+from fastapi_contrib.exceptions import ConflictError
 from tests.mock import MongoDBMock
-from tests.utils import override_settings
+from tests.utils import override_settings, AsyncMock, AsyncIterator
 
 app = FastAPI()
 app.mongodb = MongoDBMock()
@@ -99,6 +112,92 @@ async def test_list_raw():
     assert not hasattr(list(_list)[0], "_id")
 
 
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_list_stream():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    iterator = await Model.list(stream=True, _exhaust=True, id=1)
+    assert [document async for document in iterator] == [{"id": 1}]
+
+    iterator = await Model.list(raw=False, stream=True, id=1)
+    instances = [instance async for instance in iterator]
+    assert isinstance(instances[0], Model)
+    assert instances[0].id == 1
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_list_as_records():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    records = await Model.list(as_records=True, id=1)
+    assert len(records) == 1
+    record = records[0]
+    assert isinstance(record, Record)
+    assert record.__class__ is Model.get_record_class()
+    assert record.id == 1
+    assert record.created is None
+    assert not hasattr(record, "__dict__")
+    assert dict(record) == {"id": 1, "created": None}
+    assert jsonable_encoder(records) == [{"id": 1, "created": None}]
+    assert repr(record) == "ModelRecord(id=1, created=None)"
+
+    iterator = await Model.list(as_records=True, stream=True, id=1)
+    assert [record async for record in iterator] == records
+
+
+def test_record_class():
+    class RecordModel(MongoDBModel):
+        name: str
+        tags: list = []
+        labels: dict = Field(default_factory=lambda: {"new": True})
+
+        class Meta:
+            collection = "records"
+
+    record_class = RecordModel.get_record_class()
+    assert RecordModel.get_record_class() is record_class
+    assert record_class.__slots__ == ("id", "name", "tags", "labels")
+
+    record = record_class({"id": 1, "name": "a", "extra": True})
+    assert record._asdict() == {
+        "id": 1, "name": "a", "tags": [], "labels": {"new": True}
+    }
+    # Mutable defaults aren't shared between records
+    other = record_class({"id": 1, "name": "a"})
+    assert other.tags is not record.tags
+    assert other.labels is not record.labels
+    assert record != record_class({"id": 2, "name": "a"})
+    with pytest.raises(AttributeError):
+        record.extra = True
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_list_raw_bson():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    with patch.object(MongoDBClient, "list") as mock_list:
+        mock_list.return_value = AsyncIterator([{"id": 1}])
+        _list = await Model.list_raw_bson(_limit=10, a=1)
+        assert _list == [{"id": 1}]
+        mock_list.assert_called_with(
+            Model,
+            _limit=10,
+            _offset=0,
+            _sort=None,
+            _projection={"_id": 0, "id": "$_id", "created": 1},
+            _raw_bson=True,
+            a=1,
+        )
+
+        mock_list.return_value = AsyncIterator([])
+        await Model.list_raw_bson(_fields=["id"])
+        _, options = mock_list.call_args
+        assert options["_projection"] == {"_id": 0, "id": "$_id"}
+
+
 @pytest.mark.asyncio
 @override_settings(fastapi_app="tests.db.test_models.app")
 async def test_save():
@@ -145,3 +244,191 @@ async def test_update_many():
     MongoDBClient._MongoDBClient__instance = None
     result = await Model.update_many(filter_kwargs={"id": 1}, id=2)
     assert result.raw_result == {}
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_aggregate():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    pipeline = [{"$group": {"_id": "$field"}}]
+
+    result = await Model.aggregate(pipeline, allow_disk_use=True)
+    assert result == [{"id": 1}]
+
+    iterator = await Model.aggregate(pipeline, stream=True)
+    assert [document async for document in iterator] == [{"id": 1}]
+
+
+class VersionedModel(MongoDBModel):
+    name: str = None
+    note: str = None
+    rank: int = 42
+    version: int = 0
+
+    class Meta:
+        collection = "collection"
+        version_field = "version"
+
+
+def test_changed_fields():
+    instance = Model(id=1)
+    assert instance.get_changed_fields() == set()
+
+    instance.created = datetime.utcnow()
+    assert instance.get_changed_fields() == {"created"}
+
+    copy = instance.copy()
+    copy.id = 2
+    assert instance.get_changed_fields() == {"created"}
+    assert copy.get_changed_fields() == {"created", "id"}
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_update():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    collection = app.mongodb.get_collection.return_value
+
+    instance = VersionedModel(id=1, name="a", note="b")
+    assert await instance.update() is None
+
+    instance.id = 1
+    instance.name = "c"
+    instance.note = None
+    # None isn't unset if it would be read back as default
+    instance.rank = None
+    with patch.object(
+        collection,
+        "update_one",
+        new=AsyncMock(
+            return_value=UpdateResult(raw_result={"n": 1}, acknowledged=True)
+        ),
+    ):
+        result = await instance.update()
+        collection.update_one.mock.assert_called_once_with(
+            {"_id": 1, "version": 0},
+            {
+                "$set": {"name": "c", "rank": None},
+                "$unset": {"note": ""},
+                "$inc": {"version": 1},
+            },
+            session=None,
+        )
+    assert result.matched_count == 1
+    assert instance.version == 1
+    assert instance.get_changed_fields() == set()
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_update_conflict():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    collection = app.mongodb.get_collection.return_value
+
+    instance = VersionedModel(id=1, version=3)
+    instance.name = "c"
+    with patch.object(
+        collection,
+        "update_one",
+        new=AsyncMock(
+            return_value=UpdateResult(raw_result={"n": 0}, acknowledged=True)
+        ),
+    ):
+        with pytest.raises(ConflictError):
+            await instance.update()
+    assert instance.version == 3
+    assert instance.get_changed_fields() == {"name"}
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_find_one_and_modify():
+    app.mongodb = MongoDBMock()
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    collection = app.mongodb.get_collection.return_value
+
+    filter_kwargs = {"id": 1}
+    instance = await Model.find_one_and_update(
+        filter_kwargs, return_document=True, **{"$set": {"a": 1}}
+    )
+    assert isinstance(instance, Model)
+    assert instance.id == 1
+    assert filter_kwargs == {"id": 1}
+
+    instance = await Model.find_one_and_replace(
+        filter_kwargs, replacement=Model(id=1), upsert=True
+    )
+    assert instance.id == 1
+
+    instance = await Model.find_one_and_delete(id=1)
+    assert instance.id == 1
+
+    with patch.object(
+        collection, "find_one_and_delete", new=AsyncMock(return_value=None)
+    ):
+        assert await Model.find_one_and_delete(id=2) is None
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_models.app")
+async def test_find_one_and_modify_with_projection():
+    app.mongodb = MongoDBMock()
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    collection = app.mongodb.get_collection.return_value
+
+    class RequiredModel(MongoDBModel):
+        name: str
+        status: str
+
+        class Meta:
+            collection = "collection"
+
+    with patch.object(
+        collection,
+        "find_one_and_update",
+        new=AsyncMock(return_value={"status": "running"}),
+    ):
+        instance = await RequiredModel.find_one_and_update(
+            {"name": "a"},
+            projection={"id": 0, "status": 1},
+            **{"$set": {"status": "running"}}
+        )
+    assert instance.status == "running"
+    assert instance.id is None
+    assert not hasattr(instance, "name")
+
+
+class CursorMock(object):
+    def __init__(self):
+        self.close = AsyncMock()
+
+    async def __aiter__(self):
+        yield {"_id": 1}
+        await asyncio.sleep(10)
+        yield {"_id": 2}
+
+
+@pytest.mark.asyncio
+async def test_iterate_cursor_closes_cursor():
+    cursor = CursorMock()
+    iterator = iterate_cursor(cursor)
+    assert await iterator.__anext__() == {"id": 1}
+    await iterator.aclose()
+    cursor.close.mock.assert_called_once_with()
+
+    cursor = CursorMock()
+    task = asyncio.ensure_future(collect(iterate_cursor(cursor)))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    cursor.close.mock.assert_called_once_with()
+
+
+async def collect(iterator):
+    return [document async for document in iterator]
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+from fastapi_contrib.db.monitoring import (
+    CommandMetricsListener,
+    MetricsRegistry,
+    PoolMetricsListener,
+    metrics,
+)
+
+
+ADDRESS = ("localhost", 27017)
+
+
+def test_metrics_registry():
+    registry = MetricsRegistry()
+    registry.increment("requests")
+    registry.increment("requests", 2)
+    registry.set_gauge("size", 5, address="a")
+    registry.increment("size", -1, address="a")
+    registry.observe("latency", 2, collection="users")
+    registry.observe("latency", 4, collection="users")
+
+    snapshot = registry.snapshot()
+    assert snapshot["counters"] == {"requests": 3}
+    assert snapshot["gauges"] == {"size{address=a}": 4}
+    assert snapshot["timings"] == {
+        "latency{collection=users}": {
+            "count": 2, "total": 6, "max": 4, "mean": 3.0
+        }
+    }
+
+    registry.reset()
+    assert registry.snapshot() == {"counters": {}, "gauges": {}, "timings": {}}
+
+
+def test_default_registry():
+    assert PoolMetricsListener().registry is metrics
+    assert CommandMetricsListener().registry is metrics
+
+
+def test_pool_metrics_listener():
+    registry = MetricsRegistry()
+    listener = PoolMetricsListener(registry)
+    event = SimpleNamespace(address=ADDRESS, connection_id=1)
+
+    listener.pool_created(event)
+    listener.connection_created(event)
+    listener.connection_created(event)
+    listener.connection_check_out_started(event)
+    listener.connection_checked_out(event)
+    listener.connection_check_out_started(event)
+    listener.connection_checked_out(event)
+    listener.connection_checked_in(event)
+    listener.connection_closed(event)
+    listener.connection_check_out_started(event)
+    listener.connection_check_out_failed(
+        SimpleNamespace(address=ADDRESS, reason="timeout")
+    )
+    listener.pool_cleared(event)
+
+    snapshot = registry.snapshot()
+    assert snapshot["gauges"] == {
+        "mongodb.pool.size{address=localhost:27017}": 1,
+        "mongodb.pool.checked_out{address=localhost:27017}": 1,
+    }
+    assert snapshot["counters"] == {
+        "mongodb.pool.checkout_failed"
+        "{address=localhost:27017,reason=timeout}": 1,
+        "mongodb.pool.cleared{address=localhost:27017}": 1,
+    }
+    wait = snapshot["timings"][
+        "mongodb.pool.checkout_wait_ms{address=localhost:27017}"
+    ]
+    assert wait["count"] == 2
+    assert wait["max"] >= 0
+
+
+def test_pool_metrics_listener_checkout_without_start():
+    registry = MetricsRegistry()
+    listener = PoolMetricsListener(registry)
+    listener.connection_checked_out(SimpleNamespace(address=ADDRESS))
+
+    assert registry.snapshot()["timings"] == {}
+
+
+def test_command_metrics_listener():
+    registry = MetricsRegistry()
+    listener = CommandMetricsListener(registry)
+
+    listener.started(
+        SimpleNamespace(
+            command={"find": "users", "filter": {}},
+            command_name="find",
+            request_id=1,
+        )
+    )
+    listener.started(
+        SimpleNamespace(
+            command={"ping": 1}, command_name="ping", request_id=2
+        )
+    )
+    listener.succeeded(
+        SimpleNamespace(
+            command_name="find", request_id=1, duration_micros=1500
+        )
+    )
+    listener.failed(
+        SimpleNamespace(command_name="ping", request_id=2, duration_micros=500)
+    )
+
+    snapshot = registry.snapshot()
+    assert snapshot["timings"] == {
+        "mongodb.command.duration_ms{collection=users,command=find}": {
+            "count": 1, "total": 1.5, "max": 1.5, "mean": 1.5
+        },
+        "mongodb.command.duration_ms{collection=None,command=ping}": {
+            "count": 1, "total": 0.5, "max": 0.5, "mean": 0.5
+        },
+    }
+    assert snapshot["counters"] == {
+        "mongodb.command.failed{collection=None,command=ping}": 1
+    }
+    assert listener._collections == {}
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+
+from fastapi_contrib.common.middlewares import request_id
+from fastapi_contrib.db.models import MongoDBModel
+from fastapi_contrib.db.monitoring import metrics
+from fastapi_contrib.db.profiling import (
+    _inspections,
+    explain,
+    get_query_shape,
+    get_slow_queries,
+    inspect_query,
+    is_collection_scan,
+)
+from tests.mock import MongoDBMock
+from tests.utils import override_settings, AsyncMock
+
+app = FastAPI()
+app.mongodb = MongoDBMock()
+collection = app.mongodb.get_collection.return_value
+collection.database = MagicMock()
+collection.database.command = AsyncMock(
+    return_value={
+        "queryPlanner": {
+            "winningPlan": {
+                "stage": "SORT", "inputStage": {"stage": "COLLSCAN"}
+            }
+        }
+    }
+)
+
+
+class Model(MongoDBModel):
+    class Meta:
+        collection = "collection"
+
+
+def test_get_query_shape():
+    assert get_query_shape({}) == {}
+    assert get_query_shape(
+        {"a": 1, "b": {"$in": [1, 2]}, "$or": [{"c": "x"}, {"d": None}]}
+    ) == {"a": "?", "b": {"$in": "?"}, "$or": [{"c": "?"}, {"d": "?"}]}
+
+
+def test_is_collection_scan():
+    assert not is_collection_scan({"winningPlan": {"stage": "IXSCAN"}})
+    assert is_collection_scan(
+        {"winningPlan": {"inputStages": [{"stage": "COLLSCAN"}]}}
+    )
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_profiling.app")
+async def test_explain():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+
+    filters = {"id": 1}
+    await explain(Model, "find", filters)
+    collection.database.command.mock.assert_called_with(
+        {
+            "explain": {"find": collection.name, "filter": {"_id": 1}},
+            "verbosity": "queryPlanner",
+        }
+    )
+    assert filters == {"id": 1}
+
+    await explain(Model, "count", {"a": 1})
+    collection.database.command.mock.assert_called_with(
+        {
+            "explain": {"count": collection.name, "query": {"a": 1}},
+            "verbosity": "queryPlanner",
+        }
+    )
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_profiling.app",
+    mongodb_slow_query_ms=0,
+    mongodb_explain_sample_rate=1.0,
+)
+async def test_profile_query():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    metrics.reset()
+
+    try:
+        await Model.list(a=1, _limit=10)
+        await Model.list(a=2, stream=True)
+        await Model.count(b={"$gt": 1})
+        # Queries are inspected in background
+        assert len(_inspections) == 3
+        await asyncio.gather(*_inspections)
+        await asyncio.sleep(0)
+        assert not _inspections
+    finally:
+        settings.mongodb_slow_query_ms = None
+        settings.mongodb_explain_sample_rate = 0.0
+
+    model = f"{Model.__module__}.{Model.__qualname__}"
+    assert get_slow_queries() == [
+        {
+            "model": model,
+            "operation": "find",
+            "shape": json.dumps({"a": "?"}),
+            "slow": 2,
+            "collscan": 2,
+        },
+        {
+            "model": model,
+            "operation": "count",
+            "shape": json.dumps({"b": {"$gt": "?"}}),
+            "slow": 1,
+            "collscan": 1,
+        },
+    ]
+    assert len(get_slow_queries(limit=1)) == 1
+
+    # Disabled profiling doesn't record anything
+    metrics.reset()
+    await Model.list(a=1)
+    assert not _inspections
+    assert get_slow_queries() == []
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_profiling.app",
+    mongodb_slow_query_ms=100,
+    mongodb_explain_sample_rate=1.0,
+)
+async def test_inspect_query_fast_and_failed_explain():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    metrics.reset()
+
+    command = collection.database.command
+    collection.database.command = AsyncMock(side_effect=RuntimeError)
+    try:
+        await inspect_query(Model, "find", {"a": 1}, duration=1.0)
+    finally:
+        collection.database.command = command
+        settings.mongodb_slow_query_ms = None
+        settings.mongodb_explain_sample_rate = 0.0
+
+    assert get_slow_queries() == []
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_profiling.app",
+    mongodb_slow_query_ms=0,
+    mongodb_explain_sample_rate=1.0,
+)
+async def test_inspect_query_logs_request_id():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+
+    token = request_id.set("abc")
+    try:
+        with patch("fastapi_contrib.db.profiling.logger") as logger:
+            await inspect_query(Model, "find", {"a": 1}, duration=1.0)
+    finally:
+        request_id.reset(token)
+        settings.mongodb_slow_query_ms = None
+        settings.mongodb_explain_sample_rate = 0.0
+
+    slow, collscan = [args[0] for args, _ in logger.warning.call_args_list]
+    assert slow.startswith("Slow query (1.000 ms)")
+    assert slow.endswith(" [request abc]")
+    assert collscan.endswith(" [request abc]")
+    metrics.reset()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from fastapi_contrib.db.query import Q, build_filter, freeze
+
+
+def test_compile_lookups():
+    query = Q(id=1, age__gte=18, age__lt=65, tags__in=["a"], name__x="y")
+    assert query.compile() == {
+        "_id": 1,
+        "age": {"$gte": 18, "$lt": 65},
+        "tags": {"$in": ["a"]},
+        "name__x": "y",
+    }
+    assert query.compile() is query.compile()
+    assert Q(id__in=[1, 2]).compile() == {"_id": {"$in": [1, 2]}}
+    assert Q(a=1, a__gt=0).compile() == {"a": {"$eq": 1, "$gt": 0}}
+    assert Q(a__gt=0, a=1).compile() == {"a": {"$gt": 0, "$eq": 1}}
+    with pytest.raises(ValueError):
+        Q(a=1, a__eq=2).compile()
+
+
+def test_combine():
+    assert (Q(a=1) & Q(b__ne=2)).compile() == {
+        "$and": [{"a": 1}, {"b": {"$ne": 2}}]
+    }
+    assert (Q(a=1) | Q(id=2)).compile() == {"$or": [{"a": 1}, {"_id": 2}]}
+    assert (~Q(a=1)).compile() == {"$nor": [{"a": 1}]}
+    assert repr(Q(a=1)) == "Q({'a': 1})"
+    # Filter dict isn't merged with lookups
+    with pytest.raises(TypeError):
+        Q({"x": 1}, y=2)
+    assert Q._from_filter({"x": 1}) == Q(x=1)
+
+
+def test_hashable():
+    cache = {Q(a=1, b__in=[1, 2]): "cached"}
+    assert cache[Q(a=1, b__in=[1, 2])] == "cached"
+    # Embedded documents match only with the same order of fields
+    assert Q(a={"x": 1, "y": 2}) != Q(a={"y": 2, "x": 1})
+    assert Q(a=1) != Q(a=2)
+    assert Q(a=1) != {"a": 1}
+    assert isinstance(hash(freeze({"a": [{"b": {1}}], "c": bytearray()})), int)
+
+
+def test_build_filter():
+    filter_kwargs = {"id": 1, "a": 2}
+    assert build_filter(filter_kwargs) == {"_id": 1, "a": 2}
+    assert filter_kwargs == {"id": 1, "a": 2}
+    assert build_filter() == {}
+    assert build_filter(Q(id=1)) == {"_id": 1}
+    assert build_filter(Q(a=1), Q(b=2)) == {"$and": [{"a": 1}, {"b": 2}]}
+    assert build_filter({}, Q(a=1)) == {"a": 1}
+    assert build_filter({"b": 2}, Q(a__gt=1)) == {"a": {"$gt": 1}, "b": 2}
+    assert build_filter({"a": 2}, Q(a__gt=1)) == {
+        "$and": [{"a": {"$gt": 1}}, {"a": 2}]
+    }
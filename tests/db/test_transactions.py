@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from pymongo.read_concern import ReadConcern
+
+from fastapi_contrib.db.client import MongoDBClient
+from fastapi_contrib.db.models import MongoDBModel
+from fastapi_contrib.db.transactions import (
+    get_session,
+    run_in_transaction,
+    transaction,
+)
+from tests.mock import MongoDBMock
+from tests.utils import override_settings
+
+
+class SessionMock(object):
+    def __init__(self, client=None):
+        self.client = client
+        self.start_transaction = MagicMock(return_value=TransactionMock())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        ...
+
+    async def with_transaction(self, callback, **kwargs):
+        self.transaction_options = kwargs
+        # Callback is retried on transient errors
+        await callback(self)
+        return await callback(self)
+
+
+class TransactionMock(object):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.exited = args
+
+
+app = FastAPI()
+app.mongodb = MongoDBMock()
+app.mongodb_databases = {"archive": MongoDBMock(collection_name="archived")}
+session = SessionMock(client=app.mongodb.client)
+
+
+async def start_session():
+    return session
+
+
+app.mongodb.client.start_session = start_session
+collection = app.mongodb.get_collection.return_value
+
+
+class Model(MongoDBModel):
+    class Meta:
+        collection = "collection"
+
+
+class ArchivedModel(MongoDBModel):
+    class Meta:
+        collection = "archived"
+        using = "archive"
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_transactions.app")
+async def test_transaction():
+    MongoDBClient._MongoDBClient__instance = None
+
+    assert get_session() is None
+    async with transaction(read_concern="majority") as _session:
+        assert _session is session
+        assert get_session() is session
+        await Model(id=1).save()
+        collection.insert_one.mock.assert_called_with(
+            {"_id": 1}, session=session
+        )
+    assert get_session() is None
+    session.start_transaction.assert_called_with(
+        read_concern=ReadConcern("majority"),
+        write_concern=None,
+        read_preference=None,
+    )
+
+    await Model(id=1).save()
+    collection.insert_one.mock.assert_called_with({"_id": 1}, session=None)
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_transactions.app")
+async def test_transaction_aborts_on_error():
+    MongoDBClient._MongoDBClient__instance = None
+
+    with pytest.raises(ValueError):
+        async with transaction():
+            raise ValueError()
+    assert session.start_transaction.return_value.exited[0] is ValueError
+    assert get_session() is None
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_transactions.app")
+async def test_run_in_transaction():
+    MongoDBClient._MongoDBClient__instance = None
+    calls = []
+
+    async def count(**kwargs):
+        calls.append(get_session())
+        return await Model.count(**kwargs)
+
+    result = await run_in_transaction(count, a=1, write_concern={"w": 1})
+    assert result == 1
+    assert calls == [session, session]
+    collection.count_documents.mock.assert_called_with(
+        {"a": 1}, session=session
+    )
+    assert session.transaction_options["write_concern"].document == {"w": 1}
+    assert get_session() is None
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_transactions.app")
+async def test_transaction_on_other_connection():
+    MongoDBClient._MongoDBClient__instance = None
+    archived = app.mongodb_databases["archive"].get_collection.return_value
+
+    async with transaction():
+        await Model.count(a=1)
+        # Explicit session is used as is
+        await ArchivedModel.count(session="archive session")
+        archived.count_documents.mock.assert_called_with(
+            {}, session="archive session"
+        )
+        with pytest.raises(ValueError):
+            await ArchivedModel.count(a=1)
+        with pytest.raises(ValueError):
+            await Model.count(_using="archive")
+    await ArchivedModel.count(a=1)
+    archived.count_documents.mock.assert_called_with({"a": 1}, session=None)
@@ -1,15 +1,23 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from unittest.mock import patch
+import json
+import tempfile
 
 import pytest
 import random
 
 from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 import pytz
+from bson import SON
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel, ReadPreference
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
 
 from fastapi_contrib.auth.models import User, Token
 from fastapi_contrib.db.utils import (
@@ -18,10 +26,19 @@ from fastapi_contrib.db.utils import (
     setup_mongodb,
     get_models,
     create_indexes,
+    models_registry,
+    dump_models_manifest,
+    index_differs,
+    get_read_preference,
+    get_read_concern,
+    get_write_concern,
+    get_connection_settings,
+    warmup,
 )
+from fastapi_contrib.db.models import MongoDBModel
 from fastapi_contrib.common.utils import get_now
 from tests.mock import MongoDBMock
-from tests.utils import override_settings
+from tests.utils import override_settings, AsyncMock
 
 
 app = FastAPI()
@@ -75,12 +92,69 @@ def test_get_models():
     assert get_models() == [User, Token]
 
 
+def test_models_registry():
+    class RegisteredModel(MongoDBModel):
+        class Meta:
+            collection = "registered"
+
+    path = f"{RegisteredModel.__module__}.{RegisteredModel.__qualname__}"
+    assert models_registry[path] is RegisteredModel
+    assert models_registry["fastapi_contrib.auth.models.User"] is User
+
+
 @override_settings(apps_folder_name="fastapi_contrib")
 @override_settings(apps=["auth"])
-@patch("pyclbr.readmodule")
-def test_get_models_with_error_in_importing(mock_pyclbr):
-    mock_pyclbr.side_effect = AttributeError()
-    assert get_models() == []
+def test_get_models_ignores_models_defined_locally():
+    class Meta:
+        collection = "local"
+
+    # Module & qualname are set before the model is registered
+    qualname = "create_model.<locals>.Local"
+    path = f"fastapi_contrib.auth.models.{qualname}"
+    type(MongoDBModel)(
+        "Local",
+        (MongoDBModel,),
+        {
+            "__module__": "fastapi_contrib.auth.models",
+            "__qualname__": qualname,
+            "Meta": Meta,
+        },
+    )
+    try:
+        assert path in models_registry
+        assert get_models() == [User, Token]
+    finally:
+        models_registry.pop(path, None)
+
+
+@override_settings(apps_folder_name="tests")
+@override_settings(apps=["broken"])
+def test_get_models_with_error_in_importing():
+    with pytest.raises(ModuleNotFoundError):
+        get_models()
+
+
+@override_settings(apps_folder_name="fastapi_contrib")
+@override_settings(apps=["auth"])
+def test_get_models_from_manifest():
+    manifest = Path(tempfile.mkdtemp()) / "models.json"
+    assert dump_models_manifest(str(manifest)) == [
+        "fastapi_contrib.auth.models.User",
+        "fastapi_contrib.auth.models.Token",
+    ]
+    assert json.loads(manifest.read_text()) == [
+        "fastapi_contrib.auth.models.User",
+        "fastapi_contrib.auth.models.Token",
+    ]
+
+    manifest.write_text(json.dumps(["fastapi_contrib.auth.models.Token"]))
+
+    from fastapi_contrib.conf import settings
+    settings.models_manifest = str(manifest)
+    try:
+        assert get_models() == [Token]
+    finally:
+        settings.models_manifest = None
 
 
 @override_settings(apps_folder_name="apps")
@@ -128,3 +202,372 @@ async def test_create_indexes_not_found_models():
     MongoDBClient._MongoDBClient__instance = None
     created_indexes = await create_indexes()
     assert created_indexes == []
+
+
+def test_index_differs():
+    index = Token.Meta.indexes[0].document
+    existing = {
+        "v": 2,
+        "key": SON([("expires", 1)]),
+        "name": "TokenIndex",
+        "expireAfterSeconds": 86400,
+    }
+    assert not index_differs(index, existing)
+
+    existing["expireAfterSeconds"] = 10
+    assert index_differs(index, existing)
+
+    existing["expireAfterSeconds"] = 86400
+    existing["key"] = SON([("expires", -1)])
+    assert index_differs(index, existing)
+
+
+def test_index_differs_normalizes_text_and_collation():
+    text = IndexModel(
+        [("user_id", 1), ("title", "text"), ("body", "text")],
+        name="search",
+        weights={"title": 10},
+        collation={"locale": "en", "strength": 2},
+    ).document
+    existing = {
+        "v": 2,
+        "key": SON([("user_id", 1), ("_fts", "text"), ("_ftsx", 1)]),
+        "name": "search",
+        "weights": SON([("body", 1), ("title", 10)]),
+        "default_language": "english",
+        "language_override": "language",
+        "textIndexVersion": 3,
+        "collation": {
+            "locale": "en",
+            "caseLevel": False,
+            "caseFirst": "off",
+            "strength": 2,
+            "numericOrdering": False,
+            "alternate": "non-ignorable",
+            "maxVariable": "punct",
+            "normalization": False,
+            "backwards": False,
+            "version": "57.1",
+        },
+    }
+    assert not index_differs(text, existing)
+
+    existing["weights"] = SON([("body", 1), ("title", 1)])
+    assert index_differs(text, existing)
+
+    existing["weights"] = SON([("body", 1), ("title", 10)])
+    existing["collation"]["strength"] = 3
+    assert index_differs(text, existing)
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_utils.app",
+    apps_folder_name="fastapi_contrib",
+    apps=["auth"]
+)
+async def test_create_indexes_skips_existing():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    mongodb = app.mongodb
+    app.mongodb = MongoDBMock(
+        collection_name="tokens",
+        create_indexes_result="tokens",
+        list_indexes_result=[{
+            "name": "TokenIndex",
+            "key": SON([("expires", 1)]),
+            "expireAfterSeconds": 86400,
+        }],
+    )
+    try:
+        created_indexes = await create_indexes()
+        collection = app.mongodb.get_collection("tokens")
+    finally:
+        app.mongodb = mongodb
+        MongoDBClient._MongoDBClient__instance = None
+
+    assert created_indexes == []
+    assert not collection.create_indexes.mock.called
+    assert not collection.drop_index.mock.called
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_utils.app",
+    apps_folder_name="fastapi_contrib",
+    apps=["auth"],
+    mongodb_indexes_recreate=True,
+)
+async def test_create_indexes_recreates_changed():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    mongodb = app.mongodb
+    app.mongodb = MongoDBMock(
+        collection_name="tokens",
+        create_indexes_result="tokens",
+        list_indexes_result=[{
+            "name": "TokenIndex",
+            "key": SON([("expires", 1)]),
+            "expireAfterSeconds": 10,
+        }],
+    )
+    try:
+        created_indexes = await create_indexes()
+        collection = app.mongodb.get_collection("tokens")
+    finally:
+        app.mongodb = mongodb
+        settings.mongodb_indexes_recreate = False
+        MongoDBClient._MongoDBClient__instance = None
+
+    assert created_indexes == ["tokens"]
+    collection.drop_index.mock.assert_called_with("TokenIndex")
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_utils.app",
+    apps_folder_name="fastapi_contrib",
+    apps=["auth"],
+)
+async def test_create_indexes_logs_changed():
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    mongodb = app.mongodb
+    app.mongodb = MongoDBMock(
+        collection_name="tokens",
+        create_indexes_result="tokens",
+        list_indexes_result=[{
+            "name": "TokenIndex",
+            "key": SON([("expires", 1)]),
+            "expireAfterSeconds": 10,
+        }],
+    )
+    try:
+        with patch("fastapi_contrib.db.models.logger") as logger:
+            created_indexes = await create_indexes()
+        collection = app.mongodb.get_collection("tokens")
+    finally:
+        app.mongodb = mongodb
+        MongoDBClient._MongoDBClient__instance = None
+
+    assert created_indexes == []
+    assert not collection.drop_index.mock.called
+    assert "TokenIndex" in logger.warning.call_args[0][0]
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_utils.app",
+    apps_folder_name="fastapi_contrib",
+    apps=["auth"],
+    mongodb_indexes_lock=True,
+)
+async def test_create_indexes_with_lock():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    try:
+        created_indexes = await create_indexes()
+    finally:
+        settings.mongodb_indexes_lock = False
+
+    collection = app.mongodb.get_collection("tokens")
+    assert created_indexes == ["tokens"]
+    filter_kwargs = collection.update_one.mock.call_args[0][0]
+    assert filter_kwargs["_id"] == "create_indexes"
+    owner = collection.update_one.mock.call_args[0][1]["$set"]["owner"]
+    collection.delete_one.mock.assert_called_with(
+        {"_id": "create_indexes", "owner": owner}
+    )
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_utils.app",
+    apps_folder_name="fastapi_contrib",
+    apps=["auth"],
+    mongodb_indexes_lock=True,
+)
+async def test_create_indexes_lock_held_by_another_worker():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.db.client import MongoDBClient
+    MongoDBClient._MongoDBClient__instance = None
+    mongodb = app.mongodb
+    app.mongodb = MongoDBMock(
+        collection_name="tokens", create_indexes_result="tokens"
+    )
+    collection = app.mongodb.get_collection("tokens")
+    collection.update_one = AsyncMock(side_effect=DuplicateKeyError("dup"))
+    try:
+        created_indexes = await create_indexes()
+    finally:
+        settings.mongodb_indexes_lock = False
+        app.mongodb = mongodb
+        MongoDBClient._MongoDBClient__instance = None
+
+    assert created_indexes == []
+    assert not collection.create_indexes.mock.called
+
+
+def test_get_read_preference():
+    assert get_read_preference(None) is None
+
+    read_preference = get_read_preference("secondaryPreferred")
+    assert read_preference == ReadPreference.SECONDARY_PREFERRED
+
+    read_preference = get_read_preference("secondary", max_staleness=120)
+    assert read_preference.mode == ReadPreference.SECONDARY.mode
+    assert read_preference.max_staleness == 120
+
+    read_preference = get_read_preference(ReadPreference.NEAREST, 90)
+    assert read_preference.mode == ReadPreference.NEAREST.mode
+    assert read_preference.max_staleness == 90
+    nearest = ReadPreference.NEAREST
+    assert get_read_preference(nearest) is nearest
+
+
+def test_get_read_and_write_concern():
+    assert get_read_concern(None) is None
+    assert get_read_concern("majority") == ReadConcern("majority")
+    assert get_write_concern(None) is None
+    assert get_write_concern({"w": 2}) == WriteConcern(w=2)
+    write_concern = WriteConcern(w=1)
+    assert get_write_concern(write_concern) is write_concern
+
+
+@override_settings(
+    mongodb_connections={
+        "archive": {"dsn": "mongodb://archive:27017", "max_pool_size": 5},
+        "reports": {"dbname": "reports"},
+    }
+)
+def test_setup_mongodb_with_connections():
+    from fastapi_contrib.conf import settings
+
+    try:
+        archive = get_connection_settings("archive")
+        assert archive["dsn"] == "mongodb://archive:27017"
+        assert archive["dbname"] == settings.mongodb_dbname
+        assert archive["max_pool_size"] == 5
+        assert archive["min_pool_size"] == settings.mongodb_min_pool_size
+
+        _app = FastAPI()
+        setup_mongodb(_app)
+    finally:
+        settings.mongodb_connections = {}
+
+    databases = _app.mongodb_databases
+    assert set(databases) == {"default", "archive", "reports"}
+    assert _app.mongodb is databases["default"]
+    assert databases["reports"].name == "reports"
+    # Connections with the same DSN & pool settings share motor client
+    assert databases["reports"].client is databases["default"].client
+    assert databases["archive"].client is not databases["default"].client
+    pool_options = databases["archive"].client.delegate.options.pool_options
+    assert pool_options.max_pool_size == 5
+
+
+@override_settings(
+    mongodb_connections={
+        "archive": {"compressors": ["zlib"]},
+        "reports": {"compressors": ["zlib"]},
+    }
+)
+def test_setup_mongodb_with_unhashable_options():
+    from fastapi_contrib.conf import settings
+
+    try:
+        _app = FastAPI()
+        setup_mongodb(_app)
+    finally:
+        settings.mongodb_connections = {}
+
+    databases = _app.mongodb_databases
+    assert databases["archive"].client is databases["reports"].client
+    assert databases["archive"].client is not databases["default"].client
+    options = databases["archive"].client.delegate.options
+    assert options._options["compressors"] == ["zlib"]
+
+
+@override_settings(
+    mongodb_wait_queue_timeout_ms=500,
+    mongodb_max_idle_time_ms=60000,
+    mongodb_compressors="zlib",
+    mongodb_zlib_compression_level=6,
+    mongodb_server_selection_timeout_ms=2000,
+    mongodb_monitoring=True,
+)
+def test_setup_mongodb_with_client_options():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.db.monitoring import (
+        CommandMetricsListener,
+        PoolMetricsListener,
+    )
+
+    try:
+        _app = FastAPI()
+        setup_mongodb(_app)
+    finally:
+        settings.mongodb_wait_queue_timeout_ms = None
+        settings.mongodb_max_idle_time_ms = None
+        settings.mongodb_compressors = None
+        settings.mongodb_zlib_compression_level = None
+        settings.mongodb_server_selection_timeout_ms = None
+        settings.mongodb_monitoring = False
+
+    options = _app.mongodb.client.delegate.options
+    assert options.pool_options.wait_queue_timeout == 0.5
+    assert options.pool_options.max_idle_time_seconds == 60
+    assert options.server_selection_timeout == 2
+    assert options._options["compressors"] == ["zlib"]
+    assert options._options["zlibcompressionlevel"] == 6
+    listeners = options._options["event_listeners"]
+    assert any(isinstance(x, PoolMetricsListener) for x in listeners)
+    assert any(isinstance(x, CommandMetricsListener) for x in listeners)
+
+
+@pytest.mark.asyncio
+@override_settings(
+    fastapi_app="tests.db.test_utils.app",
+    mongodb_min_pool_size=3,
+    mongodb_connections={"reports": {}, "archive": {"min_pool_size": 0}},
+)
+async def test_warmup():
+    from fastapi_contrib.conf import settings
+    from fastapi_contrib.common.utils import resolve_cached
+    from fastapi_contrib.db.client import MongoDBClient
+
+    MongoDBClient._MongoDBClient__instance = None
+    resolve_cached.cache_clear()
+
+    default, reports, archive = MagicMock(), MagicMock(), MagicMock()
+    reports.client = default.client
+    for database in (default, reports, archive):
+        database.command = AsyncMock(return_value={"ok": 1})
+    _app = FastAPI()
+    _app.mongodb_databases = {
+        "default": default, "reports": reports, "archive": archive
+    }
+    serializer = MagicMock()
+
+    try:
+        with patch(
+            "fastapi_contrib.serializers.openapi.patched_serializers",
+            [serializer],
+        ):
+            await warmup(_app, schemas=True)
+    finally:
+        settings.mongodb_min_pool_size = 0
+        settings.mongodb_connections = {}
+
+    # Databases sharing the client open its pool only once
+    pings = default.command.mock.call_count + reports.command.mock.call_count
+    assert pings == 3
+    archive.command.mock.assert_called_once_with("ping")
+    assert MongoDBClient._MongoDBClient__instance is not None
+    misses = resolve_cached.cache_info().misses
+    resolve_cached(settings.token_model)
+    resolve_cached(settings.mongodb_id_generator)
+    assert resolve_cached.cache_info().misses == misses
+    serializer.schema.assert_called_once_with()
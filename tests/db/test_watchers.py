@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from pymongo.errors import OperationFailure
+
+from fastapi_contrib.db.client import MongoDBClient
+from fastapi_contrib.db.models import MongoDBModel
+from fastapi_contrib.db.watchers import (
+    ChangeWatcher,
+    start_watchers,
+    stop_watchers,
+)
+from tests.mock import MongoDBMock
+from tests.utils import override_settings
+
+app = FastAPI()
+app.mongodb = MongoDBMock(find_one_result={"_id": "m", "token": "t0"})
+collection = app.mongodb.get_collection.return_value
+
+
+class ChangeStreamMock(object):
+    def __init__(self, changes, error=None):
+        self.changes = changes
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        ...
+
+    async def __aiter__(self):
+        for change in self.changes:
+            yield change
+        if self.error is not None:
+            raise self.error
+
+
+changes = []
+failed = set()
+
+
+class Model(MongoDBModel):
+    class Meta:
+        collection = "collection"
+
+    @classmethod
+    async def on_change(cls, change):
+        changes.append(change)
+        if change["_id"] == "broken" and "broken" not in failed:
+            failed.add("broken")
+            raise ValueError()
+
+
+class UnwatchedModel(MongoDBModel):
+    class Meta:
+        collection = "collection"
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_watchers.app")
+async def test_watch():
+    MongoDBClient._MongoDBClient__instance = None
+    collection.watch = MagicMock(
+        return_value=ChangeStreamMock([{"_id": "t1"}, {"_id": "t2"}])
+    )
+
+    result = [
+        change async for change in Model.watch(full_document="updateLookup")
+    ]
+    assert result == [{"_id": "t1"}, {"_id": "t2"}]
+    collection.watch.assert_called_once_with(
+        None, full_document="updateLookup", resume_after=None, session=None
+    )
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_watchers.app")
+async def test_change_watcher():
+    MongoDBClient._MongoDBClient__instance = None
+    changes.clear()
+    failed.clear()
+    collection.update_one.mock.reset_mock()
+    collection.watch = MagicMock(
+        side_effect=[
+            ChangeStreamMock([{"_id": "t1"}, {"_id": "broken"}]),
+            ChangeStreamMock(
+                [{"_id": "broken"}, {"_id": "t2"}],
+                error=OperationFailure("lost", code=286),
+            ),
+            ChangeStreamMock([], error=OperationFailure("failed", code=1)),
+            ChangeStreamMock([{"_id": "t3"}]),
+            ChangeStreamMock([]),
+        ]
+    )
+
+    watcher = ChangeWatcher(Model, worker=0, retry_delay=0, save_interval=0)
+    assert watcher.name == "tests.db.test_watchers.Model:0"
+    watcher.start()
+    while collection.watch.call_count < 5:
+        await asyncio.sleep(0)
+    await watcher.stop()
+    assert watcher.task is None
+
+    # Change, which hook failed to handle, is retried
+    assert changes == [
+        {"_id": "t1"},
+        {"_id": "broken"},
+        {"_id": "broken"},
+        {"_id": "t2"},
+        {"_id": "t3"},
+    ]
+    # Token is loaded once, then the last handled one is used, history
+    # after the token has been lost, so stream starts from now
+    resume_after = [
+        call[1]["resume_after"] for call in collection.watch.call_args_list
+    ]
+    assert resume_after == ["t0", "t1", None, None, "t3"]
+    saved = [
+        call[0][1]["$set"]["token"]
+        for call in collection.update_one.mock.call_args_list
+    ]
+    assert saved == ["t1", "broken", "t2", None, "t3"]
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_watchers.app")
+async def test_change_watcher_without_worker():
+    MongoDBClient._MongoDBClient__instance = None
+    changes.clear()
+    collection.find_one.mock.reset_mock()
+    collection.update_one.mock.reset_mock()
+    collection.watch = MagicMock(
+        side_effect=[
+            ChangeStreamMock(
+                [{"_id": "t1"}], error=OperationFailure("failed", code=1)
+            ),
+            ChangeStreamMock([], error=OperationFailure("lost", code=286)),
+            ChangeStreamMock([]),
+        ]
+    )
+
+    watcher = ChangeWatcher(Model, retry_delay=0)
+    assert watcher.name == "tests.db.test_watchers.Model"
+    watcher.start()
+    while collection.watch.call_count < 3:
+        await asyncio.sleep(0)
+    await watcher.stop()
+
+    # Token is kept only in memory
+    resume_after = [
+        call[1]["resume_after"] for call in collection.watch.call_args_list
+    ]
+    assert resume_after == [None, "t1", None]
+    collection.find_one.mock.assert_not_called()
+    collection.update_one.mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_watchers.app")
+async def test_change_watcher_resets_retry_delay():
+    MongoDBClient._MongoDBClient__instance = None
+    error = OperationFailure("failed", code=1)
+    collection.watch = MagicMock(
+        side_effect=[
+            ChangeStreamMock([], error=error),
+            ChangeStreamMock([], error=error),
+            ChangeStreamMock([{"_id": "t1"}], error=error),
+            ChangeStreamMock([], error=error),
+        ]
+    )
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+        if len(delays) == 4:
+            raise asyncio.CancelledError()
+
+    watcher = ChangeWatcher(Model, retry_delay=1, max_retry_delay=3)
+    with patch("fastapi_contrib.db.watchers.asyncio.sleep", new=sleep):
+        with pytest.raises(asyncio.CancelledError):
+            await watcher.run()
+
+    # Delay is doubled only on consecutive errors without handled changes
+    assert delays == [1, 2, 1, 2]
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_watchers.app")
+async def test_change_watcher_throttles_saves():
+    MongoDBClient._MongoDBClient__instance = None
+    collection.update_one.mock.reset_mock()
+    collection.watch = MagicMock(
+        return_value=ChangeStreamMock([{"_id": "t1"}, {"_id": "t2"}])
+    )
+
+    watcher = ChangeWatcher(Model, name="model-1", save_interval=60)
+    await watcher.watch()
+
+    # Only the last token is saved, when stream ends
+    collection.update_one.mock.assert_called_once_with(
+        {"_id": "model-1"}, {"$set": {"token": "t2"}}, upsert=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_start_watchers():
+    run = patch.object(ChangeWatcher, "run", new=lambda x: asyncio.sleep(10))
+    with run:
+        with patch(
+            "fastapi_contrib.db.watchers.get_models",
+            return_value=[Model, UnwatchedModel],
+        ):
+            watchers = start_watchers(full_document="updateLookup")
+        assert [watcher.model for watcher in watchers] == [Model]
+        assert watchers[0].full_document == "updateLookup"
+        assert not watchers[0].task.done()
+
+        await stop_watchers(watchers)
+        assert watchers[0].task is None
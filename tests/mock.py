@@ -1,3 +1,5 @@
+from copy import copy
+
 from pymongo.results import InsertOneResult, DeleteResult, UpdateResult
 from unittest.mock import MagicMock
 
@@ -15,6 +17,8 @@ class MongoDBCollectionMock(MagicMock):
         find_one_result = kwargs.get("find_one_result", {"_id": 1})
         inserted_id = kwargs.get("inserted_id", 1)
         create_indexes_result = kwargs.get("create_indexes_result", None)
+        self.list_indexes_result = kwargs.get("list_indexes_result", [])
+        aggregate_result = kwargs.get("aggregate_result", [{"_id": 1}])
 
         self.insert_one = AsyncMock(
             return_value=InsertOneResult(
@@ -32,11 +36,33 @@ class MongoDBCollectionMock(MagicMock):
         )
         self.count_documents = AsyncMock(return_value=1)
         self.find_one = AsyncMock(return_value=find_one_result)
+        # Documents are modified by models, so every call gets a copy
+        self.find_one_and_update = AsyncMock(
+            side_effect=lambda *args, **kwargs: copy(find_one_result)
+        )
+        self.find_one_and_replace = AsyncMock(
+            side_effect=lambda *args, **kwargs: copy(find_one_result)
+        )
+        self.find_one_and_delete = AsyncMock(
+            side_effect=lambda *args, **kwargs: copy(find_one_result)
+        )
         self.create_indexes = AsyncMock(return_value=create_indexes_result)
+        self.drop_index = AsyncMock(return_value=None)
+        self.aggregate = MagicMock(
+            side_effect=lambda *args, **kwargs: AsyncIterator(
+                aggregate_result
+            )
+        )
+        self.delete_one = AsyncMock(
+            return_value=DeleteResult(raw_result={}, acknowledged=True)
+        )
 
     def find(self, *args, **kwargs):
         return AsyncIterator([{"_id": 1}])
 
+    def list_indexes(self, *args, **kwargs):
+        return AsyncIterator(self.list_indexes_result)
+
 
 class MongoDBMock(MagicMock):
     def __init__(self, collection_name="collection", **kwargs):
@@ -44,4 +70,5 @@ class MongoDBMock(MagicMock):
         collection_mock = MongoDBCollectionMock(
             collection_name=collection_name, **kwargs
         )
+        collection_mock.database = self
         self.get_collection = MagicMock(return_value=collection_mock)
@@ -5,7 +5,7 @@ import pytest
 
 from fastapi_contrib.exceptions import (
     HTTPException, BadRequestError, ForbiddenError, NotFoundError,
-    UnauthorizedError, InternalServerError)
+    UnauthorizedError, InternalServerError, ConflictError)
 
 from starlette import status
 
@@ -123,6 +123,16 @@ def test_not_found_exception():
     assert exc.detail == detail
 
 
+def test_conflict_exception():
+    with pytest.raises(ConflictError) as excinfo:
+        raise ConflictError()
+
+    exc = excinfo.value
+    assert exc.error_code == status.HTTP_409_CONFLICT
+    assert exc.status_code == status.HTTP_409_CONFLICT
+    assert exc.detail == "Conflict."
+
+
 def test_internal_server_error_exception():
     detail = "We failed."
     with pytest.raises(InternalServerError) as excinfo:
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+
+import pytest
+
+# ujson is left out on purpose, FastAPI imports it itself whenever installed
+HEAVY_MODULES = {"motor", "pymongo", "bson", "jaeger_client", "opentracing"}
+
+
+def get_imported_modules(module: str) -> dict:
+    """
+    Imports module in a fresh interpreter with `-X importtime` and parses
+    its report into dict of module name -> cumulative import time in us.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    modules = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.mark.parametrize("module", [
+    "fastapi_contrib.auth.backends",
+    "fastapi_contrib.common.responses",
+    "fastapi_contrib.db.models",
+    "fastapi_contrib.exception_handlers",
+    "fastapi_contrib.pagination",
+    "fastapi_contrib.permissions",
+    "fastapi_contrib.serializers.openapi",
+    "fastapi_contrib.tracing.middlewares",
+    "fastapi_contrib.tracing.utils",
+])
+def test_heavy_dependencies_are_imported_lazily(module):
+    modules = get_imported_modules(module)
+    assert module in modules
+    assert not HEAVY_MODULES & set(modules)
+
+
+def test_settings_are_instantiated_lazily():
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import fastapi_contrib.db.models;"
+            "from fastapi_contrib.conf import settings;"
+            "print(settings._wrapped is None)",
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    assert process.stdout.strip() == "True"
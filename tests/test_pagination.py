@@ -1,17 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import asyncio
+
 import pytest
 
+from unittest.mock import patch
+
 from fastapi import FastAPI, Depends
-from starlette.requests import Request
+from starlette.requests import ClientDisconnect, Request
 from starlette.testclient import TestClient
 
 from fastapi_contrib.db.models import MongoDBTimeStampedModel
 from fastapi_contrib.serializers.common import ModelSerializer
+from fastapi_contrib.db.query import Q
 from fastapi_contrib.pagination import Pagination
 
 from tests.mock import MongoDBMock
-from tests.utils import override_settings
+from tests.utils import override_settings, AsyncMock
 
 app = FastAPI()
 app.mongodb = MongoDBMock()
@@ -256,3 +261,193 @@ async def test_paginate_offset_with_additional_query_params():
         "previous": None,
         "result": [{"id": 1}],
     }
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_serializers.app")
+async def test_paginate_with_read_preference():
+    class SecondaryPagination(Pagination):
+        read_preference = "secondaryPreferred"
+        max_staleness = 120
+
+    dumb_request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "query_string": b"",
+            "headers": {},
+        }
+    )
+    pagination = SecondaryPagination(request=dumb_request, limit=1, offset=0)
+    assert pagination.get_read_options() == {
+        "_read_preference": "secondaryPreferred",
+        "_max_staleness": 120,
+    }
+
+    with patch.object(Model, "count", new=AsyncMock(return_value=1)), \
+            patch.object(Model, "list", new=AsyncMock(return_value=[])):
+        await pagination.paginate(serializer_class=TestSerializer, a=1)
+
+        Model.count.mock.assert_called_with(
+            _read_preference="secondaryPreferred", _max_staleness=120, a=1
+        )
+        Model.list.mock.assert_called_with(
+            _limit=1,
+            _offset=0,
+            _sort=None,
+            raw=True,
+            _read_preference="secondaryPreferred",
+            _max_staleness=120,
+            a=1,
+        )
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_serializers.app")
+async def test_paginate_aggregate():
+    dumb_request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "query_string": b"",
+            "headers": {},
+        }
+    )
+    pagination = Pagination(request=dumb_request, limit=1, offset=1)
+    facet = {"count": [{"count": 3}], "result": [{"_id": 2}]}
+    pipeline = [{"$match": {"a": 1}}]
+
+    with patch.object(Model, "aggregate", new=AsyncMock(return_value=[facet])):
+        resp = await pagination.paginate_aggregate(
+            serializer_class=TestSerializer,
+            pipeline=pipeline,
+            _sort=[("created", -1)],
+        )
+
+        Model.aggregate.mock.assert_called_once_with(
+            [
+                {"$match": {"a": 1}},
+                {
+                    "$facet": {
+                        "count": [{"$count": "count"}],
+                        "result": [
+                            {"$sort": {"created": -1}},
+                            {"$skip": 1},
+                            {"$limit": 1},
+                        ],
+                    }
+                },
+            ]
+        )
+    assert pipeline == [{"$match": {"a": 1}}]
+    assert resp == {
+        "count": 3,
+        "next": "/?limit=1&offset=2",
+        "previous": "/",
+        "result": [{"id": 2}],
+    }
+
+    facet = {"count": [{"count": 1}], "result": [{"name": "x"}]}
+    with patch.object(Model, "aggregate", new=AsyncMock(return_value=[facet])):
+        assert await pagination.get_aggregated(pipeline) == (
+            1, [{"name": "x"}]
+        )
+
+    with patch.object(Model, "aggregate", new=AsyncMock(return_value=[])):
+        resp = await pagination.paginate_aggregate(
+            serializer_class=TestSerializer, pipeline=pipeline
+        )
+    assert resp["count"] == 0
+    assert resp["result"] == []
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_serializers.app")
+async def test_paginate_with_facet():
+    class FacetPagination(Pagination):
+        use_facet = True
+
+    dumb_request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "query_string": b"",
+            "headers": {},
+        }
+    )
+    pagination = FacetPagination(request=dumb_request, limit=2, offset=0)
+    facet = {"count": [{"count": 1}], "result": [{"_id": 1}]}
+
+    aggregate = AsyncMock(return_value=[facet])
+    with patch.object(Model, "aggregate", new=aggregate), \
+            patch.object(Model, "count", new=AsyncMock(return_value=1)):
+        resp = await pagination.paginate(
+            serializer_class=TestSerializer,
+            _sort=[("created", 1)],
+            _filter=Q(id=1),
+            _using="archive",
+            _max_time_ms=100,
+            _batch_size=10,
+            a=2,
+        )
+
+        Model.count.mock.assert_not_called()
+        Model.aggregate.mock.assert_called_once_with(
+            [
+                {"$match": {"_id": 1, "a": 2}},
+                {
+                    "$facet": {
+                        "count": [{"$count": "count"}],
+                        "result": [
+                            {"$sort": {"created": 1}},
+                            {"$skip": 0},
+                            {"$limit": 2},
+                        ],
+                    }
+                },
+            ],
+            _using="archive",
+            _max_time_ms=100,
+            batch_size=10,
+        )
+    assert resp == {
+        "count": 1,
+        "next": None,
+        "previous": None,
+        "result": [{"id": 1}],
+    }
+
+
+@pytest.mark.asyncio
+@override_settings(fastapi_app="tests.db.test_serializers.app")
+async def test_paginate_cancelled_on_disconnect():
+    class LimitedPagination(Pagination):
+        max_time_ms = 100
+        disconnect_check_interval = 0.01
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "query_string": b"",
+            "headers": {},
+        },
+        receive=receive,
+    )
+    pagination = LimitedPagination(request=request, limit=1, offset=0)
+    assert pagination.get_read_options() == {"_max_time_ms": 100}
+
+    async def slow_count(**kwargs):
+        await asyncio.sleep(10)
+
+    with patch.object(Model, "count", new=slow_count), \
+            patch.object(Model, "list", new=AsyncMock(return_value=[])):
+        with pytest.raises(ClientDisconnect):
+            await pagination.paginate(serializer_class=TestSerializer)
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
+
 import pytest
 
 from fastapi_contrib.exceptions import HTTPException
@@ -60,7 +62,8 @@ def test_base_permission_has_permission_not_raises(dumb_request):
     assert isinstance(permission, BasePermission)
 
 
-def test_permissions_dependency_as_class(dumb_request):
+@pytest.mark.asyncio
+async def test_permissions_dependency_as_class(dumb_request):
     class FailPermission(BasePermission):
 
         def has_required_permissions(self, request: Request) -> bool:
@@ -72,13 +75,133 @@ def test_permissions_dependency_as_class(dumb_request):
             return True
 
     dependency = PermissionsDependency(permissions_classes=[AllowPermission])
-    dependency(request=dumb_request)
+    await dependency(request=dumb_request)
 
     dependency = PermissionsDependency(
         permissions_classes=[AllowPermission, FailPermission])
 
     with pytest.raises(HTTPException) as excinfo:
-        dependency(request=dumb_request)
+        await dependency(request=dumb_request)
 
     assert excinfo.value.status_code == status.HTTP_403_FORBIDDEN
     assert excinfo.value.detail == "Forbidden."
+
+
+def test_permissions_dependency_instantiates_permissions_once():
+    class AllowPermission(BasePermission):
+
+        def has_required_permissions(self, request: Request) -> bool:
+            return True
+
+    dependency = PermissionsDependency(permissions_classes=[AllowPermission])
+    assert len(dependency.permissions) == 1
+    assert isinstance(dependency.permissions[0], AllowPermission)
+
+
+@pytest.mark.asyncio
+async def test_permissions_dependency_async_permissions(dumb_request):
+    class AsyncAllowPermission(BasePermission):
+
+        async def has_required_permissions(self, request: Request) -> bool:
+            return True
+
+    class AsyncFailPermission(BasePermission):
+        error_msg = "Async forbidden."
+
+        async def has_required_permissions(self, request: Request) -> bool:
+            return False
+
+    dependency = PermissionsDependency(
+        permissions_classes=[AsyncAllowPermission])
+    await dependency(request=dumb_request)
+
+    dependency = PermissionsDependency(
+        permissions_classes=[AsyncAllowPermission, AsyncFailPermission])
+    with pytest.raises(HTTPException) as excinfo:
+        await dependency(request=dumb_request)
+
+    assert excinfo.value.status_code == status.HTTP_403_FORBIDDEN
+    assert excinfo.value.detail == "Async forbidden."
+
+
+@pytest.mark.asyncio
+async def test_permissions_dependency_failure_cancels_others(dumb_request):
+    cancelled = asyncio.Event()
+
+    class SlowPermission(BasePermission):
+
+        async def has_required_permissions(self, request: Request) -> bool:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return True
+
+    class AsyncFailPermission(BasePermission):
+
+        async def has_required_permissions(self, request: Request) -> bool:
+            return False
+
+    class FailPermission(BasePermission):
+
+        def has_required_permissions(self, request: Request) -> bool:
+            return False
+
+    dependency = PermissionsDependency(
+        permissions_classes=[SlowPermission, AsyncFailPermission])
+    with pytest.raises(HTTPException):
+        await asyncio.wait_for(dependency(request=dumb_request), timeout=1)
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+    dumb_request.scope.pop("permissions_cache")
+    dependency = PermissionsDependency(
+        permissions_classes=[SlowPermission, FailPermission])
+    with pytest.raises(HTTPException):
+        await asyncio.wait_for(dependency(request=dumb_request), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_permissions_dependency_memoized_per_request(dumb_request):
+    calls = []
+
+    class CountingPermission(BasePermission):
+
+        async def has_required_permissions(self, request: Request) -> bool:
+            calls.append(request)
+            return True
+
+    await PermissionsDependency([CountingPermission])(request=dumb_request)
+    await PermissionsDependency([CountingPermission])(request=dumb_request)
+    assert len(calls) == 1
+
+    other_request = Request({"type": "http", "method": "GET", "path": "/"})
+    await PermissionsDependency([CountingPermission])(request=other_request)
+    assert len(calls) == 2
+
+
+def test_async_permission_with_request_raises(dumb_request):
+    class AsyncAllowPermission(BasePermission):
+
+        async def has_required_permissions(self, request: Request) -> bool:
+            return False
+
+    with pytest.raises(TypeError):
+        AsyncAllowPermission(request=dumb_request)
+
+
+@pytest.mark.asyncio
+async def test_permissions_dependency_permission_with_own_init(dumb_request):
+    class LegacyPermission(BasePermission):
+
+        def __init__(self, request: Request):
+            self.checked = True
+            super().__init__(request=request)
+
+        def has_required_permissions(self, request: Request) -> bool:
+            return False
+
+    dependency = PermissionsDependency(permissions_classes=[LegacyPermission])
+    with pytest.raises(HTTPException) as excinfo:
+        await dependency(request=dumb_request)
+    assert excinfo.value.status_code == status.HTTP_403_FORBIDDEN